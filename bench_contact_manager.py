@@ -0,0 +1,257 @@
+"""Scale benchmarks for the contact_manager operations.
+
+generate_contacts() builds a deterministic synthetic contact book with the
+test suite's _mk helper: the same n and seed always give the same
+contacts, including a share of duplicates (the same phone and email
+written differently) for dedupe and merge to find. run_suite() times each
+operation on an IndexedContactsDB of each size:
+
+    add_bulk, add_contact, search_name, search_category, find_by_phone,
+    query, update, stats, stats_recompute, dedupe, export, save, load, merge
+
+For every operation it records wall time and ops/sec from an untraced
+run. A second run under tracemalloc gives peak_bytes (the most memory
+the operation had allocated at once) and retained_bytes (what it still
+held at the end). net_blocks comes from sys.getallocatedblocks(): the
+number of memory blocks the operation left allocated, also given per op.
+The results are written as JSON, and compare() lists the operations
+that got slower than a baseline file:
+
+    python bench_contact_manager.py --sizes 1000,100000 --out bench.json
+    python bench_contact_manager.py --sizes 1000,100000 --baseline bench.json
+
+The default sizes are 1k, 100k, 1M and 5M contacts. The largest need
+several GB of memory and take a long time; --no-memory skips the traced
+runs.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from contact_export import export_contacts
+from contact_index import IndexedContactsDB
+from contact_manager import (ContactsDB, add_contact, add_contacts_bulk, find_contact_by_phone, find_duplicate_contacts,
+                             generate_contact_statistics, load_contacts_from_file, merge_duplicate_groups,
+                             save_contacts_to_file, search_contacts_by_category, search_contacts_by_name,
+                             update_contact)
+from contact_query import query_contacts
+from test_contact_manager import _mk
+
+SIZES = (1_000, 100_000, 1_000_000, 5_000_000)
+SAMPLE = 1_000  # lookups/updates per timed operation
+FIRST_NAMES = ("James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+               "Wei", "Aisha", "Mohammed", "Yuki", "Olga", "Priya", "Mateo", "Fatima", "Noah", "Chloe")
+SYLLABLES = ("an", "ber", "cal", "den", "dor", "el", "fen", "gar", "hal", "is", "jor", "kin", "lan", "mor", "nel",
+             "ost", "par", "quin", "ros", "sen", "tor", "ul", "ven", "wes", "yar", "zel", "ash", "brook", "ford", "ley")
+CATEGORIES = ("personal", "work", "family", "school", "vendor")
+PLACES = (("Omaha", "NE", "681"), ("Lincoln", "NE", "685"), ("Chicago", "IL", "606"), ("Austin", "TX", "787"),
+          ("Denver", "CO", "802"), ("Seattle", "WA", "981"), ("Boston", "MA", "021"), ("Atlanta", "GA", "303"))
+AREA_CODES = ("402", "312", "512", "303", "206", "617", "404", "531")
+DOMAINS = ("example.com", "mail.test", "corp.test", "school.test")
+
+
+def _mix(i: int, seed: int) -> int:
+    """A cheap deterministic 32-bit hash of (i, seed), so contact i doesn't need its own Random."""
+    h = (i * 2654435761 + seed * 40503 + 0x9E3779B9) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x45D9F3B) & 0xFFFFFFFF
+    return h ^ (h >> 16)
+
+
+def _last_name(h: int) -> str:
+    n = len(SYLLABLES)
+    return (SYLLABLES[h % n] + SYLLABLES[(h // n) % n] + SYLLABLES[(h // n // n) % n]).capitalize()
+
+
+def generate_contacts(n: int, seed: int = 0, duplicate_every: int = 50) -> Iterator[Dict[str, Any]]:
+    """Yield n synthetic contacts; every duplicate_every-th one repeats an earlier contact's phone and email."""
+    for i in range(n):
+        h = _mix(i, seed)
+        first = FIRST_NAMES[h % len(FIRST_NAMES)]
+        last = _last_name(h >> 5)
+        city, state, zip_prefix = PLACES[(h >> 20) % len(PLACES)]
+        source = _mix(i, seed + 1) % i if duplicate_every and i and i % duplicate_every == 0 else i
+        area = AREA_CODES[_mix(source, seed) % len(AREA_CODES)]
+        if source == i:
+            phone = f"({area}) {source // 10_000 % 1000:03d}-{source % 10_000:04d}"
+        else:
+            phone = f"+1{area}{source // 10_000 % 1000:03d}{source % 10_000:04d}"
+        email = f"user{source}@{DOMAINS[source % len(DOMAINS)]}" if h % 10 else ""
+        c = _mk(first, last, phone, email=email, category=CATEGORIES[(h >> 8) % len(CATEGORIES)],
+                city=city, state=state, notes="" if h % 3 else f"note {i}")
+        c["address"]["street"] = f"{h % 9000 + 100} {_last_name(h >> 11)} St"
+        c["address"]["zip_code"] = f"{zip_prefix}{h % 100:02d}"
+        day = f"20{15 + h % 10}-{(h >> 4) % 12 + 1:02d}-{(h >> 9) % 28 + 1:02d}"
+        c["created_date"] = c["last_modified"] = day
+        yield c
+
+
+# --- measuring ---
+
+def measure(fn: Callable[[Any], Any], setup: Optional[Callable[[], Any]] = None,
+            memory: bool = True) -> Tuple[Any, Dict[str, Any]]:
+    """Run fn(setup()) and return (its result, {seconds, peak_bytes, retained_bytes, net_blocks}).
+
+    setup runs outside the measurement. With memory, fn runs once more
+    under tracemalloc first, on a fresh setup(), so that tracing doesn't
+    slow down the timed run.
+    """
+    stats: Dict[str, Any] = {}
+    if memory:
+        arg = setup() if setup else None
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        result = fn(arg)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats.update(peak_bytes=peak, retained_bytes=retained, net_blocks=sys.getallocatedblocks() - blocks)
+        del result, arg
+    arg = setup() if setup else None
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(arg)
+    stats["seconds"] = time.perf_counter() - start
+    return result, stats
+
+
+class _CountingSink:
+    """A write()-only file that just counts characters, so exports don't measure the disk."""
+
+    def __init__(self) -> None:
+        self.chars = 0
+
+    def write(self, text: str) -> int:
+        self.chars += len(text)
+        return len(text)
+
+
+def _cases(db: ContactsDB, contacts: List[Dict[str, Any]], filename: str
+           ) -> List[Tuple[str, int, Callable[[Any], Any], Optional[Callable[[], Any]]]]:
+    """(name, ops, fn, setup) for each operation; add_bulk is measured by run_suite itself."""
+    n = len(contacts)
+    ids = list(db)
+    step = max(n // SAMPLE, 1)
+    sample_ids = ids[::step][:SAMPLE]
+    sample = [contacts[int(cid.rsplit("_", 1)[1]) - 1] for cid in sample_ids]
+    names = [c["last_name"][:5] for c in sample]
+    phones = [c["phone"] for c in sample]
+    singles = contacts[:min(n, 10 * SAMPLE)]
+
+    def add_one_by_one(_):
+        fresh = IndexedContactsDB()
+        for c in singles:
+            add_contact(fresh, c)
+
+    def save(_):
+        if os.path.exists(filename):
+            os.remove(filename)
+        save_contacts_to_file(db, filename)
+
+    return [
+        ("add_contact", len(singles), add_one_by_one, None),
+        ("search_name", len(names), lambda _: [search_contacts_by_name(db, t) for t in names], None),
+        ("search_category", len(CATEGORIES),
+         lambda _: [search_contacts_by_category(db, cat) for cat in CATEGORIES], None),
+        ("find_by_phone", len(phones), lambda _: [find_contact_by_phone(db, p) for p in phones], None),
+        ("query", 10, lambda _: [query_contacts(db, "state = NE AND category = work AND has_email = yes",
+                                                sort="last_name", limit=50) for _ in range(10)], None),
+        ("update", len(sample_ids), lambda _: [update_contact(db, cid, {"notes": "benchmarked"})
+                                               for cid in sample_ids], None),
+        ("stats", SAMPLE, lambda _: [generate_contact_statistics(db) for _ in range(SAMPLE)], None),
+        ("stats_recompute", 1, lambda _: generate_contact_statistics(db, recompute=True), None),
+        ("dedupe", 1, lambda _: find_duplicate_contacts(db), None),
+        ("export", n, lambda _: export_contacts(db, _CountingSink(), "csv"), None),
+        ("save", n, save, None),
+        ("load", n, lambda _: load_contacts_from_file(filename), None),
+        ("merge", 1, merge_duplicate_groups, lambda: load_contacts_from_file(filename)),
+    ]
+
+
+def run_suite(sizes: Sequence[int] = SIZES, seed: int = 0, memory: bool = True,
+              directory: Optional[str] = None, log: Callable[[str], None] = lambda line: None
+              ) -> Dict[str, Any]:
+    """Benchmark every operation at each size; returns {"meta": ..., "results": [row, ...]}."""
+    results: List[Dict[str, Any]] = []
+
+    def record(size: int, name: str, ops: int, stats: Dict[str, Any]) -> None:
+        row = {"size": size, "op": name, "ops": ops, "seconds": round(stats["seconds"], 6),
+               "ops_per_sec": round(ops / stats["seconds"], 1) if stats["seconds"] else None}
+        if "peak_bytes" in stats:
+            row.update(peak_bytes=stats["peak_bytes"], retained_bytes=stats["retained_bytes"],
+                       net_blocks=stats["net_blocks"], blocks_per_op=round(stats["net_blocks"] / ops, 2))
+        results.append(row)
+        log(f"{size:>9} {name:<16} {row['seconds']:>10.3f}s {row['ops_per_sec'] or 0:>14.1f} ops/s"
+            + (f" {row['peak_bytes'] / 2 ** 20:>10.1f} MiB peak" if "peak_bytes" in row else ""))
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        for size in sizes:
+            contacts = list(generate_contacts(size, seed))
+
+            def build(_):
+                store = IndexedContactsDB()
+                add_contacts_bulk(store, contacts)
+                return store
+
+            db, stats = measure(build, memory=memory)
+            record(size, "add_bulk", size, stats)
+            filename = os.path.join(tmp, f"contacts_{size}.json")
+            for name, ops, fn, setup in _cases(db, contacts, filename):
+                record(size, name, ops, measure(fn, setup, memory)[1])
+            del db, contacts
+    meta = {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "platform": platform.platform(), "seed": seed, "memory": memory,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    """Operations whose ops/sec fell by more than tolerance (0.2 = 20%) against baseline."""
+    before = {(r["size"], r["op"]): r for r in baseline["results"]}
+    slower = []
+    for row in current["results"]:
+        old = before.get((row["size"], row["op"]))
+        if not old or not old.get("ops_per_sec") or not row.get("ops_per_sec"):
+            continue
+        ratio = row["ops_per_sec"] / old["ops_per_sec"]
+        if ratio < 1 - tolerance:
+            slower.append({"size": row["size"], "op": row["op"], "before": old["ops_per_sec"],
+                           "after": row["ops_per_sec"], "ratio": round(ratio, 3)})
+    return slower
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated contact counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed ops/sec drop before flagging")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run_suite(sizes, args.seed, memory=not args.no_memory, log=print)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            slower = compare(json.load(f), report, args.tolerance)
+        for row in slower:
+            print(f"SLOWER {row['size']:>9} {row['op']:<16} {row['before']:>12.1f} -> {row['after']:>12.1f} ops/s")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
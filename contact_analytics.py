@@ -0,0 +1,100 @@
+"""NumPy columnar snapshot of a ContactsDB for fast statistics and duplicate checks.
+
+ColumnarContacts reads the DB once into integer-coded NumPy columns:
+category and state codes, area codes as integers, an email-present mask,
+and one code column per duplicate key. It provides the same
+statistics_counts() and duplicate_groups() hooks as the stores, so the
+existing functions run on it as vectorized bincount/argsort operations:
+
+    snap = ColumnarContacts(contacts_db)
+    generate_contact_statistics(snap)
+    find_duplicate_contacts(snap)
+
+Codes are handed out in order of first appearance, so category and state
+counts and duplicate groups come out in the same order as the pure-Python
+loops. Area codes are counted in code order; statistics_report breaks
+most-common ties by code, so that order doesn't matter.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from contact_manager import DUPLICATE_KEYS, ContactsDB, statistics_keys
+
+
+def _code(table: Dict[str, int], key: str) -> int:
+    """Return key's code in table (-1 for ""), adding it if it's new."""
+    if not key:
+        return -1
+    code = table.get(key)
+    if code is None:
+        code = table[key] = len(table)
+    return code
+
+
+def _counts(codes: np.ndarray, labels: List[str]) -> Dict[str, int]:
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    return {labels[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+
+class ColumnarContacts:
+    """A read-only, column-per-field copy of a ContactsDB."""
+
+    def __init__(self, contacts_db: ContactsDB) -> None:
+        ids: List[str] = []
+        cats: List[int] = []
+        states: List[int] = []
+        areas: List[int] = []
+        emails: List[bool] = []
+        cat_table: Dict[str, int] = {}
+        state_table: Dict[str, int] = {}
+        dup_tables: Dict[str, Dict[str, int]] = {kind: {} for kind in DUPLICATE_KEYS}
+        dup_codes: Dict[str, List[int]] = {kind: [] for kind in DUPLICATE_KEYS}
+        stored_keys = getattr(contacts_db, "match_keys_of", None)
+        for cid, c in contacts_db.items():
+            cat, st, ac, has_email = statistics_keys(c)
+            ids.append(cid)
+            cats.append(_code(cat_table, cat))
+            states.append(_code(state_table, st))
+            areas.append(int(ac) if ac else -1)
+            emails.append(has_email)
+            keys = stored_keys(cid) if stored_keys is not None else None
+            for kind, key_fn in DUPLICATE_KEYS.items():
+                key = getattr(keys, kind) if keys is not None else key_fn(c)
+                dup_codes[kind].append(_code(dup_tables[kind], key))
+        self.ids = np.array(ids, dtype=object)
+        self.category = np.array(cats, dtype=np.int32)
+        self.category_labels = list(cat_table)
+        self.state = np.array(states, dtype=np.int32)
+        self.state_labels = list(state_table)
+        self.area_code = np.array(areas, dtype=np.int16)
+        self.has_email = np.array(emails, dtype=bool)
+        self.duplicate_codes = {kind: np.array(codes, dtype=np.int64) for kind, codes in dup_codes.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def statistics_counts(self) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], int]:
+        by_cat = _counts(self.category, self.category_labels)
+        by_state = _counts(self.state, self.state_labels)
+        areas = self.area_code[self.area_code >= 0]
+        values, counts = np.unique(areas, return_counts=True)
+        area_counts = {f"{int(v):03d}": int(n) for v, n in zip(values, counts)}
+        no_email = int(np.count_nonzero(~self.has_email))
+        return by_cat, by_state, area_counts, no_email
+
+    def duplicate_groups(self, kind: str) -> List[List[str]]:
+        codes = self.duplicate_codes[kind]
+        valid = codes >= 0
+        if not valid.any():
+            return []
+        counts = np.bincount(codes[valid])
+        rows = np.flatnonzero(valid & (counts[np.where(valid, codes, 0)] >= 2))
+        if rows.size == 0:
+            return []
+        # A stable sort by code keeps groups in first-seen order and ids in DB order.
+        rows = rows[np.argsort(codes[rows], kind="stable")]
+        bounds = np.flatnonzero(np.diff(codes[rows])) + 1
+        return [self.ids[group].tolist() for group in np.split(rows, bounds)]
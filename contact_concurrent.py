@@ -0,0 +1,261 @@
+"""A contact store that many threads can read and write at once.
+
+ConcurrentContactsDB splits the contacts over `shards` dicts by a hash of
+the contact id. Each shard has its own reader-writer lock, so a writer
+only holds up readers and writers of its own shard.
+
+Records are copy-on-write: every write stores a new read-only
+ContactRecord, and no stored record is ever changed in place. A reader
+always gets a whole record, either the old one or the new one, never a
+mix. That is why a single lookup (db[cid], db.get(cid), cid in db) needs no
+lock at all. The read locks are for reads of many records that must be
+consistent with each other. Iteration copies one shard at a time under
+its read lock.
+
+Read-modify-write sequences hold the write locks of the shards involved:
+
+    with db.locked(id1, id2):   # shards locked in a fixed order, re-entrant
+        db[id1] = merged
+        del db[id2]
+
+update_contact, merge_contacts and merge_duplicate_groups in
+contact_manager do this whenever the store has locked().
+
+benchmark() times readers against a background writer at several thread
+counts:
+
+    python contact_concurrent.py
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from contact_manager import ID_PREFIX, Contact, ContactRecord, contact_id_number
+
+_NOT_FOUND: Any = object()
+
+
+class RWLock:
+    """Many readers or one writer. Waiting writers go first, and the writing thread may re-enter."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._depth = 0
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+            self._depth = 1
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentContactsDB(MutableMapping):
+    """A thread-safe ContactsDB; see the module docstring."""
+
+    def __init__(self, contacts: Optional[Dict[str, Contact]] = None, shards: int = 16) -> None:
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self._shards: List[Dict[str, ContactRecord]] = [{} for _ in range(shards)]
+        self._locks = [RWLock() for _ in range(shards)]
+        self._id_lock = threading.Lock()
+        self.next_id = 1
+        if contacts:
+            for cid, c in contacts.items():
+                self[cid] = c
+
+    def _shard(self, contact_id: str) -> int:
+        return hash(contact_id) % len(self._shards)
+
+    # --- single records: lock-free reads, locked writes ---
+
+    def __getitem__(self, contact_id: str) -> ContactRecord:
+        return self._shards[self._shard(contact_id)][contact_id]
+
+    def get(self, contact_id: str, default: Any = None) -> Any:
+        return self._shards[self._shard(contact_id)].get(contact_id, default)
+
+    def __contains__(self, contact_id: object) -> bool:
+        return isinstance(contact_id, str) and contact_id in self._shards[self._shard(contact_id)]
+
+    def __setitem__(self, contact_id: str, contact: Contact) -> None:
+        record = ContactRecord.from_dict(contact)  # built before taking the lock
+        i = self._shard(contact_id)
+        with self._locks[i].write():
+            self._shards[i][contact_id] = record
+        n = contact_id_number(contact_id)
+        if n >= self.next_id:
+            with self._id_lock:
+                self.next_id = max(self.next_id, n + 1)
+
+    def __delitem__(self, contact_id: str) -> None:
+        i = self._shard(contact_id)
+        with self._locks[i].write():
+            del self._shards[i][contact_id]
+
+    def pop(self, contact_id: str, default: Any = _NOT_FOUND) -> Any:
+        """Remove and return a record in one step (MutableMapping.pop looks up, then deletes)."""
+        i = self._shard(contact_id)
+        with self._locks[i].write():
+            if default is _NOT_FOUND:
+                return self._shards[i].pop(contact_id)
+            return self._shards[i].pop(contact_id, default)
+
+    def allocate_id(self) -> str:
+        with self._id_lock:
+            cid = f"{ID_PREFIX}{self.next_id:03d}"
+            self.next_id += 1
+        return cid
+
+    @contextmanager
+    def locked(self, *contact_ids: str) -> Iterator[None]:
+        """Hold the write locks of the shards of contact_ids (in shard order, so no deadlocks)."""
+        shards = sorted({self._shard(cid) for cid in contact_ids})
+        for i in shards:
+            self._locks[i].acquire_write()
+        try:
+            yield
+        finally:
+            for i in reversed(shards):
+                self._locks[i].release_write()
+
+    # --- whole-store reads, one shard at a time ---
+
+    def shard_items(self, shard: int) -> List[Tuple[str, ContactRecord]]:
+        """A consistent copy of one shard's (id, record) pairs."""
+        with self._locks[shard].read():
+            return list(self._shards[shard].items())
+
+    def items(self) -> Iterator[Tuple[str, ContactRecord]]:  # type: ignore[override]
+        for i in range(len(self._shards)):
+            yield from self.shard_items(i)
+
+    def values(self) -> Iterator[ContactRecord]:  # type: ignore[override]
+        return (c for _, c in self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return (cid for cid, _ in self.items())
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def snapshot(self) -> Dict[str, ContactRecord]:
+        """A plain dict copy, consistent per shard."""
+        return dict(self.items())
+
+
+def benchmark(contacts: int = 10_000, seconds: float = 1.0, thread_counts: Tuple[int, ...] = (1, 2, 4, 8),
+              shards: int = 16) -> List[Dict[str, Any]]:
+    """Read throughput at each reader thread count while one writer keeps replacing records.
+
+    Readers look contacts up and check that the record is whole; the
+    writer updates contacts round-robin through update_contact.
+    """
+    from contact_manager import update_contact
+
+    base = {f"{ID_PREFIX}{i:03d}": {"first_name": f"F{i}", "last_name": f"L{i}", "phone": f"402555{i:04d}",
+                                    "email": "", "address": {"street": "", "city": "Omaha", "state": "NE",
+                                                             "zip_code": ""},
+                                    "category": "work", "notes": ""}
+            for i in range(1, contacts + 1)}
+    ids = list(base)
+    results = []
+    for n in thread_counts:
+        db = ConcurrentContactsDB(base, shards=shards)
+        stop = threading.Event()
+        reads = [0] * n
+        writes = [0]
+
+        def reader(slot: int) -> None:
+            k = slot
+            count = 0
+            while not stop.is_set():
+                for _ in range(100):
+                    c = db[ids[k % len(ids)]]
+                    assert c["first_name"] and c["phone"]
+                    k += 7
+                count += 100
+            reads[slot] = count
+
+        def writer() -> None:
+            k = 0
+            while not stop.is_set():
+                update_contact(db, ids[k % len(ids)], {"notes": str(k)})
+                k += 1
+            writes[0] = k
+
+        threads = [threading.Thread(target=reader, args=(slot,)) for slot in range(n)]
+        threads.append(threading.Thread(target=writer))
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        results.append({"threads": n, "shards": shards, "reads_per_sec": round(sum(reads) / elapsed, 1),
+                        "writes_per_sec": round(writes[0] / elapsed, 1)})
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000):
+        print(f"{row['threads']} readers: {row['reads_per_sec']:>12.1f} reads/s  "
+              f"{row['writes_per_sec']:>10.1f} writes/s")
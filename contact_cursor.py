@@ -0,0 +1,175 @@
+"""Paging through contacts, or any search result, a page at a time.
+
+ContactCursor hands out pages of (id, contact) pairs from a ContactsDB,
+a search result dict, or any iterable of pairs such as
+contact_query.iter_query(). Unsorted cursors stream the source and never
+hold more than one page. Sorted cursors over a store also hold only one
+page. Each page is read straight off the store's sorted view when it has
+one for the sort field (ids_in_range), or else picked with a heap in one
+pass over the store. Sorted cursors over a one-shot iterable have to sort
+it in memory.
+
+cursor.token is an opaque string that resumes at the next page, so a
+client can stop and come back later:
+
+    cursor = ContactCursor(db, page_size=50, sort="last_name")
+    first = cursor.next_page()
+    later = ContactCursor(db, page_size=50, sort="last_name", token=cursor.token)
+
+Sorted cursors resume after the last key they returned, so contacts added
+or deleted in between don't shift the pages. Unsorted cursors resume by
+position.
+
+render_rows() formats a page in one string, so writing a page is a
+single write() call.
+"""
+from __future__ import annotations
+
+import base64
+import heapq
+import json
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from contact_manager import RANGE_FIELDS, Contact, contact_list_line
+from contact_query import sort_key
+
+Row = Tuple[str, Contact]
+Rows = Union[Mapping, Iterable[Row]]
+
+
+def encode_token(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("invalid resume token") from None
+    if not isinstance(state, dict) or not isinstance(state.get("n"), int):
+        raise ValueError("invalid resume token")
+    return state
+
+
+def _tuples(value: Any) -> Any:
+    """Turn the JSON lists of a decoded sort key back into tuples."""
+    return tuple(_tuples(v) for v in value) if isinstance(value, list) else value
+
+
+class ContactCursor:
+    """Pages of (id, contact) pairs from rows, optionally sorted (see contact_query.sort_key)."""
+
+    def __init__(self, rows: Rows, page_size: int = 50, sort: Union[str, Sequence[str], None] = None,
+                 token: Optional[str] = None) -> None:
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        self.page_size = page_size
+        self.sort = None if sort is None else ([sort] if isinstance(sort, str) else list(sort))
+        state = decode_token(token) if token else {"n": 0, "sort": self.sort}
+        if state.get("sort") != self.sort:
+            raise ValueError("resume token was issued for a different sort")
+        self.position: int = state["n"]
+        items = rows.items() if isinstance(rows, Mapping) else rows
+        self._key = None
+        self._last_key: Any = None
+        if self.sort is None:
+            source: Iterator[Row] = islice(iter(items), self.position, None)
+        else:
+            key, reverse = sort_key(self.sort)
+            self._key = key
+            after = _tuples(state["after"]) if "after" in state else None
+            if isinstance(rows, Mapping):
+                source = self._pages(rows, after, reverse)
+            elif not reverse:
+                ordered = sorted(items, key=key)
+                start = 0 if after is None else bisect_right(ordered, after, key=key)
+                source = islice(ordered, start, None)
+            else:
+                ordered = sorted(items, key=key)
+                end = len(ordered) if after is None else bisect_left(ordered, after, key=key)
+                source = (ordered[i] for i in range(end - 1, -1, -1))
+        self._source = source
+        self._peeked = list(islice(source, 1))
+
+    def _pages(self, rows: Mapping, after: Any, reverse: bool) -> Iterator[Row]:
+        """The rows after `after` in sort order, fetched from rows one page at a time."""
+        while True:
+            page = self._page_after(rows, after, reverse)
+            yield from page
+            if len(page) < self.page_size:
+                return
+            after = self._key(page[-1])
+
+    def _page_after(self, rows: Mapping, after: Any, reverse: bool) -> List[Row]:
+        key = self._key
+        field = self.sort[0]
+        lookup = getattr(rows, "ids_in_range", None)
+        # The sorted view leaves out empty keys, so it only has every row when none is empty.
+        if (lookup is not None and not reverse and len(self.sort) == 1 and field in RANGE_FIELDS
+                and rows.count_in_range(field) == len(rows)):
+            want = fetch = self.page_size
+            while True:
+                ids = lookup(field, None if after is None else after[0], None, fetch)
+                page = [(cid, rows[cid]) for cid in ids]
+                if after is not None:
+                    page = [row for row in page if key(row) > after]  # skip ties up to `after`
+                if len(page) >= want or len(ids) < fetch:
+                    return page[:want]
+                fetch *= 2
+        if reverse:
+            return heapq.nlargest(self.page_size, (row for row in rows.items() if after is None or key(row) < after),
+                                  key=key)
+        return heapq.nsmallest(self.page_size, (row for row in rows.items() if after is None or key(row) > after),
+                               key=key)
+
+    @property
+    def done(self) -> bool:
+        return not self._peeked
+
+    def next_page(self) -> List[Row]:
+        """Return the next page ([] once the cursor is done)."""
+        if not self._peeked:
+            return []
+        page = list(islice(chain(self._peeked, self._source), self.page_size))
+        self._peeked = list(islice(self._source, 1))
+        self.position += len(page)
+        if self._key is not None:
+            self._last_key = self._key(page[-1])
+        return page
+
+    @property
+    def token(self) -> Optional[str]:
+        """Resume token for the next page, or None when there are no more pages."""
+        if self.done:
+            return None
+        state: Dict[str, Any] = {"n": self.position, "sort": self.sort}
+        if self._last_key is not None:
+            state["after"] = self._last_key
+        return encode_token(state)
+
+    def __iter__(self) -> Iterator[List[Row]]:
+        while not self.done:
+            yield self.next_page()
+
+
+def render_rows(rows: Iterable[Row]) -> str:
+    """Format rows as list_all_contacts lines, in one string."""
+    return "".join(contact_list_line(cid, c) + "\n" for cid, c in rows)
+
+
+def page_through(cursor: ContactCursor, out: TextIO, ask=input) -> Optional[str]:
+    """Write the cursor's pages to out, asking before each further page.
+
+    Returns the resume token if the reader stops early, else None.
+    """
+    for page in cursor:
+        out.write(render_rows(page))
+        out.flush()
+        if cursor.done:
+            break
+        if ask(f"-- {cursor.position} shown; Enter for more, q to stop -- ").strip().lower() == "q":
+            return cursor.token
+    return None
@@ -0,0 +1,160 @@
+"""Fuzzy duplicate detection with blocking keys and MinHash/LSH.
+
+find_duplicate_contacts() only groups exact key matches. find_fuzzy_duplicates()
+also catches near-duplicates (name typos, Gmail dot/plus variants, "Street"
+vs "St") without comparing every pair of contacts:
+
+1. Each contact is turned into a set of character 3-gram shingles over its
+   normalized name, email and address.
+2. A MinHash signature of that set is split into LSH bands. Contacts that
+   share a band, or a blocking key (phone digits, normalized email), become
+   candidate pairs.
+3. Candidates whose estimated Jaccard similarity reaches the threshold are
+   joined with union-find, and the resulting clusters are returned in the
+   same list-of-id-lists shape as the exact groups.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from contact_manager import Contact, ContactsDB, normalize_phone
+
+GMAIL_DOMAINS = {"gmail.com", "googlemail.com"}
+ADDRESS_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "drive": "dr", "lane": "ln",
+    "boulevard": "blvd", "court": "ct", "place": "pl", "north": "n", "south": "s",
+    "east": "e", "west": "w", "apartment": "apt", "suite": "ste",
+}
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_email(email: str) -> str:
+    """Casefold, and for Gmail drop dots and +tags from the local part."""
+    email = (email or "").strip().casefold()
+    local, _, domain = email.partition("@")
+    if not domain:
+        return email
+    if domain in GMAIL_DOMAINS:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_address(address: Any) -> str:
+    address = address or {}
+    parts = [str(address.get(k, "") or "") for k in ("street", "city", "state", "zip_code")]
+    words = _NON_ALNUM.sub(" ", " ".join(parts).casefold()).split()
+    return " ".join(ADDRESS_ABBREVIATIONS.get(w, w) for w in words)
+
+
+def shingles(c: Contact, k: int = 3) -> Set[str]:
+    """Field-tagged character k-grams of a contact's name, email and address."""
+    name = _NON_ALNUM.sub("", f"{c.get('first_name', '') or ''}{c.get('last_name', '') or ''}".casefold())
+    fields = {"n": name, "e": normalize_email(c.get("email", "") or ""),
+              "a": normalize_address(c.get("address"))}
+    out: Set[str] = set()
+    for tag, text in fields.items():
+        if len(text) <= k:
+            if text:
+                out.add(f"{tag}:{text}")
+            continue
+        out.update(f"{tag}:{text[i:i + k]}" for i in range(len(text) - k + 1))
+    return out
+
+
+def blocking_keys(c: Contact) -> List[str]:
+    keys = []
+    phone = normalize_phone(str(c.get("phone", "") or ""))[-10:]
+    if len(phone) >= 7:
+        keys.append(f"p:{phone}")
+    email = normalize_email(c.get("email", "") or "")
+    if email:
+        keys.append(f"e:{email}")
+    return keys
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) with bands * rows == num_perm whose LSH threshold
+    (1/bands) ** (1/rows) is closest to the requested similarity."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class MinHasher:
+    """num_perm multiply-add-shift hash functions over 64-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1350) -> None:
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        x = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                         for s in items), dtype=np.uint64)
+        # uint64 arithmetic wraps mod 2**64, which is what the hash family wants.
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) >> np.uint64(32)).min(axis=1)
+
+
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def find_fuzzy_duplicates(contacts_db: ContactsDB, threshold: float = 0.7, num_perm: int = 64,
+                          max_bucket: int = 500) -> Dict[str, Any]:
+    """Return {"fuzzy_duplicates": [[ids...], ...]} for clusters of near-duplicate contacts.
+
+    threshold is the estimated Jaccard similarity of the shingle sets a pair
+    needs to be linked. Buckets larger than max_bucket (e.g. a shared office
+    phone) are skipped so the work stays sub-quadratic.
+    """
+    hasher = MinHasher(num_perm)
+    bands, rows = lsh_bands(num_perm, threshold)
+    ids: List[str] = []
+    sigs: List[np.ndarray] = []
+    buckets: Dict[Any, List[int]] = {}
+    for cid, c in contacts_db.items():
+        sh = shingles(c)
+        if not sh:
+            continue
+        i = len(ids)
+        ids.append(cid)
+        sig = hasher.signature(sh)
+        sigs.append(sig)
+        for band in range(bands):
+            buckets.setdefault((band, sig[band * rows:(band + 1) * rows].tobytes()), []).append(i)
+        for key in blocking_keys(c):
+            buckets.setdefault(key, []).append(i)
+
+    uf = _UnionFind(len(ids))
+    checked: Set[Tuple[int, int]] = set()
+    for members in buckets.values():
+        if len(members) < 2 or len(members) > max_bucket:
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                if (i, j) in checked or uf.find(i) == uf.find(j):
+                    continue
+                checked.add((i, j))
+                if np.count_nonzero(sigs[i] == sigs[j]) >= threshold * num_perm:
+                    uf.union(i, j)
+
+    clusters: Dict[int, List[str]] = {}
+    for i, cid in enumerate(ids):
+        clusters.setdefault(uf.find(i), []).append(cid)
+    return {"fuzzy_duplicates": [g for g in clusters.values() if len(g) >= 2]}
@@ -0,0 +1,151 @@
+"""Delta snapshots: save only the contacts that changed since the last save.
+
+IndexedContactsDB marks a contact dirty whenever it is written or
+deleted (update_contact and merge_contacts replace the record, so they
+count). save_contacts_to_file() on a store that was loaded from, or last
+saved to, the same file then writes a small delta next to the base
+snapshot instead of rewriting it:
+
+    contacts.json                 base snapshot
+    contacts.json.delta.000001    {"base": [size, mtime_ns], "seq": 1, "_next_id": 42,
+    contacts.json.delta.000002     "set": {id: contact, ...}, "deleted": [id, ...]}
+
+Each delta records the size and mtime of the base it extends, so deltas
+left behind by a base that has since been rewritten are ignored. Once
+there are CONSOLIDATE_EVERY deltas, or they hold more than
+CONSOLIDATE_RATIO of the DB, the next save writes a fresh base and
+removes them. load_contacts_from_file() applies the deltas in order.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from contact_manager import NEXT_ID_KEY, Contact, ContactsDB, contact_id_number, json_default, write_snapshot
+
+DELTA_SUFFIX = ".delta."
+CONSOLIDATE_EVERY = 16
+CONSOLIDATE_RATIO = 0.25
+
+Stamp = Tuple[int, int]
+
+
+@dataclass
+class DeltaState:
+    """Where a store's base snapshot is and how many deltas sit on top of it."""
+    filename: str
+    base: Stamp
+    seq: int = 0
+    records: int = 0
+
+
+def base_stamp(filename: str) -> Optional[Stamp]:
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def delta_path(filename: str, seq: int) -> str:
+    return f"{filename}{DELTA_SUFFIX}{seq:06d}"
+
+
+def delta_files(filename: str) -> List[Tuple[int, str]]:
+    """Return (seq, path) for every delta file of filename, in order."""
+    directory = os.path.dirname(filename) or "."
+    prefix = os.path.basename(filename) + DELTA_SUFFIX
+    out = []
+    for name in os.listdir(directory):
+        seq = name[len(prefix):]
+        if name.startswith(prefix) and seq.isdigit():
+            out.append((int(seq), os.path.join(directory, name)))
+    return sorted(out)
+
+
+def iter_deltas(filename: str, base: Optional[Stamp], after: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield the deltas written on top of the base with this stamp, from seq after + 1 on."""
+    if base is None:
+        return
+    for seq, path in delta_files(filename):
+        if seq <= after:
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                delta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        if tuple(delta.get("base", ())) == base:
+            yield delta
+
+
+def apply_deltas(filename: str, contacts: Dict[str, Contact]) -> Tuple[Optional[DeltaState], int]:
+    """Apply filename's deltas to contacts in place.
+
+    Returns (state, next_id): the DeltaState for further delta saves (None
+    if there is no base snapshot) and one past the highest contact number
+    the deltas mention.
+    """
+    base = base_stamp(filename)
+    if base is None:
+        return None, 0
+    state = DeltaState(filename, base)
+    next_id = 0
+    for delta in iter_deltas(filename, base):
+        changed = delta.get("set", {})
+        contacts.update(changed)
+        for cid in delta.get("deleted", []):
+            contacts.pop(cid, None)
+        next_id = max([next_id, delta.get(NEXT_ID_KEY, 0)] + [contact_id_number(cid) + 1 for cid in changed])
+        state.seq = delta["seq"]
+        state.records += len(changed) + len(delta.get("deleted", []))
+    return state, next_id
+
+
+def remove_deltas(filename: str) -> None:
+    for _, path in delta_files(filename):
+        os.remove(path)
+
+
+def write_base(contacts_db: ContactsDB, filename: str) -> None:
+    """Write a full snapshot, drop the deltas and the journal, and start tracking from it."""
+    from contact_journal import clear_journal
+    write_snapshot(contacts_db, filename)
+    remove_deltas(filename)
+    clear_journal(filename)
+    contacts_db.delta_state = DeltaState(filename, base_stamp(filename))
+    contacts_db.dirty.clear()
+
+
+def save_incremental(contacts_db: ContactsDB, filename: str) -> None:
+    """Save a dirty-tracking store to filename, as a delta when possible.
+
+    A full base is written instead when the store has no base at filename
+    (or the base was rewritten by someone else), and when the deltas are
+    due for consolidation.
+    """
+    state: Optional[DeltaState] = contacts_db.delta_state
+    dirty = contacts_db.dirty
+    if (state is None or state.filename != filename or base_stamp(filename) != state.base
+            or state.seq >= CONSOLIDATE_EVERY
+            or state.records + len(dirty) > CONSOLIDATE_RATIO * len(contacts_db)):
+        write_base(contacts_db, filename)
+        return
+    if not dirty:
+        return
+    changed = {cid: contacts_db[cid] for cid in dirty if cid in contacts_db}
+    deleted = [cid for cid in dirty if cid not in contacts_db]
+    seq = state.seq + 1
+    delta = {"base": list(state.base), "seq": seq, NEXT_ID_KEY: getattr(contacts_db, "next_id", 1),
+             "set": changed, "deleted": deleted}
+    path = delta_path(filename, seq)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(delta, f, ensure_ascii=False, default=json_default)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    state.seq = seq
+    state.records += len(dirty)
+    dirty.clear()
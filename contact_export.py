@@ -0,0 +1,153 @@
+"""Streaming contact export in text, CSV, vCard 3.0 and JSON Lines.
+
+iter_export() yields the export a chunk of contacts at a time, and
+export_contacts() writes those chunks to any file-like object with one
+write() per chunk. Memory use depends on chunk_size, not on how many
+contacts are exported.
+
+    with open("work.vcf", "w", encoding="utf-8", newline="") as out:
+        export_contacts(db, out, "vcard", category="work")
+
+Contacts can be selected by category (using the store's category index
+when it has one) and/or by any where(contact_id, contact) predicate.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from contact_manager import Contact, ContactsDB, contact_text_lines, json_default
+
+Predicate = Callable[[str, Contact], bool]
+
+CSV_COLUMNS = ("id", "first_name", "last_name", "phone", "email", "street", "city", "state", "zip_code",
+               "category", "notes", "created_date", "last_modified")
+ADDRESS_FIELDS = ("street", "city", "state", "zip_code")
+
+
+def select_contacts(contacts_db: ContactsDB, category: Optional[str] = None,
+                    where: Optional[Predicate] = None) -> Iterator[Tuple[str, Contact]]:
+    """Yield (id, contact) pairs matching category (if given) and where (if given)."""
+    items: Iterable[Tuple[str, Contact]] = contacts_db.items()
+    cat = None
+    if category is not None:
+        cat = category.strip().lower()
+        lookup = getattr(contacts_db, "ids_by_category", None)
+        if lookup is not None and cat:
+            items = ((cid, contacts_db[cid]) for cid in lookup(cat))
+    for cid, c in items:
+        if cat is not None and (c.get("category", "") or "").strip().lower() != cat:
+            continue
+        if where is not None and not where(cid, c):
+            continue
+        yield cid, c
+
+
+# --- formatters: each turns a chunk of (id, contact) pairs into text ---
+
+def _text(rows: List[Tuple[str, Contact]]) -> str:
+    return "".join("\n".join(contact_text_lines(cid, c)) + "\n" for cid, c in rows)
+
+
+def _csv_row(cid: str, c: Contact) -> List[str]:
+    addr = c.get("address", {}) or {}
+    row = {k: c.get(k, "") for k in CSV_COLUMNS}
+    row.update({k: addr.get(k, "") for k in ADDRESS_FIELDS})
+    row["id"] = cid
+    return ["" if row[k] is None else str(row[k]) for k in CSV_COLUMNS]
+
+
+def _csv(rows: List[Tuple[str, Contact]]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(_csv_row(cid, c) for cid, c in rows)
+    return buf.getvalue()
+
+
+def _vcard_escape(value: object) -> str:
+    text = "" if value is None else str(value)
+    return (text.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _vcard_fold(line: str) -> str:
+    """Fold a content line at 75 characters as RFC 2425 asks."""
+    if len(line) <= 75:
+        return line
+    parts = [line[:75]] + [" " + line[i:i + 74] for i in range(75, len(line), 74)]
+    return "\r\n".join(parts)
+
+
+def vcard(cid: str, c: Contact) -> str:
+    e = _vcard_escape
+    first, last = c.get("first_name", ""), c.get("last_name", "")
+    addr = c.get("address", {}) or {}
+    lines = ["BEGIN:VCARD", "VERSION:3.0", f"UID:{e(cid)}",
+             f"N:{e(last)};{e(first)};;;", f"FN:{e(f'{first} {last}'.strip())}"]
+    if c.get("phone"):
+        lines.append(f"TEL;TYPE=VOICE:{e(c['phone'])}")
+    if c.get("email"):
+        lines.append(f"EMAIL;TYPE=INTERNET:{e(c['email'])}")
+    if any(addr.get(k) for k in ADDRESS_FIELDS):
+        lines.append("ADR;TYPE=HOME:;;" + ";".join(e(addr.get(k, "")) for k in ADDRESS_FIELDS) + ";")
+    if c.get("category"):
+        lines.append(f"CATEGORIES:{e(c['category'])}")
+    if c.get("notes"):
+        lines.append(f"NOTE:{e(c['notes'])}")
+    if c.get("last_modified"):
+        lines.append(f"REV:{e(c['last_modified'])}")
+    lines.append("END:VCARD")
+    return "".join(_vcard_fold(line) + "\r\n" for line in lines)
+
+
+def _vcard(rows: List[Tuple[str, Contact]]) -> str:
+    return "".join(vcard(cid, c) for cid, c in rows)
+
+
+def _jsonl(rows: List[Tuple[str, Contact]]) -> str:
+    return "".join(json.dumps({"id": cid, **c}, ensure_ascii=False, default=json_default) + "\n"
+                   for cid, c in rows)
+
+
+FORMATTERS: Dict[str, Callable[[List[Tuple[str, Contact]]], str]] = {
+    "text": _text, "csv": _csv, "vcard": _vcard, "jsonl": _jsonl,
+}
+
+
+def iter_export(contacts_db: ContactsDB, fmt: str = "text", category: Optional[str] = None,
+                where: Optional[Predicate] = None, chunk_size: int = 1000) -> Iterator[str]:
+    """Yield the export as strings of up to chunk_size contacts each (CSV starts with a header)."""
+    try:
+        formatter = FORMATTERS[fmt]
+    except KeyError:
+        raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(FORMATTERS)}") from None
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerow(CSV_COLUMNS)
+        yield buf.getvalue()
+    chunk: List[Tuple[str, Contact]] = []
+    for row in select_contacts(contacts_db, category, where):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield formatter(chunk)
+            chunk = []
+    if chunk:
+        yield formatter(chunk)
+
+
+def export_contacts(contacts_db: ContactsDB, out: TextIO, fmt: str = "text", category: Optional[str] = None,
+                    where: Optional[Predicate] = None, chunk_size: int = 1000) -> int:
+    """Write the export to out, one write() per chunk. Returns the number of contacts written."""
+    count = 0
+
+    def counting(cid: str, c: Contact) -> bool:
+        nonlocal count
+        if where is not None and not where(cid, c):
+            return False
+        count += 1
+        return True
+
+    for text in iter_export(contacts_db, fmt, category, counting, chunk_size):
+        out.write(text)
+    return count
@@ -0,0 +1,255 @@
+"""Bulk import of CSV and vCard files, parsed in a process pool.
+
+import_contacts() streams the input, so memory use depends on chunk_size
+and the number of workers rather than on the size of the file:
+
+1. The parent reads the file a record at a time (a CSV row, which may span
+   lines inside quotes, or one BEGIN:VCARD..END:VCARD card) and hands out
+   chunks of chunk_size raw records.
+2. Workers parse each chunk into contact dicts and check them against the
+   same required fields as add_contact.
+3. The parent inserts each parsed chunk, in file order, through
+   add_contacts_bulk. At most two chunks per worker are in flight.
+
+    result = import_contacts(db, "export.csv")
+    result["rejected"]  # [(record_number, reason), ...]
+
+CSV headers may use this repo's export columns or common variants such as
+"First Name", "Surname", "E-mail Address" or "Postal Code".
+"""
+from __future__ import annotations
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from contact_manager import Contact, ContactsDB, add_contacts_bulk, missing_required_fields, now_iso
+
+FORMATS = ("csv", "vcard")
+EXTENSIONS = {".csv": "csv", ".vcf": "vcard", ".vcard": "vcard"}
+CONTACT_FIELDS = ("first_name", "last_name", "phone", "email", "category", "notes", "created_date", "last_modified")
+ADDRESS_FIELDS = ("street", "city", "state", "zip_code")
+HEADER_ALIASES = {
+    "first": "first_name", "firstname": "first_name", "given_name": "first_name",
+    "last": "last_name", "lastname": "last_name", "surname": "last_name", "family_name": "last_name",
+    "phone_number": "phone", "telephone": "phone", "mobile": "phone", "mobile_phone": "phone",
+    "e_mail": "email", "email_address": "email", "e_mail_address": "email",
+    "address": "street", "street_address": "street", "region": "state", "province": "state",
+    "zip": "zip_code", "zipcode": "zip_code", "postal_code": "zip_code", "postcode": "zip_code",
+    "group": "category", "note": "notes", "created": "created_date", "modified": "last_modified",
+}
+
+Parsed = Tuple[List[Tuple[int, Contact]], List[Tuple[int, str]]]
+
+
+def _contact(values: Dict[str, str]) -> Contact:
+    """Build a contact in the add_contact shape from flat field values."""
+    today = now_iso()
+    return {
+        "first_name": values.get("first_name", "").strip(),
+        "last_name": values.get("last_name", "").strip(),
+        "phone": values.get("phone", "").strip(),
+        "email": values.get("email", "").strip(),
+        "address": {k: values.get(k, "").strip() for k in ADDRESS_FIELDS},
+        "category": values.get("category", "").strip().lower() or "personal",
+        "notes": values.get("notes", ""),
+        "created_date": values.get("created_date", "").strip() or today,
+        "last_modified": values.get("last_modified", "").strip() or today,
+    }
+
+
+def _validated(pos: int, values: Dict[str, str], parsed: List[Tuple[int, Contact]],
+               rejected: List[Tuple[int, str]]) -> None:
+    c = _contact(values)
+    missing = missing_required_fields(c)
+    if missing:
+        rejected.append((pos, "missing " + ", ".join(missing)))
+    else:
+        parsed.append((pos, c))
+
+
+# --- CSV ---
+
+def csv_columns(header: List[str]) -> List[Optional[str]]:
+    """Map each header cell to a contact field (None for columns that aren't imported)."""
+    fields = set(CONTACT_FIELDS) | set(ADDRESS_FIELDS)
+    out: List[Optional[str]] = []
+    for name in header:
+        key = "_".join(name.strip().lower().replace("-", " ").split())
+        key = HEADER_ALIASES.get(key, key)
+        out.append(key if key in fields else None)
+    return out
+
+
+def _parse_csv(header: str, records: List[str], start: int) -> Parsed:
+    columns = csv_columns(next(csv.reader([header])))
+    parsed: List[Tuple[int, Contact]] = []
+    rejected: List[Tuple[int, str]] = []
+    for pos, record in enumerate(records, start):
+        try:
+            row = next(csv.reader([record]))
+        except csv.Error as e:
+            rejected.append((pos, f"bad CSV: {e}"))
+            continue
+        if len(row) > len(columns):
+            rejected.append((pos, f"expected {len(columns)} columns, got {len(row)}"))
+            continue
+        _validated(pos, {f: v for f, v in zip(columns, row) if f}, parsed, rejected)
+    return parsed, rejected
+
+
+def _csv_records(f: TextIO) -> Iterator[str]:
+    """Yield raw CSV records. A record continues while it has an open quote."""
+    record = ""
+    for line in f:
+        record += line
+        if record.count('"') % 2 == 0:
+            if record.strip():
+                yield record
+            record = ""
+    if record.strip():
+        yield record
+
+
+# --- vCard ---
+
+def _split_escaped(value: str, sep: str) -> List[str]:
+    """Split on sep, skipping backslash-escaped separators, and unescape the parts."""
+    parts, cur, i = [], [], 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            nxt = value[i + 1]
+            cur.append("\n" if nxt in "nN" else nxt)
+            i += 2
+            continue
+        if ch == sep:
+            parts.append("".join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+        i += 1
+    parts.append("".join(cur))
+    return parts
+
+
+def parse_vcard(text: str) -> Dict[str, str]:
+    """Return the flat contact fields of one vCard (2.1/3.0/4.0 plain-text properties)."""
+    lines: List[str] = []
+    for raw in text.splitlines():
+        if raw[:1] in (" ", "\t") and lines:
+            lines[-1] += raw[1:]
+        elif raw.strip():
+            lines.append(raw)
+    values: Dict[str, str] = {}
+    full_name = ""
+    for line in lines:
+        name, sep, value = line.partition(":")
+        if not sep:
+            continue
+        prop = name.split(";", 1)[0].rsplit(".", 1)[-1].upper()
+        if prop == "N" and "last_name" not in values:
+            parts = _split_escaped(value, ";") + [""]
+            values["last_name"], values["first_name"] = parts[0], parts[1]
+        elif prop == "FN":
+            full_name = _split_escaped(value, ";")[0]
+        elif prop == "TEL":
+            values.setdefault("phone", _split_escaped(value, ";")[0])
+        elif prop == "EMAIL":
+            values.setdefault("email", _split_escaped(value, ";")[0])
+        elif prop == "ADR" and "street" not in values:
+            parts = _split_escaped(value, ";") + [""] * 7
+            values.update(zip(ADDRESS_FIELDS, parts[2:6]))
+        elif prop == "CATEGORIES":
+            values.setdefault("category", _split_escaped(value, ",")[0])
+        elif prop == "NOTE":
+            values.setdefault("notes", _split_escaped(value, ";")[0])
+        elif prop == "REV":
+            values.setdefault("last_modified", value)
+    if not (values.get("first_name") or values.get("last_name")) and full_name:
+        first, _, last = full_name.strip().rpartition(" ")
+        values["first_name"], values["last_name"] = (first, last) if first else (last, "")
+    return values
+
+
+def _parse_vcards(header: str, records: List[str], start: int) -> Parsed:
+    parsed: List[Tuple[int, Contact]] = []
+    rejected: List[Tuple[int, str]] = []
+    for pos, record in enumerate(records, start):
+        _validated(pos, parse_vcard(record), parsed, rejected)
+    return parsed, rejected
+
+
+def _vcard_records(f: TextIO) -> Iterator[str]:
+    card: List[str] = []
+    for line in f:
+        if not card and line.strip().upper() != "BEGIN:VCARD":
+            continue
+        card.append(line)
+        if line.strip().upper() == "END:VCARD":
+            yield "".join(card)
+            card = []
+
+
+PARSERS = {"csv": _parse_csv, "vcard": _parse_vcards}
+
+
+def _chunks(f: TextIO, fmt: str, chunk_size: int) -> Iterator[Tuple[str, List[str], int]]:
+    """Yield (header, raw records, number of the first record) chunks."""
+    records = _csv_records(f) if fmt == "csv" else _vcard_records(f)
+    header = next(records, "") if fmt == "csv" else ""
+    chunk: List[str] = []
+    start = 0
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield header, chunk, start
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield header, chunk, start
+
+
+def import_contacts(contacts_db: ContactsDB, source: Any, fmt: Optional[str] = None,
+                    workers: Optional[int] = None, chunk_size: int = 5000) -> Dict[str, Any]:
+    """Import a CSV or vCard file (a path or an open text file) into contacts_db.
+
+    fmt is "csv" or "vcard"; for paths it defaults from the extension.
+    workers defaults to the CPU count; workers=1 parses in this process.
+    Returns {"added": [ids...], "rejected": [(record_number, reason), ...]}
+    with 0-based record numbers (not counting the CSV header), in file order.
+    """
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(str(source))[1].lower(), "")
+    if fmt not in PARSERS:
+        raise ValueError(f"unknown import format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8-sig", newline="") as f:
+            return import_contacts(contacts_db, f, fmt, workers, chunk_size)
+    parse = PARSERS[fmt]
+    workers = workers or os.cpu_count() or 1
+    added: List[str] = []
+    rejected: List[Tuple[int, str]] = []
+
+    def insert(result: Parsed) -> None:
+        parsed, bad = result
+        out = add_contacts_bulk(contacts_db, (c for _, c in parsed), batch_size=max(len(parsed), 1))
+        added.extend(out["added"])
+        bad = bad + [(parsed[i][0], reason) for i, reason in out["rejected"]]
+        rejected.extend(sorted(bad))
+
+    if workers <= 1:
+        for header, records, start in _chunks(source, fmt, chunk_size):
+            insert(parse(header, records, start))
+        return {"added": added, "rejected": rejected}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque = deque()
+        for header, records, start in _chunks(source, fmt, chunk_size):
+            pending.append(pool.submit(parse, header, records, start))
+            if len(pending) >= 2 * workers:
+                insert(pending.popleft().result())
+        while pending:
+            insert(pending.popleft().result())
+    return {"added": added, "rejected": rejected}
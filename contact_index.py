@@ -0,0 +1,369 @@
+"""Indexed contact store for contact_manager.
+
+IndexedContactsDB works anywhere a plain ContactsDB dict does, but keeps
+hash indexes on phone, email, first/last name and category up to date as
+contacts are added, replaced or removed. The lookup functions in
+contact_manager check for the ``ids_by_*`` methods and use them instead of
+scanning every contact. Each contact's match keys (E.164 phone, casefolded
+email and name) are computed once when it is written, so duplicate checks
+group the stored keys instead of normalizing every contact again.
+
+Names, and the RANGE_FIELDS (last name, created date, zip code), are also
+kept in sorted views (contact_sorted.SortedList) for prefix and range
+lookups in O(log n + k).
+"""
+from __future__ import annotations
+
+from collections import UserDict
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from contact_manager import (ID_PREFIX, RANGE_FIELDS, RANGE_MAX, Contact, ContactRecord, MatchKeys,
+                             contact_id_number, fold, match_keys, query_key, statistics_keys)
+from contact_sorted import SortedList
+
+# field name -> {key: {contact_id: None}}  (dicts keep insertion order)
+Index = Dict[str, Dict[str, None]]
+INDEXED_FIELDS = ("phone", "email", "first_name", "last_name", "category")
+GRAM = 3
+
+
+def index_keys(c: Contact, keys: Optional[MatchKeys] = None) -> Tuple[str, ...]:
+    """Return the normalized index key for each field in INDEXED_FIELDS.
+
+    Pass the contact's match keys if they are already computed.
+    """
+    keys = keys or match_keys(c)
+    return (keys.phone, keys.email, fold(c.get("first_name")), fold(c.get("last_name")), fold(c.get("category")))
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _bump(counts: Dict[str, int], key: str, delta: int) -> None:
+    n = counts.get(key, 0) + delta
+    if n:
+        counts[key] = n
+    else:
+        del counts[key]
+
+
+class RunningStatistics:
+    """The counts behind generate_contact_statistics, updated one contact at a time."""
+
+    def __init__(self) -> None:
+        self.by_category: Dict[str, int] = {}
+        self.by_state: Dict[str, int] = {}
+        self.by_area_code: Dict[str, int] = {}
+        self.without_email = 0
+
+    def add(self, keys: Tuple[str, str, str, bool], delta: int = 1) -> None:
+        cat, st, ac, has_email = keys
+        _bump(self.by_category, cat, delta)
+        if st:
+            _bump(self.by_state, st, delta)
+        if ac:
+            _bump(self.by_area_code, ac, delta)
+        if not has_email:
+            self.without_email += delta
+
+    def remove(self, keys: Tuple[str, str, str, bool]) -> None:
+        self.add(keys, -1)
+
+    def counts(self) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], int]:
+        return dict(self.by_category), dict(self.by_state), dict(self.by_area_code), self.without_email
+
+
+class IndexedContactsDB(UserDict):
+    """A ContactsDB that maintains secondary indexes on every write.
+
+    It also keeps ``next_id``, a counter that only moves forward, so new
+    contacts never reuse the id of a deleted one, and running statistics
+    so generate_contact_statistics doesn't have to walk every contact.
+
+    With compact_records=True every contact is stored as a slotted
+    ContactRecord, which takes well under half the memory of a dict.
+    """
+
+    REBUILD_SHARE = 0.25
+
+    def __init__(self, contacts: Optional[Dict[str, Contact]] = None, next_id: int = 1,
+                 compact_records: bool = False) -> None:
+        self.compact_records = compact_records
+        self.indexes: Dict[str, Index] = {f: {} for f in INDEXED_FIELDS}
+        self._keys: Dict[str, Tuple[str, ...]] = {}
+        self._match: Dict[str, MatchKeys] = {}
+        # trigram -> {contact_id: None} over lowercased first and last names
+        self.name_grams: Index = {}
+        # sorted (lowercased name, contact_id) pairs, one per first and last name
+        self.name_order = SortedList()
+        # field -> sorted (key, contact_id) pairs for the RANGE_FIELDS
+        self.views: Dict[str, SortedList] = {f: SortedList() for f in RANGE_FIELDS}
+        self._view_keys: Dict[str, Tuple[str, ...]] = {}
+        self._bulk = False
+        # id -> its (keys, view_keys) in the sorted lists when the transaction began (None: not there)
+        self._touched: Dict[str, Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]] = {}
+        self.stats = RunningStatistics()
+        self._stat_keys: Dict[str, Tuple[str, str, str, bool]] = {}
+        self.next_id = next_id
+        # ids written or deleted since the last save (see contact_delta)
+        self.dirty: Dict[str, None] = {}
+        self.delta_state = None
+        super().__init__(contacts)
+
+    # --- MutableMapping hooks ---
+
+    def __setitem__(self, contact_id: str, contact: Contact) -> None:
+        if self.compact_records:
+            contact = ContactRecord.from_dict(contact)
+        if contact_id in self.data:
+            self._unindex(contact_id)
+        self.data[contact_id] = contact
+        self._index(contact_id, contact)
+        self.dirty[contact_id] = None
+        n = contact_id_number(contact_id)
+        if n >= self.next_id:
+            self.next_id = n + 1
+
+    def __delitem__(self, contact_id: str) -> None:
+        del self.data[contact_id]
+        self._unindex(contact_id)
+        self.dirty[contact_id] = None
+
+    def clear(self) -> None:
+        self.dirty.update(dict.fromkeys(self.data))
+        self.data.clear()
+        self._keys.clear()
+        self._match.clear()
+        self.name_grams.clear()
+        self.name_order = SortedList()
+        self.views = {f: SortedList() for f in RANGE_FIELDS}
+        self._view_keys.clear()
+        self.stats = RunningStatistics()
+        self._stat_keys.clear()
+        for idx in self.indexes.values():
+            idx.clear()
+
+    @contextmanager
+    def transaction(self) -> Iterator["IndexedContactsDB"]:
+        """Group many writes: the sorted name list and views are brought up
+        to date once at the end instead of on every write.
+
+        Only the contacts written in the transaction are moved in them,
+        unless those are more than REBUILD_SHARE of the book, when sorting
+        everything again is cheaper.
+        """
+        if self._bulk:
+            yield self
+            return
+        self._bulk = True
+        try:
+            yield self
+        finally:
+            self._bulk = False
+            touched, self._touched = self._touched, {}
+            if len(touched) > len(self.data) * self.REBUILD_SHARE:
+                self.name_order = SortedList((name, cid) for cid, keys in self._keys.items()
+                                             for name in set(keys[2:4]) if name)
+                self.views = {f: SortedList((keys[i], cid) for cid, keys in self._view_keys.items() if keys[i])
+                              for i, f in enumerate(RANGE_FIELDS)}
+            else:
+                for cid, old in touched.items():
+                    if old is not None:
+                        self._sort_out(cid, *old)
+                    if cid in self._keys:
+                        self._sort_in(cid, self._keys[cid], self._view_keys[cid])
+
+    def update(self, other=(), /, **kwargs) -> None:
+        with self.transaction():
+            super().update(other, **kwargs)
+        if isinstance(other, IndexedContactsDB):
+            self.next_id = max(self.next_id, other.next_id)
+
+    def copy(self) -> "IndexedContactsDB":
+        return type(self)(self.data, next_id=self.next_id, compact_records=self.compact_records)
+
+    def allocate_id(self) -> str:
+        while f"{ID_PREFIX}{self.next_id:03d}" in self.data:
+            self.next_id += 1
+        return f"{ID_PREFIX}{self.next_id:03d}"
+
+    def reindex(self, contact_id: str) -> None:
+        """Refresh the index entries of a contact that was edited in place."""
+        self._unindex(contact_id)
+        self.dirty[contact_id] = None
+        if contact_id in self.data:
+            self._index(contact_id, self.data[contact_id])
+
+    def _index(self, contact_id: str, contact: Contact) -> None:
+        match = self._match[contact_id] = match_keys(contact)
+        keys = self._keys[contact_id] = index_keys(contact, match)
+        stat_keys = statistics_keys(contact)
+        self._stat_keys[contact_id] = stat_keys
+        self.stats.add(stat_keys)
+        for field, key in zip(INDEXED_FIELDS, keys):
+            if key:
+                self.indexes[field].setdefault(key, {})[contact_id] = None
+        for g in self._name_grams(keys):
+            self.name_grams.setdefault(g, {})[contact_id] = None
+        view_keys = self._view_keys[contact_id] = tuple(key_fn(contact) for key_fn in RANGE_FIELDS.values())
+        if self._bulk:
+            self._touched.setdefault(contact_id, None)
+        else:
+            self._sort_in(contact_id, keys, view_keys)
+
+    def _unindex(self, contact_id: str) -> None:
+        keys = self._keys.pop(contact_id, None)
+        if keys is None:
+            return
+        del self._match[contact_id]
+        self.stats.remove(self._stat_keys.pop(contact_id))
+        for field, key in zip(INDEXED_FIELDS, keys):
+            postings = self.indexes[field].get(key)
+            if postings is None:
+                continue
+            postings.pop(contact_id, None)
+            if not postings:
+                del self.indexes[field][key]
+        for g in self._name_grams(keys):
+            postings = self.name_grams.get(g)
+            if postings is not None:
+                postings.pop(contact_id, None)
+                if not postings:
+                    del self.name_grams[g]
+        view_keys = self._view_keys.pop(contact_id)
+        if self._bulk:
+            self._touched.setdefault(contact_id, (keys, view_keys))
+        else:
+            self._sort_out(contact_id, keys, view_keys)
+
+    def _sort_in(self, contact_id: str, keys: Tuple[str, ...], view_keys: Tuple[str, ...]) -> None:
+        """Add a contact's entries to the sorted name list and views."""
+        for name in set(keys[2:4]):
+            if name:
+                self.name_order.add((name, contact_id))
+        for field, key in zip(RANGE_FIELDS, view_keys):
+            if key:
+                self.views[field].add((key, contact_id))
+
+    def _sort_out(self, contact_id: str, keys: Tuple[str, ...], view_keys: Tuple[str, ...]) -> None:
+        for name in set(keys[2:4]):
+            if name:
+                self.name_order.discard((name, contact_id))
+        for field, key in zip(RANGE_FIELDS, view_keys):
+            if key:
+                self.views[field].discard((key, contact_id))
+
+    @staticmethod
+    def _name_grams(keys: Tuple[str, ...]) -> Set[str]:
+        return trigrams(keys[2]) | trigrams(keys[3])
+
+    # --- lookups (queries are normalized the same way as stored keys) ---
+
+    def _ids(self, field: str, key: str) -> List[str]:
+        return list(self.indexes[field].get(key, ()))
+
+    def ids_by_phone(self, phone: str) -> List[str]:
+        return self._ids("phone", query_key("phone", phone))
+
+    def ids_by_email(self, email: str) -> List[str]:
+        return self._ids("email", query_key("email", email))
+
+    def ids_by_category(self, category: str) -> List[str]:
+        return self._ids("category", query_key("text", category))
+
+    def ids_by_name(self, name: str) -> List[str]:
+        """Return ids whose first or last name equals ``name`` (case-insensitive)."""
+        key = query_key("text", name)
+        ids = dict.fromkeys(self._ids("first_name", key))
+        ids.update(dict.fromkeys(self._ids("last_name", key)))
+        return list(ids)
+
+    def ids_by_name_substring(self, term: str) -> List[str]:
+        """Return ids whose first or last name contains ``term`` (case-insensitive).
+
+        The trigram posting lists are intersected smallest first and the
+        survivors are checked against the names, so the cost follows the
+        number of candidates rather than the size of the database. Terms
+        shorter than a trigram fall back to checking every indexed name.
+        """
+        term = query_key("text", term)
+        if not term:
+            return []
+        if len(term) < GRAM:
+            candidates = list(self._keys)
+        else:
+            postings = sorted((self.name_grams.get(g, {}) for g in trigrams(term)), key=len)
+            candidates = [cid for cid in postings[0] if all(cid in p for p in postings[1:])]
+        return [cid for cid in candidates
+                if term in self._keys[cid][2] or term in self._keys[cid][3]]
+
+    def ids_by_name_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """Return up to ``limit`` ids whose first or last name starts with ``prefix``.
+
+        Matches come back in name order, found by bisecting the sorted name list.
+        """
+        prefix = query_key("text", prefix)
+        if not prefix:
+            return []
+        ids: Dict[str, None] = {}
+        for name, cid in self.name_order.irange((prefix, "")):
+            if len(ids) >= limit or not name.startswith(prefix):
+                break
+            ids[cid] = None
+        return list(ids)
+
+    def ids_in_range(self, field: str, lo: Optional[str] = None, hi: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[str]:
+        """Return ids whose ``field`` key is between lo and hi (inclusive), in key order.
+
+        field is one of RANGE_FIELDS and lo/hi are compared with the folded
+        keys; None leaves that end open. Costs O(log n + k) on the sorted view.
+        """
+        pairs = self.views[field].irange(None if lo is None else (lo, ""),
+                                         None if hi is None else (hi, RANGE_MAX))
+        return [cid for _, cid in islice(pairs, limit)]
+
+    def count_in_range(self, field: str, lo: Optional[str] = None, hi: Optional[str] = None) -> int:
+        """How many ids ids_in_range(field, lo, hi) returns, in O(log n)."""
+        return self.views[field].count_range(None if lo is None else (lo, ""),
+                                             None if hi is None else (hi, RANGE_MAX))
+
+    def count_ids(self, kind: str, value: str) -> Optional[int]:
+        """Estimate how many ids ids_by_<kind>(value) returns, without building the list.
+
+        Exact for phone, email and category; an upper bound for names and
+        name prefixes (first and last names are counted separately) and for
+        name substrings (the rarest trigram). Used by contact_query to pick
+        the most selective index.
+        """
+        if kind in ("phone", "email", "category"):
+            return len(self.indexes[kind].get(query_key(kind if kind != "category" else "text", value), ()))
+        key = query_key("text", value)
+        if kind == "name":
+            return len(self.indexes["first_name"].get(key, ())) + len(self.indexes["last_name"].get(key, ()))
+        if kind == "name_prefix":
+            return self.name_order.count_range((key, ""), (key + RANGE_MAX, ""))
+        if kind == "name_substring":
+            if len(key) < GRAM:
+                return len(self.data)
+            return min(len(self.name_grams.get(g, ())) for g in trigrams(key))
+        return None
+
+    def match_keys_of(self, contact_id: str) -> MatchKeys:
+        """The match keys stored when the contact was written."""
+        return self._match[contact_id]
+
+    def duplicate_groups(self, kind: str) -> List[List[str]]:
+        """find_duplicate_contacts() groups, from the stored keys instead of renormalizing."""
+        groups: Dict[str, List[str]] = {}
+        for cid in self.data:
+            key = getattr(self._match[cid], kind)
+            if key:
+                groups.setdefault(key, []).append(cid)
+        return [ids for ids in groups.values() if len(ids) >= 2]
+
+    def statistics_counts(self) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], int]:
+        return self.stats.counts()
@@ -0,0 +1,296 @@
+"""Append-only journal persistence for contact_manager.
+
+Instead of rewriting the whole JSON file after every change, a
+JournaledContactsDB appends one JSON line per change to ``<file>.log``:
+
+    {"op": "set", "id": "contact_007", "contact": {...}}
+    {"op": "del", "id": "contact_003"}
+    {"op": "clear"}
+
+Adds and updates are "set" records, deletes are "del", and a merge writes
+one of each. load_contacts_from_file() replays the log on top of the
+snapshot, and compact() folds the log back into the snapshot.
+
+Records reach the disk by group commit: they are buffered and written
+with a single fsync once commit_records of them are waiting or the
+oldest has waited commit_ms milliseconds, whichever comes first. The
+defaults (1 record, no timer) fsync every change. Larger groups trade a
+longer window of changes that a crash can lose for far fewer fsyncs;
+``python contact_journal.py`` measures the difference.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from contact_index import IndexedContactsDB
+from contact_manager import (Contact, contact_id_number, json_default, load_contacts_from_file, update_contact,
+                             write_snapshot)
+
+JOURNAL_SUFFIX = ".log"
+
+
+def journal_path(filename: str) -> str:
+    return filename + JOURNAL_SUFFIX
+
+
+def iter_journal(filename: str, start: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Yield (record, byte offset just past it) for journal lines from start on.
+
+    Stops at a torn last line left by a crash mid-write, so a reader can
+    pick up again from the last offset it saw.
+    """
+    try:
+        f = open(journal_path(filename), "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            pos += len(line)
+            yield rec, pos
+
+
+def recover_journal(filename: str) -> int:
+    """Cut a torn tail (from a crash mid-commit) off the journal. Returns the bytes dropped.
+
+    Replay already stops at a torn line, but new records appended after
+    it would never be read, so the tail is removed before journaling resumes.
+    """
+    end = 0
+    for _, end in iter_journal(filename):
+        pass
+    try:
+        size = os.path.getsize(journal_path(filename))
+    except FileNotFoundError:
+        return 0
+    if size > end:
+        with open(journal_path(filename), "r+b") as f:
+            f.truncate(end)
+            os.fsync(f.fileno())
+    return size - end
+
+
+def clear_journal(filename: str) -> None:
+    """Empty the journal next to filename, once a full snapshot has made it redundant."""
+    try:
+        with open(journal_path(filename), "r+b") as f:
+            f.truncate(0)
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        pass
+
+
+def replay_journal(filename: str, contacts: Dict[str, Contact]) -> int:
+    """Apply the journal next to filename to contacts in place.
+
+    Returns one past the highest contact number the journal mentions (0 if
+    there is no journal), so deleted ids are not handed out again. A torn
+    last line from a crash mid-write is ignored.
+    """
+    next_id = 0
+    for rec, _ in iter_journal(filename):
+        op = rec.get("op")
+        if op == "set":
+            contacts[rec["id"]] = rec["contact"]
+        elif op == "del":
+            contacts.pop(rec["id"], None)
+        elif op == "clear":
+            contacts.clear()
+        if "id" in rec:
+            next_id = max(next_id, contact_id_number(rec["id"]) + 1)
+    return next_id
+
+
+class JournaledContactsDB(IndexedContactsDB):
+    """An IndexedContactsDB that appends every change to a journal file.
+
+    Write cost is one JSON line per change, and one fsync per group of
+    commit_records changes (or per commit_ms milliseconds, checked by a
+    background thread). Writes made inside transaction() are committed
+    together when it ends. Once the log holds more records
+    than the DB holds contacts (and at least ``compact_min`` records), it
+    is compacted automatically, which keeps the log bounded while
+    snapshot rewrites stay rare.
+    """
+
+    def __init__(self, filename: str, contacts: Optional[Dict[str, Contact]] = None,
+                 next_id: int = 1, compact_min: int = 10_000, commit_records: int = 1,
+                 commit_ms: float = 0.0) -> None:
+        self._log = None
+        self._lock = threading.RLock()
+        self._pending: List[str] = []
+        self._pending_since = 0.0
+        self._group_depth = 0
+        super().__init__(contacts, next_id=next_id)
+        self.filename = filename
+        self.compact_min = compact_min
+        self.commit_records = max(commit_records, 1)
+        self.commit_ms = commit_ms
+        self.log_records = 0
+        self.syncs = 0
+        self._log = open(journal_path(filename), "a", encoding="utf-8")
+        self._closing = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if commit_ms > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="journal-commit", daemon=True)
+            self._flusher.start()
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        if self._log is None:
+            return
+        line = json.dumps(rec, ensure_ascii=False, default=json_default) + "\n"
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(line)
+            self.log_records += 1
+            if not self._group_depth and self._commit_due():
+                self.commit()
+        if self.log_records >= max(self.compact_min, len(self.data)):
+            self.compact()
+
+    def _commit_due(self) -> bool:
+        if len(self._pending) >= self.commit_records:
+            return True
+        return bool(self.commit_ms) and (time.monotonic() - self._pending_since) * 1000 >= self.commit_ms
+
+    def _flush_loop(self) -> None:
+        while not self._closing.wait(self.commit_ms / 1000):
+            with self._lock:
+                if not self._group_depth:
+                    self.commit()
+
+    def commit(self) -> None:
+        """Write the buffered records and fsync them."""
+        with self._lock:
+            if not self._pending or self._log is None:
+                return
+            self._log.write("".join(self._pending))
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._pending.clear()
+            self.syncs += 1
+
+    @contextmanager
+    def transaction(self) -> Iterator["JournaledContactsDB"]:
+        """Group many writes into one index rebuild and one journal commit."""
+        with super().transaction():
+            self._group_depth += 1
+            try:
+                yield self
+            finally:
+                self._group_depth -= 1
+                if not self._group_depth:
+                    self.commit()
+
+    def __setitem__(self, contact_id: str, contact: Contact) -> None:
+        super().__setitem__(contact_id, contact)
+        self._append({"op": "set", "id": contact_id, "contact": contact})
+
+    def __delitem__(self, contact_id: str) -> None:
+        super().__delitem__(contact_id)
+        self._append({"op": "del", "id": contact_id})
+
+    def clear(self) -> None:
+        super().clear()
+        self._append({"op": "clear"})
+
+    def reindex(self, contact_id: str) -> None:
+        super().reindex(contact_id)
+        if contact_id in self.data:
+            self._append({"op": "set", "id": contact_id, "contact": self.data[contact_id]})
+
+    def copy(self) -> IndexedContactsDB:
+        return IndexedContactsDB(self.data, next_id=self.next_id)
+
+    def compact(self) -> None:
+        """Write a fresh snapshot and start an empty journal."""
+        with self._lock:
+            if self._log is None:
+                return
+            from contact_delta import remove_deltas
+            # Buffered records are part of the snapshot, so they are dropped, not written.
+            write_snapshot(self, self.filename)
+            remove_deltas(self.filename)
+            self._log.close()
+            self._log = open(journal_path(self.filename), "w", encoding="utf-8")
+            self._pending.clear()
+            self.log_records = 0
+            self.dirty.clear()
+
+    def close(self) -> None:
+        if self._flusher is not None:
+            self._closing.set()
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            if self._log is not None:
+                self.commit()
+                self._log.close()
+                self._log = None
+
+    def __enter__(self) -> "JournaledContactsDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_journal(filename: str, compact_min: int = 10_000, commit_records: int = 1,
+                 commit_ms: float = 0.0) -> JournaledContactsDB:
+    """Load filename (snapshot + journal) and keep journaling changes to it.
+
+    A torn tail left in the journal by a crash is cut off first.
+    """
+    recover_journal(filename)
+    loaded = load_contacts_from_file(filename)
+    return JournaledContactsDB(filename, loaded.data, next_id=loaded.next_id, compact_min=compact_min,
+                               commit_records=commit_records, commit_ms=commit_ms)
+
+
+def benchmark(ops: int = 5000, batch_sizes: Tuple[int, ...] = (1, 10, 100, 1000),
+              directory: Optional[str] = None) -> List[Dict[str, float]]:
+    """Time `ops` update_contact calls against a journal for each group-commit size.
+
+    directory picks the disk to measure (the system temp dir by default),
+    since fsync cost is what the batch size amortizes.
+    """
+    results = []
+    for batch in batch_sizes:
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            db = JournaledContactsDB(os.path.join(tmp, "bench.json"), compact_min=ops + 1000,
+                                     commit_records=batch)
+            with db.transaction():
+                for i in range(1000):
+                    db[f"contact_{i + 1:03d}"] = {"first_name": f"F{i}", "last_name": "L",
+                                                  "phone": f"402-555-{i:04d}", "notes": ""}
+            syncs = db.syncs
+            start = time.perf_counter()
+            for i in range(ops):
+                update_contact(db, f"contact_{i % 1000 + 1:03d}", {"notes": f"n{i}"})
+            db.commit()
+            elapsed = time.perf_counter() - start
+            results.append({"batch": batch, "ops": ops, "seconds": round(elapsed, 4),
+                            "ops_per_sec": round(ops / elapsed, 1), "fsyncs": db.syncs - syncs})
+            db.close()
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000):
+        print(f"batch {row['batch']:>5}: {row['ops_per_sec']:>10.1f} ops/s  "
+              f"({row['fsyncs']} fsyncs, {row['seconds']}s)")
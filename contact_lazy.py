@@ -0,0 +1,278 @@
+"""Lazy, offset-indexed view of a saved contacts file.
+
+open_lazy() maps a snapshot written by save_contacts_to_file without
+parsing it. A sidecar index (``<file>.idx``) records the byte range of
+every contact, so startup only reads the index. A contact is parsed from
+the memory-mapped file only when it is looked up.
+
+The index is keyed to the snapshot's size and mtime and is rebuilt only
+when the snapshot itself is rewritten. Delta snapshots (see contact_delta)
+and changes appended to the journal (see contact_journal) are read
+incrementally by refresh() and kept in a small in-memory overlay.
+
+Writes to the view go to the overlay too. They are kept across refresh()
+(re-applied on top of whatever the files now hold) until compact(), or
+save_contacts_to_file(view, view.filename), writes the whole view back as
+a new snapshot.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from contact_delta import iter_deltas
+from contact_journal import iter_journal, journal_path
+from contact_manager import ID_PREFIX, NEXT_ID_KEY, Contact, contact_id_number, write_snapshot
+
+INDEX_SUFFIX = ".idx"
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+def index_path(filename: str) -> str:
+    return filename + INDEX_SUFFIX
+
+
+def scan_offsets(text: str) -> Iterator[Tuple[str, int, int, Any]]:
+    """Yield (key, start, end, value) for each member of a top-level JSON object.
+
+    Offsets are character positions in text.
+    """
+    dec = json.JSONDecoder()
+    pos = _WS.match(text, 0).end()
+    if text[pos:pos + 1] != "{":
+        return
+    pos = _WS.match(text, pos + 1).end()
+    if text[pos:pos + 1] == "}":
+        return
+    while True:
+        key, pos = dec.raw_decode(text, pos)
+        pos = _WS.match(text, pos).end()
+        if text[pos:pos + 1] != ":":
+            raise ValueError(f"expected ':' at {pos}")
+        start = _WS.match(text, pos + 1).end()
+        value, end = dec.raw_decode(text, start)
+        yield key, start, end, value
+        pos = _WS.match(text, end).end()
+        if text[pos:pos + 1] == ",":
+            pos = _WS.match(text, pos + 1).end()
+        elif text[pos:pos + 1] == "}":
+            return
+        else:
+            raise ValueError(f"expected ',' or '}}' at {pos}")
+
+
+def build_offset_index(filename: str) -> Dict[str, Any]:
+    """Scan the snapshot once and return its sidecar index."""
+    st = os.stat(filename)
+    with open(filename, "r", encoding="utf-8") as f:
+        text = f.read()
+    next_id = 1
+    ids: List[str] = []
+    spans: List[int] = []
+    for key, start, end, value in scan_offsets(text):
+        if key == NEXT_ID_KEY:
+            next_id = value if isinstance(value, int) else 1
+            continue
+        ids.append(key)
+        spans.extend((start, end))
+    if not text.isascii():
+        # Turn character offsets into byte offsets (spans are in increasing order).
+        byte_pos, last = 0, 0
+        for i, off in enumerate(spans):
+            byte_pos += len(text[last:off].encode("utf-8"))
+            last = off
+            spans[i] = byte_pos
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "next_id": next_id, "ids": ids, "spans": spans}
+
+
+def load_offset_index(filename: str) -> Tuple[Dict[str, Any], bool]:
+    """Return (index, rebuilt), reusing the sidecar if it still matches the snapshot."""
+    st = os.stat(filename)
+    try:
+        with open(index_path(filename), "r", encoding="utf-8") as f:
+            idx = json.load(f)
+        if idx.get("size") == st.st_size and idx.get("mtime_ns") == st.st_mtime_ns:
+            return idx, False
+    except (FileNotFoundError, ValueError):
+        pass
+    idx = build_offset_index(filename)
+    tmp = index_path(filename) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(idx, f)
+    os.replace(tmp, index_path(filename))
+    return idx, True
+
+
+class LazyContactsDB(MutableMapping):
+    """A ContactsDB over a saved file that parses contacts only on access."""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._overlay: Dict[str, Contact] = {}
+        self._deleted: Set[str] = set()
+        self._pending: Dict[str, Optional[Contact]] = {}  # unsaved writes; None = deleted
+        self._journal_pos = 0
+        self._delta_seq = 0
+        self._stat: Optional[Tuple[int, int]] = None
+        self._opened = False
+        self.next_id = 1
+        self.index_rebuilt = False
+        self.refresh()
+
+    def _open_snapshot(self) -> None:
+        self._close_snapshot()
+        self._offsets, self._overlay, self._deleted = {}, {}, set()
+        self._journal_pos = 0
+        self._delta_seq = 0
+        try:
+            idx, self.index_rebuilt = load_offset_index(self.filename)
+        except FileNotFoundError:
+            self._stat = None
+            return
+        self._stat = (idx["size"], idx["mtime_ns"])
+        self.next_id = max(self.next_id, idx["next_id"])
+        spans = idx["spans"]
+        self._offsets = {cid: (spans[2 * i], spans[2 * i + 1]) for i, cid in enumerate(idx["ids"])}
+        if idx["size"]:
+            self._file = open(self.filename, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_snapshot(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def refresh(self) -> None:
+        """Pick up changes: re-index a rewritten snapshot, then read new journal lines.
+
+        A rewritten snapshot (or a truncated journal, which means the
+        journal was compacted) resets the view; unsaved writes made to it
+        are then applied again on top.
+        """
+        try:
+            st = os.stat(self.filename)
+            current: Optional[Tuple[int, int]] = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            current = None
+        try:
+            truncated = os.path.getsize(journal_path(self.filename)) < self._journal_pos
+        except FileNotFoundError:
+            truncated = self._journal_pos > 0
+        reopened = not self._opened or current != self._stat or truncated
+        if reopened:
+            self._open_snapshot()
+            self._opened = True
+        for delta in iter_deltas(self.filename, self._stat, self._delta_seq):
+            for cid, c in delta.get("set", {}).items():
+                self._set(cid, c)
+            for cid in delta.get("deleted", []):
+                self._discard(cid)
+            self.next_id = max(self.next_id, delta.get(NEXT_ID_KEY, 0))
+            self._delta_seq = delta["seq"]
+        for rec, pos in iter_journal(self.filename, self._journal_pos):
+            op = rec.get("op")
+            if op == "set":
+                self._overlay[rec["id"]] = rec["contact"]
+                self._deleted.discard(rec["id"])
+            elif op == "del":
+                self._overlay.pop(rec["id"], None)
+                if rec["id"] in self._offsets:
+                    self._deleted.add(rec["id"])
+            elif op == "clear":
+                self._overlay.clear()
+                self._deleted = set(self._offsets)
+            if "id" in rec:
+                self.next_id = max(self.next_id, contact_id_number(rec["id"]) + 1)
+            self._journal_pos = pos
+        if reopened:
+            for cid, c in self._pending.items():
+                if c is None:
+                    self._discard(cid)
+                else:
+                    self._set(cid, c)
+
+    def compact(self) -> None:
+        """Write the whole view (file contents plus unsaved writes) as a new snapshot and reopen it."""
+        from contact_delta import remove_deltas
+        from contact_journal import clear_journal
+        write_snapshot(self, self.filename)
+        remove_deltas(self.filename)
+        clear_journal(self.filename)
+        self._pending = {}
+        self.refresh()
+
+    def close(self) -> None:
+        self._close_snapshot()
+
+    def __enter__(self) -> "LazyContactsDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- MutableMapping ---
+
+    def __getitem__(self, contact_id: str) -> Contact:
+        if contact_id in self._overlay:
+            return self._overlay[contact_id]
+        if contact_id in self._deleted or contact_id not in self._offsets:
+            raise KeyError(contact_id)
+        start, end = self._offsets[contact_id]
+        return json.loads(self._mm[start:end])
+
+    def _set(self, contact_id: str, contact: Contact) -> None:
+        self._overlay[contact_id] = contact
+        self._deleted.discard(contact_id)
+        n = contact_id_number(contact_id)
+        if n >= self.next_id:
+            self.next_id = n + 1
+
+    def _discard(self, contact_id: str) -> None:
+        self._overlay.pop(contact_id, None)
+        if contact_id in self._offsets:
+            self._deleted.add(contact_id)
+
+    def __setitem__(self, contact_id: str, contact: Contact) -> None:
+        self._set(contact_id, contact)
+        self._pending[contact_id] = contact
+
+    def __delitem__(self, contact_id: str) -> None:
+        if contact_id not in self:
+            raise KeyError(contact_id)
+        self._discard(contact_id)
+        self._pending[contact_id] = None
+
+    def __contains__(self, contact_id: object) -> bool:
+        return contact_id in self._overlay or (contact_id in self._offsets and contact_id not in self._deleted)
+
+    def __iter__(self) -> Iterator[str]:
+        for cid in self._offsets:
+            if cid not in self._deleted:
+                yield cid
+        for cid in self._overlay:
+            if cid not in self._offsets:
+                yield cid
+
+    def __len__(self) -> int:
+        added = sum(1 for cid in self._overlay if cid not in self._offsets)
+        return len(self._offsets) - len(self._deleted) + added
+
+    def allocate_id(self) -> str:
+        while f"{ID_PREFIX}{self.next_id:03d}" in self:
+            self.next_id += 1
+        return f"{ID_PREFIX}{self.next_id:03d}"
+
+
+def open_lazy(filename: str) -> LazyContactsDB:
+    """Open filename (snapshot + journal) as a lazily parsed ContactsDB."""
+    return LazyContactsDB(filename)
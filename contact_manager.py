@@ -1,21 +1,217 @@
 from __future__ import annotations
 
+from collections.abc import Mapping
+from contextlib import nullcontext
 from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime
-from typing import Any, Dict, Tuple, Optional
+from typing import (Any, Callable, ClassVar, Dict, FrozenSet, Iterable, Iterator, List, MutableMapping, NamedTuple,
+                    Tuple, Optional)
+from itertools import islice
 import json
-import re
+import os
+import sys
 
 Contact = Dict[str, Any]
-ContactsDB = Dict[str, Contact]
+ContactsDB = MutableMapping[str, Contact]
+
+
+# -------------------------
+# Compact records
+# -------------------------
+
+_MISSING: Any = type("_Missing", (), {"__repr__": lambda self: "<missing>"})()
+
+
+class _Record(Mapping):
+    """Read-only mapping view over a slotted record, so record.get("phone") etc. keep working.
+
+    Fields that were absent from the source dict stay absent, and keys the
+    record has no slot for are kept in ``extra``, so to_dict() gives back
+    exactly the dict the record was made from.
+    """
+    __slots__ = ()
+    FIELDS: ClassVar[Tuple[str, ...]] = ()
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset()
+    NESTED: ClassVar[Dict[str, type]] = {}
+
+    @classmethod
+    def _convert(cls, key: str, value: Any) -> Any:
+        if key in cls.INTERNED and isinstance(value, str):
+            return sys.intern(value)
+        if key in cls.NESTED and isinstance(value, Mapping):
+            return cls.NESTED[key].from_dict(value)
+        return value
+
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "_Record":
+        if isinstance(d, cls):
+            return d
+        fields = {k: cls._convert(k, v) for k, v in d.items() if k in cls.FIELDS}
+        extra = {k: v for k, v in d.items() if k not in cls.FIELDS}
+        return cls(**fields, extra=extra or None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v.to_dict() if isinstance(v, _Record) else v for k, v in self.items()}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for k in self.FIELDS:
+            if getattr(self, k) is not _MISSING:
+                yield k
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+@dataclass(slots=True, eq=False, repr=False)
+class AddressRecord(_Record):
+    FIELDS: ClassVar[Tuple[str, ...]] = ("street", "city", "state", "zip_code")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"city", "state"})
+    street: Any = _MISSING
+    city: Any = _MISSING
+    state: Any = _MISSING
+    zip_code: Any = _MISSING
+    extra: Optional[Dict[str, Any]] = None
+
+
+@dataclass(slots=True, eq=False, repr=False)
+class ContactRecord(_Record):
+    """A contact stored in slots instead of a dict, with repeated strings interned.
+
+    Convert with ContactRecord.from_dict(contact) and record.to_dict().
+    """
+    FIELDS: ClassVar[Tuple[str, ...]] = ("first_name", "last_name", "phone", "email", "address",
+                                         "category", "notes", "created_date", "last_modified")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"category", "created_date", "last_modified"})
+    NESTED: ClassVar[Dict[str, type]] = {"address": AddressRecord}
+    first_name: Any = _MISSING
+    last_name: Any = _MISSING
+    phone: Any = _MISSING
+    email: Any = _MISSING
+    address: Any = _MISSING
+    category: Any = _MISSING
+    notes: Any = _MISSING
+    created_date: Any = _MISSING
+    last_modified: Any = _MISSING
+    extra: Optional[Dict[str, Any]] = None
+
+
+def json_default(o: Any) -> Any:
+    """json.dump default= hook so records serialize as the plain dict schema."""
+    if isinstance(o, Mapping):
+        return dict(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
 
 
 def now_iso() -> str:
     return datetime.now().date().isoformat()
 
 
+# -------------------------
+# Match keys
+# -------------------------
+
+DEFAULT_COUNTRY_CODE = "1"
+QUERY_CACHE_SIZE = 4096
+
+
 def normalize_phone(raw: str) -> str:
-    return re.sub(r"\D+", "", raw)
+    """Keep only the digits of raw."""
+    return "".join(filter(str.isdecimal, raw))
+
+
+def phone_e164(raw: str, country_code: str = DEFAULT_COUNTRY_CODE) -> str:
+    """E.164-style "+<country><number>", so "(402) 555-1111" and "+1 402 555 1111" match.
+
+    Numbers written with "+" or a "00" prefix keep their own country code;
+    anything else is taken as a national number in country_code.
+    """
+    digits = normalize_phone(raw)
+    if not digits:
+        return ""
+    if raw.lstrip().startswith("+"):
+        return "+" + digits
+    if digits.startswith("00"):
+        return "+" + digits[2:]
+    national = digits[1:] if digits.startswith("0") else digits
+    if len(national) > 10 and national.startswith(country_code):
+        return "+" + national
+    return "+" + country_code + national
+
+
+def fold(text: Any) -> str:
+    """Case-insensitive match key for names, emails and categories."""
+    return str(text or "").strip().casefold()
+
+
+def name_key(c: Contact) -> str:
+    first, last = fold(c.get("first_name")), fold(c.get("last_name"))
+    return f"{first}|{last}" if first or last else ""
+
+
+class MatchKeys(NamedTuple):
+    """A contact's canonical match keys. Stores compute them once per write."""
+    digits: str
+    phone: str  # E.164
+    email: str
+    name: str
+
+
+def match_keys(c: Contact) -> MatchKeys:
+    raw = str(c.get("phone", "") or "")
+    return MatchKeys(normalize_phone(raw), phone_e164(raw), fold(c.get("email")), name_key(c))
+
+
+QUERY_NORMALIZERS: Dict[str, Callable[[str], str]] = {"phone": phone_e164, "email": fold, "text": fold}
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def query_key(kind: str, value: str) -> str:
+    """Normalize a search value like the stored keys of that kind ("phone", "email" or "text").
+
+    Searches tend to repeat, so results are kept in a bounded LRU cache.
+    """
+    return QUERY_NORMALIZERS[kind](value or "")
+
+
+ID_PREFIX = "contact_"
+NEXT_ID_KEY = "_next_id"  # saved alongside the contacts so ids are never reused
+
+
+def contact_id_number(contact_id: str) -> int:
+    """Return N for ids shaped like contact_N, otherwise 0."""
+    n = contact_id[len(ID_PREFIX):]
+    return int(n) if contact_id.startswith(ID_PREFIX) and n.isdigit() else 0
+
+
+def next_contact_id(contacts_db: ContactsDB) -> str:
+    """Return an unused contact id.
+
+    Stores with an ID counter (IndexedContactsDB) hand out ids in increasing
+    order. For plain dicts the probe starts at len + 1, which only collides
+    when lower ids have been deleted, so it costs one probe per gap at most.
+    """
+    allocate = getattr(contacts_db, "allocate_id", None)
+    if allocate is not None:
+        return allocate()
+    i = len(contacts_db) + 1
+    while f"{ID_PREFIX}{i:03d}" in contacts_db:
+        i += 1
+    return f"{ID_PREFIX}{i:03d}"
 
 
 # -------------------------
@@ -63,18 +259,54 @@ def create_contact() -> Contact:
     return contact
 
 
+REQUIRED_FIELDS = ("first_name", "last_name", "phone")
+
+
+def missing_required_fields(contact_data: Contact) -> List[str]:
+    return [k for k in REQUIRED_FIELDS if not str(contact_data.get(k, "") or "").strip()]
+
+
 def add_contact(contacts_db: ContactsDB, contact_data: Contact) -> Optional[str]:
-    required = ("first_name", "last_name", "phone")
-    if not all(contact_data.get(k, "").strip()for k in required):
+    if missing_required_fields(contact_data):
         return None
-    i = 1
+    cid = next_contact_id(contacts_db)
+    contacts_db[cid] = contact_data
+    return cid
+
+
+def add_contacts_bulk(contacts_db: ContactsDB, contacts: Iterable[Contact],
+                      batch_size: int = 1000) -> Dict[str, Any]:
+    """Validate and insert many contacts, batch_size rows at a time.
+
+    Returns {"added": [ids...], "rejected": [(row_number, reason), ...]}.
+    Row numbers are 0-based positions in the input.
+    """
+    added: List[str] = []
+    rejected: List[Tuple[int, str]] = []
+    rows = iter(contacts)
+    row_no = 0
+    transaction = getattr(contacts_db, "transaction", None)
     while True:
-        cid = f"contact_{i:03d}"
-        if cid not in contacts_db:
-            contacts_db[cid] = contact_data
-            return cid
-        i += 1
-    return None
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        valid = []
+        for c in batch:
+            if not isinstance(c, Mapping):
+                rejected.append((row_no, "not a contact record"))
+            else:
+                missing = missing_required_fields(c)
+                if missing:
+                    rejected.append((row_no, "missing " + ", ".join(missing)))
+                else:
+                    valid.append(c)
+            row_no += 1
+        with transaction() if transaction is not None else nullcontext():
+            for c in valid:
+                cid = next_contact_id(contacts_db)
+                contacts_db[cid] = c
+                added.append(cid)
+    return {"added": added, "rejected": rejected}
 
 
 def display_contact(contacts_db: ContactsDB, contact_id: str) -> bool:
@@ -99,41 +331,111 @@ def display_contact(contacts_db: ContactsDB, contact_id: str) -> bool:
     return True
 
 
-def list_all_contacts(contacts_db: ContactsDB) -> None:
+def contact_list_line(cid: str, c: Contact) -> str:
+    """One line of the contact listing."""
+    full_name = f"{c.get('first_name','')}{c.get('last_name','')}".strip()
+    return f"{cid:>12} | {full_name:25} | {c.get('phone','')}"
+
+
+def list_all_contacts(contacts_db: ContactsDB, sort: Optional[str] = None, page_size: int = 1000,
+                      out: Optional[Any] = None) -> None:
+    """Write the listing to out (stdout by default), one write() per page of page_size contacts.
+
+    sort takes the contact_query sort fields, e.g. "last_name" or "-created_date".
+    """
+    out = out if out is not None else sys.stdout
     if not contacts_db:
-        print("(No contacts)")
+        out.write("(No contacts)\n")
         return
-    for cid, c in contacts_db.items():
-        full_name = f"{c.get('first_name','')}{c.get('last_name','')}".strip()
-        print(f"{cid:>12} | {full_name:25} | {c.get('phone','')}")
-    pass
+    from contact_cursor import ContactCursor, render_rows
+    for page in ContactCursor(contacts_db, page_size, sort):
+        out.write(render_rows(page))
 
 def search_contacts_by_name(contacts_db: ContactsDB, search_term: str) -> ContactsDB:
-    """Return {id: contact} for case-insensitive, partial matches on first/last name.
-
-    TODOs:
-      - Lowercase the search term and names for matching.
-      - Consider trimming whitespace and ignoring empty search term.
+    """Return {id: contact} for case-insensitive, partial matches on first/last name."""
+    term = query_key("text", search_term)
+    if not term:
+        return {}
+    lookup = getattr(contacts_db, "ids_by_name_substring", None)
+    if lookup is not None:
+        return {cid: contacts_db[cid] for cid in lookup(term)}
+    return {cid: c for cid, c in contacts_db.items()
+            if term in fold(c.get("first_name")) or term in fold(c.get("last_name"))}
+
+
+def autocomplete_names(contacts_db: ContactsDB, prefix: str, limit: int = 10) -> List[str]:
+    """Return up to `limit` contact ids whose first or last name starts with prefix, in name order."""
+    pre = query_key("text", prefix)
+    if not pre:
+        return []
+    lookup = getattr(contacts_db, "ids_by_name_prefix", None)
+    if lookup is not None:
+        return lookup(pre, limit)
+    hits = sorted((name, cid) for cid, c in contacts_db.items()
+                  for name in {fold(c.get("first_name")), fold(c.get("last_name"))}
+                  if name.startswith(pre))
+    return list(dict.fromkeys(cid for _, cid in hits))[:limit]
+
+
+# Fields with an ordered view in IndexedContactsDB, and the key each is ordered by.
+RANGE_FIELDS: Dict[str, Callable[[Contact], str]] = {
+    "last_name": lambda c: fold(c.get("last_name")),
+    "created_date": lambda c: fold(c.get("created_date")),
+    "zip_code": lambda c: fold((c.get("address", {}) or {}).get("zip_code")),
+}
+RANGE_MAX = "\U0010ffff"  # sorts after any text, for prefix ranges
+
+
+def contacts_in_range(contacts_db: ContactsDB, field: str, lo: Optional[str] = None, hi: Optional[str] = None,
+                      limit: Optional[int] = None) -> ContactsDB:
+    """Return {id: contact} whose field is between lo and hi (inclusive), ordered by field.
+
+    field is "last_name", "created_date" or "zip_code"; None leaves that end
+    of the range open, and text compares case-insensitively. Stores with
+    ordered views (ids_in_range) answer in O(log n + k); others are
+    scanned and sorted.
     """
-    # TODO: Implement
-    return {}
+    key_fn = RANGE_FIELDS[field]
+    lo, hi = (None if lo is None else fold(lo)), (None if hi is None else fold(hi))
+    lookup = getattr(contacts_db, "ids_in_range", None)
+    if lookup is not None:
+        return {cid: contacts_db[cid] for cid in lookup(field, lo, hi, limit)}
+    hits = sorted((k, cid) for cid, c in contacts_db.items()
+                  for k in [key_fn(c)] if k and (lo is None or k >= lo) and (hi is None or k <= hi))
+    return {cid: contacts_db[cid] for _, cid in hits[:limit]}
+
+
+def contacts_with_prefix(contacts_db: ContactsDB, field: str, prefix: str,
+                         limit: Optional[int] = None) -> ContactsDB:
+    """Return {id: contact} whose field starts with prefix, e.g. zip codes starting "681"."""
+    prefix = fold(prefix)
+    return contacts_in_range(contacts_db, field, prefix, prefix + RANGE_MAX, limit)
 
 
 def search_contacts_by_category(contacts_db: ContactsDB, category: str) -> ContactsDB:
-    cat = (category or "").strip().lower()
+    cat = query_key("text", category)
     if not cat: 
         return {}
+    lookup = getattr(contacts_db, "ids_by_category", None)
+    if lookup is not None:
+        return {cid: contacts_db[cid] for cid in lookup(cat)}
     return {cid: c for cid, c in contacts_db.items()
-            if c.get("category", "").strip().lower() == cat}
+            if fold(c.get("category")) == cat}
 
 
 def find_contact_by_phone(contacts_db: ContactsDB, phone_number: str) -> Tuple[Optional[str], Optional[Contact]]:
-    """Return (id, contact) if a contact exists with exact phone match (after normalization).
-
-    TODOs:
-      - Use normalize_phone() for both stored phone and query.
-    """
-    # TODO: Implement
+    """Return (id, contact) if a contact exists with exact phone match (after E.164 normalization)."""
+    pn = query_key("phone", phone_number)
+    if not pn:
+        return None, None
+    lookup = getattr(contacts_db, "ids_by_phone", None)
+    if lookup is not None:
+        for cid in lookup(pn):
+            return cid, contacts_db[cid]
+        return None, None
+    for cid, c in contacts_db.items():
+        if phone_e164(str(c.get("phone", "") or "")) == pn:
+            return cid, c
     return None, None
 
 
@@ -142,36 +444,74 @@ def find_contact_by_phone(contacts_db: ContactsDB, phone_number: str) -> Tuple[O
 # -------------------------
 
 
+def _locked(contacts_db: ContactsDB, *contact_ids: str):
+    """The store's locked(*ids) context (ConcurrentContactsDB), or a no-op for other stores."""
+    locked = getattr(contacts_db, "locked", None)
+    return locked(*contact_ids) if locked is not None else nullcontext()
+
+
 def update_contact(contacts_db: ContactsDB, contact_id: str, field_updates: Dict[str, Any]) -> bool:
-    c = contacts_db.get(contact_id)
-    if not c:
-        return False
-    for k, v in field_updates.items():
-        c[k] = v
-    
-    from datetime import datetime
-    c["last_modified"] = datetime.now().date().isoformat()
+    with _locked(contacts_db, contact_id):
+        c = contacts_db.get(contact_id)
+        if not c:
+            return False
+        # Replace the record instead of editing it in place so indexed stores see the change.
+        updated = dict(c)
+        for k, v in field_updates.items():
+            updated[k] = v
+
+        from datetime import datetime
+        updated["last_modified"] = datetime.now().date().isoformat()
+        contacts_db[contact_id] = updated
     return True
 
 
 def delete_contact(contacts_db: ContactsDB, contact_id: str) -> bool:
     if contact_id not in contacts_db:
         return False
-    if input(f"Delete {contact_id}? Type 'yes' to confirm: ").strip().lower() == "yes":
+    if input(f"Delete {contact_id}? Type 'yes' to confirm: ").strip().lower() in {"y", "yes"}:
         contacts_db.pop(contact_id, None)
         return True
     return False
 
 
+Chooser = Callable[[str, List[Any], List[Contact]], Any]
+
+
+def merge_records(records: List[Contact], choose: Chooser) -> Contact:
+    """Merge contacts into one new dict.
+
+    choose(label, values, records) picks each field's value, where values[i]
+    is records[i]'s value ("" when missing) and label is the field name, or
+    "address.<field>" for address parts. Notes are joined with " | ", the
+    earliest created_date is kept and last_modified is set to today.
+    """
+    merged: Contact = {}
+    for k in dict.fromkeys(k for c in records for k in c):
+        if k == "address":
+            addrs = [c.get("address", {}) or {} for c in records]
+            merged["address"] = {ak: choose(f"address.{ak}", [a.get(ak, "") for a in addrs], records)
+                                 for ak in dict.fromkeys(ak for a in addrs for ak in a)}
+        elif k == "notes":
+            merged["notes"] = " | ".join(n for n in (c.get("notes", "") for c in records) if n)
+        elif k in {"created_date", "last_modified"}:
+            continue
+        else:
+            merged[k] = choose(k, [c.get(k, "") for c in records], records)
+    dates = [c.get("created_date") for c in records if c.get("created_date")]
+    merged["created_date"] = min(dates) if dates else now_iso()
+    merged["last_modified"] = now_iso()
+    return merged
+
+
 def merge_contacts(contacts_db: ContactsDB, contact_id1: str, contact_id2: str) -> Optional[str]:
     c1 = contacts_db.get(contact_id1)
     c2 = contacts_db.get(contact_id2)
     if not c1 or not c2:
         return None
-    merged = {}
-    keys = set(c1) | set(c2)
-    
-    def choose(label: str, v1, v2):
+
+    def choose(label: str, values: List[Any], records: List[Contact]):
+        v1, v2 = values
         if not v1 and v2: return v2
         if v1 and not v2: return v1
         if v1 == v2: return v1
@@ -180,115 +520,322 @@ def merge_contacts(contacts_db: ContactsDB, contact_id1: str, contact_id2: str)
             pick = input("Choose 1 or 2: ").strip()
             if pick in {"1", "2"}:
                 return v1 if pick == "1" else v2
-    for k in keys:
-        if k == "address":
-            a1 = c1.get("address", {}) or {}
-            a2 = c2.get("address", {}) or {}
-            addr = {}
-            for ak in set(a1) | set(a2):
-                addr[ak] = choose(f"address.{ak}", a1.get(ak, ""), a2.get(ak, ""))
-            merged["address"] = addr
-        elif k == "notes":
-            n1, n2 = c1.get("notes", ""), c2.get("notes","")
-            merged["notes"] = n1 if not n2 else (n2 if not n1 else f"{n1} | {n2}")
-        elif k in {"created_date", "last_modified"}:
-            continue
-        else: 
-            merged[k] = choose(k, c1.get(k, ""), c2.get(k, ""))
-            
-    from datetime import datetime
-    d1, d2 = c1.get("created_date"), c2.get("created_date")
-    merged["created_date"] = min(x for x in (d1, d2) if x) if (d1 or d2) else datetime.now().date().isoformat()
-    merged["last_modified"] = datetime.now().date().isoformat()
-    
-    contacts_db[contact_id1] = merged
-    contacts_db.pop(contact_id2, None)
+
+    merged = merge_records([c1, c2], choose)
+    with _locked(contacts_db, contact_id1, contact_id2):
+        # On a concurrent store, give up if either contact changed while we were asking.
+        if hasattr(contacts_db, "locked") and (contacts_db.get(contact_id1) is not c1
+                                               or contacts_db.get(contact_id2) is not c2):
+            return None
+        contacts_db[contact_id1] = merged
+        contacts_db.pop(contact_id2, None)
     return contact_id1
 
 
+def _pick_first(label: str, values: List[Any], records: List[Contact]) -> Any:
+    return next((v for v in values if v), values[0])
+
+
+def _pick_longest(label: str, values: List[Any], records: List[Contact]) -> Any:
+    # max() keeps the first of equally long values.
+    return max(values, key=lambda v: len(str(v)) if v else -1)
+
+
+def _pick_newest(label: str, values: List[Any], records: List[Contact]) -> Any:
+    order = sorted(range(len(values)), key=lambda i: records[i].get("last_modified") or "", reverse=True)
+    return next((values[i] for i in order if values[i]), values[0])
+
+
+MERGE_POLICIES: Dict[str, Chooser] = {
+    "newest": _pick_newest,
+    "longest": _pick_longest,
+    "first": _pick_first,
+}
+
+
+def _merge_chooser(policy: Any, field_rules: Optional[Dict[str, Any]]) -> Chooser:
+    def resolve(rule: Any) -> Chooser:
+        if callable(rule):
+            return rule
+        try:
+            return MERGE_POLICIES[rule]
+        except KeyError:
+            raise ValueError(f"unknown merge policy {rule!r}; expected one of {', '.join(MERGE_POLICIES)}") from None
+
+    default = resolve(policy)
+    rules = {label: resolve(rule) for label, rule in (field_rules or {}).items()}
+
+    def choose(label: str, values: List[Any], records: List[Contact]) -> Any:
+        rule = rules.get(label) or rules.get(label.split(".", 1)[0], default)
+        return rule(label, values, records)
+    return choose
 
-def generate_contact_statistics(contacts_db: ContactsDB) -> Dict[str, Any]:
-    total = len(contacts_db)
+
+def duplicate_clusters(contacts_db: ContactsDB, groups: Optional[Iterable[List[str]]] = None) -> List[List[str]]:
+    """Join overlapping duplicate groups into clusters (union-find).
+
+    groups defaults to every phone, email and name group from
+    find_duplicate_contacts(), so two contacts that only share a phone with
+    a third contact end up in the same cluster. Clusters and their members
+    are listed in order of first appearance.
+    """
+    if groups is None:
+        found = find_duplicate_contacts(contacts_db)
+        groups = [g for kind in DUPLICATE_KEYS for g in found[f"{kind}_duplicates"]]
+    parent: Dict[str, str] = {}
+
+    def find(cid: str) -> str:
+        root = parent.setdefault(cid, cid)
+        while parent[root] != root:
+            root = parent[root]
+        while parent[cid] != root:
+            parent[cid], cid = root, parent[cid]
+        return root
+
+    for group in groups:
+        first = find(group[0])
+        for cid in group[1:]:
+            root = find(cid)
+            if root != first:
+                parent[root] = first
+    clusters: Dict[str, List[str]] = {}
+    for cid in parent:
+        clusters.setdefault(find(cid), []).append(cid)
+    return [c for c in clusters.values() if len(c) >= 2]
+
+
+def merge_duplicate_groups(contacts_db: ContactsDB, groups: Optional[Iterable[List[str]]] = None,
+                           policy: Any = "newest", field_rules: Optional[Dict[str, Any]] = None
+                           ) -> Dict[str, List[str]]:
+    """Merge every duplicate cluster without prompting. Returns {kept_id: [merged_away_ids]}.
+
+    policy decides conflicting fields: "newest" takes the value from the
+    most recently modified contact, "longest" the longest value, "first"
+    the first non-empty value in cluster order, or pass your own
+    choose(label, values, records). field_rules overrides the policy per
+    field, by label ("address.city") or top-level field ("address").
+
+    Each cluster keeps its lowest contact id. Stores with a transaction()
+    (IndexedContactsDB, SQLiteContactsDB) apply the whole batch as one, and
+    ConcurrentContactsDB merges each cluster under its shard locks.
+    """
+    choose = _merge_chooser(policy, field_rules)
+    merged: Dict[str, List[str]] = {}
+    transaction = getattr(contacts_db, "transaction", None)
+    with transaction() if transaction is not None else nullcontext():
+        for cluster in duplicate_clusters(contacts_db, groups):
+            with _locked(contacts_db, *cluster):
+                ids = [cid for cid in cluster if cid in contacts_db]
+                if len(ids) < 2:
+                    continue
+                ids.sort(key=lambda cid: (contact_id_number(cid), cid))
+                contacts_db[ids[0]] = merge_records([contacts_db[cid] for cid in ids], choose)
+                for cid in ids[1:]:
+                    del contacts_db[cid]
+            merged[ids[0]] = ids[1:]
+    return merged
+
+
+def statistics_keys(c: Contact) -> Tuple[str, str, str, bool]:
+    """Return (category, state, area_code, has_email) as counted by the statistics.
+
+    state and area_code are "" when the contact has none.
+    """
+    cat = (c.get("category", "")or"").strip().lower() or "uncategorized"
+    st = ((c.get("address", {}) or {}).get("state", "") or "").strip().upper()
+    pn = normalize_phone(c.get("phone", "") or "")
+    ac = pn[:3] if len(pn) >= 3 else ""
+    return cat, st, ac, bool((c.get("email", "") or "").strip())
+
+
+def statistics_counts(contacts_db: ContactsDB, recompute: bool = False
+                      ) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], int]:
+    """Return (by_category, by_state, by_area_code, without_email) counts.
+
+    Stores that keep these counts up to date provide statistics_counts();
+    recompute=True ignores that and counts every contact.
+    """
+    counts = getattr(contacts_db, "statistics_counts", None)
+    if counts is not None and not recompute:
+        return counts()
     by_cat, by_state, area_counts = {}, {}, {}
     no_email = 0
     
-    for c in contacts_db():
-        cat = (c.get("category", "")or"").strip().lower() or "uncategorized"
+    for c in contacts_db.values():
+        cat, st, ac, has_email = statistics_keys(c)
         by_cat[cat] = by_cat.get(cat, 0) + 1
-        st = ((c.get("address", {}) or {}).get("state", "") or "").strip().upper()
         if st:
             by_state[st] = by_state.get(st, 0) + 1
-        if not (c.get("email", "") or "").strip():
+        if not has_email:
             no_email += 1
-        pn = re.sub(r"\D+", "", c.get("phone", "") or "")
-        if len(pn) >= 3:
-            ac = pn[:3]
+        if ac:
             area_counts[ac] = area_counts.get(ac, 0) + 1
+    return by_cat, by_state, area_counts, no_email
+
+
+def generate_contact_statistics(contacts_db: ContactsDB, recompute: bool = False) -> Dict[str, Any]:
+    """Summarize the DB. recompute=True counts from scratch, e.g. to check a store's running totals."""
+    return statistics_report(len(contacts_db), statistics_counts(contacts_db, recompute))
+
+
+def statistics_report(total: int, counts: Tuple[Dict[str, int], Dict[str, int], Dict[str, int], int]
+                      ) -> Dict[str, Any]:
+    """The generate_contact_statistics summary for total contacts with these statistics_counts."""
+    by_cat, by_state, area_counts, no_email = counts
     avg_per_cat = (total / len(by_cat)) if by_cat else 0.0
-    most_common_ac = max(area_counts, key=area_counts.get)if area_counts else None
+    # Ties go to the lowest area code, so stores that keep their counts in a different order agree.
+    most_common_ac = min(area_counts, key=lambda ac: (-area_counts[ac], ac)) if area_counts else None
     return {
         "total_contacts": total,
-        "contatcs_by_category": by_cat,
+        "contacts_by_category": by_cat,
         "contacts_by_state": by_state,
         "average_contacts_per_category": round(avg_per_cat, 2),
         "most_common_are_code": most_common_ac,
         "contacts_without_email": no_email,
     }
 
-def find_duplicate_contacts(contacts_db: ContactsDB) -> Dict[str, Any]:
-    def groups(key_fn):
+# Each kind is also a MatchKeys field, so stores can group by their stored keys.
+DUPLICATE_KEYS = {
+    "phone": lambda c: phone_e164(str(c.get("phone", "") or "")),
+    "email": lambda c: fold(c.get("email")),
+    "name": name_key,
+}
+
+
+def find_duplicate_contacts(contacts_db: ContactsDB, fuzzy: bool = False, threshold: float = 0.7,
+                            workers: int = 0) -> Dict[str, Any]:
+    """Group contacts sharing a phone, email or name.
+
+    fuzzy=True adds "fuzzy_duplicates": clusters of near-duplicates whose
+    name/email/address similarity reaches threshold (see contact_dedupe).
+    workers > 1 spreads the exact grouping over that many processes
+    (see contact_parallel); the result is the same.
+    """
+    store_groups = getattr(contacts_db, "duplicate_groups", None)
+
+    def groups(kind):
+        if store_groups is not None:
+            return store_groups(kind)
+        key_fn = DUPLICATE_KEYS[kind]
         m = {}
         for cid, c in contacts_db.items():
             k = key_fn(c)
             if k:
                 m.setdefault(k,[]).append(cid)
         return [ids for ids in m.values() if len(ids) >= 2]
-    phone_dupes = groups(lambda c: re.sub(r"\D+", "", c.get("phone", "") or ""))
-    email_dupes = groups(lambda c: (c.get("email", "") or "").strip().lower())
-    name_dupes = groups(lambda c: ((c.get("first_name", "") + "|" + c.get("last_name","")).strip().lower()) or "")
     
-    return {"phone_duplicates": phone_dupes,
-            "email_duplicates": email_dupes,
-            "name_duplicates": name_dupes
-    }
+    if workers > 1 and store_groups is None:
+        from contact_parallel import find_duplicate_contacts_parallel
+        result = find_duplicate_contacts_parallel(contacts_db, workers)
+    else:
+        result = {"phone_duplicates": groups("phone"),
+                  "email_duplicates": groups("email"),
+                  "name_duplicates": groups("name")
+        }
+    if fuzzy:
+        from contact_dedupe import find_fuzzy_duplicates
+        result.update(find_fuzzy_duplicates(contacts_db, threshold=threshold))
+    return result
+
+
+def contact_text_lines(cid: str, c: Contact) -> List[str]:
+    """The plain-text export layout of one contact."""
+    addr = c.get("address",{}) or {}
+    return [
+        f"ID: {cid}",
+        f"Name: {c.get('first_name', '')}{c.get('last_name', '')}",
+        f"Phone: {c.get('phone','')}",
+        f"Email: {c.get('email','')}",
+        f"Address: {addr.get('street','')}",
+        f"         {addr.get('city','')},{addr.get('state','')}{addr.get('zip_code','')}",
+        f"Notes: {c.get('notes','')}",
+        "-" * 40
+    ]
 
 
 def export_contacts_by_category(contacts_db: ContactsDB, category: str) -> str:
-    cat = (category or "").strip().lower()
-    lines = []
-    for cid, c in contacts_db.items():
-        if (c.get("category", "") or "").strip().lower() == cat:
-            addr = c.get("address",{}) or {}
-            lines.extend([
-                f"ID: {cid}",
-                f"Name: {c.get("first_name,", '')}{c.get('last_name', '')}",
-                f"Phone: {c.get('phone','')}",
-                f"Email: {c.get('email','')}",
-                f"Address: {addr.get('street','')}",
-                f"         {addr.get('city','')},{addr.get('state','')}{addr.get('zip_code','')}",
-                f"Notes: {c.get('notes','')}",
-                "-" * 40
-            ])
-    return "\n".join(lines) if lines else "(No contacts in this category)"
+    """Return the text export of one category as a string.
+
+    For large exports use contact_export.export_contacts, which streams to a file.
+    """
+    from contact_export import iter_export
+    text = "".join(iter_export(contacts_db, "text", category=category or ""))
+    return text.rstrip("\n") if text else "(No contacts in this category)"
 
 
 # -------------------------
 # Part 3 — CLI & Persistence
 # -------------------------
 
+def write_snapshot(contacts_db: ContactsDB, filename: str) -> None:
+    """Write the whole DB to filename, replacing the old file only once the new one is complete."""
+    data: Dict[str, Any] = dict(contacts_db)
+    next_id = getattr(contacts_db, "next_id", None)
+    if next_id is not None:
+        data[NEXT_ID_KEY] = next_id
+    tmp = filename + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+        # On disk before it replaces the old file, since a journal may be truncated next.
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
 def save_contacts_to_file(contacts_db: ContactsDB, filename: str) -> None:
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(contacts_db, f, ensure_ascii=False, indent=2)
-    pass
+    """Save the DB to filename.
+
+    Stores that track dirty contacts (IndexedContactsDB) write only the
+    changes since their last save as a delta next to the file, and
+    rewrite the whole file only now and then (see contact_delta).
+    """
+    # A journaled DB saved to its own file only needs its log folded in.
+    if getattr(contacts_db, "filename", None) == filename:
+        contacts_db.compact()
+        return
+    from contact_delta import remove_deltas, save_incremental
+    if getattr(contacts_db, "dirty", None) is not None:
+        save_incremental(contacts_db, filename)
+        return
+    from contact_journal import clear_journal
+    write_snapshot(contacts_db, filename)
+    remove_deltas(filename)
+    # The snapshot already holds everything, so an old journal must not be replayed over it.
+    clear_journal(filename)
 
 
-def load_contacts_from_file(filename: str) -> ContactsDB:
+def load_contacts_from_file(filename: str, lazy: bool = False) -> ContactsDB:
+    """Load a saved file into an IndexedContactsDB, restoring its ID counter.
+
+    Delta snapshots saved next to the file are applied, and then, if a
+    journal (filename + ".log") sits next to the snapshot, its changes
+    are replayed on top. With lazy=True a LazyContactsDB is returned instead,
+    which reads a byte-offset index and parses contacts only when accessed.
+    """
+    if lazy:
+        from contact_lazy import open_lazy
+        return open_lazy(filename)
+    from contact_delta import apply_deltas
+    from contact_index import IndexedContactsDB
+    from contact_journal import journal_path, replay_journal
     try:
         with open(filename, "r", encoding="utf-8") as f:
             data = json.load(f)
-            return data if isinstance(data, dict) else {}
     except FileNotFoundError:
-        return {}
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    next_id = data.pop(NEXT_ID_KEY, None)
+    next_id = next_id if isinstance(next_id, int) else 1
+    state, delta_next_id = apply_deltas(filename, data)
+    next_id = max(next_id, delta_next_id, replay_journal(filename, data))
+    db = IndexedContactsDB(data, next_id=next_id)
+    db.dirty.clear()
+    # Journaled changes are in neither the base nor the deltas, so the next save must be a full one.
+    if os.path.exists(journal_path(filename)) and os.path.getsize(journal_path(filename)):
+        state = None
+    db.delta_state = state
+    return db
 
 
 MENU = """
@@ -305,6 +852,7 @@ MENU = """
 8. Export by category
 9. Save to file (bonus)
 10. Load from file (bonus)
+11. Import CSV/vCard file
 0. Exit
 """
 
@@ -321,10 +869,16 @@ def main_menu(contacts_db: ContactsDB) -> None:
             cid = add_contact(contacts_db, create_contact())
             print(f"Added {cid}" if cid else "Add failed (missing required fields).")
         elif choice == "2":
-            sub = input("search by (n)ame/(c)ategory/(p)hone: ").strip().lower()
+            sub = input("search by (n)ame/(a)utocomplete/(c)ategory/(p)hone/(q)uery: ").strip().lower()
             if sub == "n":
                 term = input("Name contains: ")
                 results = search_contacts_by_name(contacts_db, term)
+            elif sub == "a":
+                pre = input("Name starts with: ")
+                for rcid in autocomplete_names(contacts_db, pre):
+                    c = contacts_db[rcid]
+                    print(f"{rcid:>12} | {c.get('first_name','')} {c.get('last_name','')}")
+                continue
             elif sub == "c":
                 cat = input("Category: ")
                 results = search_contacts_by_category(contacts_db, cat)
@@ -332,13 +886,33 @@ def main_menu(contacts_db: ContactsDB) -> None:
                 ph = input("Phone")
                 cid, c = find_contact_by_phone(contacts_db, ph)
                 results = {cid: c} if cid and c else {}
+            elif sub == "q":
+                # Query results can be huge, so they are streamed a page at a time.
+                from contact_cursor import ContactCursor, page_through
+                from contact_query import iter_query
+                expr = input("Query (e.g. category = work AND state = NE AND name contains li): ")
+                try:
+                    page_through(ContactCursor(iter_query(contacts_db, expr), page_size=50), sys.stdout)
+                except ValueError as e:
+                    print(e)
+                continue
             else: 
                 results = {}
             print(f"Matches : {len(results)}")
             for rcid in results: 
                 display_contact(contacts_db, rcid)
         elif choice == "3":
-            list_all_contacts(contacts_db)
+            if not contacts_db:
+                print("(No contacts)")
+                continue
+            from contact_cursor import ContactCursor, page_through
+            sort = input("Sort by (blank for none, e.g. last_name or -created_date): ").strip() or None
+            try:
+                cursor = ContactCursor(contacts_db, page_size=50, sort=sort)
+            except ValueError as e:
+                print(e)
+                continue
+            page_through(cursor, sys.stdout)
         elif choice == "4":
             cid = input("Contatc ID: ").strip()
             updates = {}
@@ -362,7 +936,24 @@ def main_menu(contacts_db: ContactsDB) -> None:
             print(json.dumps(find_duplicate_contacts(contacts_db), indent=2))
         elif choice == "8":
             cat = input("Category to export: ").strip()
-            print(export_contacts_by_category(contacts_db, cat))
+            fmt = input("Format [text/csv/vcard/jsonl] (default text): ").strip().lower() or "text"
+            fn = input("Export filename (blank to print): ").strip()
+            from contact_export import FORMATTERS, export_contacts
+            # Checked before the file is opened, so a typo doesn't leave an empty file behind.
+            if fmt not in FORMATTERS:
+                print(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATTERS)}")
+                continue
+            try:
+                if fn:
+                    with open(fn, "w", encoding="utf-8", newline="") as out:
+                        n = export_contacts(contacts_db, out, fmt, category=cat)
+                    print(f"Exported {n} contacts to {fn}")
+                elif fmt == "text":
+                    print(export_contacts_by_category(contacts_db, cat))
+                else:
+                    export_contacts(contacts_db, sys.stdout, fmt, category=cat)
+            except ValueError as e:
+                print(e)
         elif choice == "9":
             fn = input("Save filename (default contacts.json): ").strip() or "contacts.json"
             save_contacts_to_file(contacts_db, fn)
@@ -370,13 +961,34 @@ def main_menu(contacts_db: ContactsDB) -> None:
             fn = input("Load filename (default contacts.json): ").strip() or "contacts.json"
             contacts_db.clear()
             contacts_db.update(load_contacts_from_file(fn))
+        elif choice == "11":
+            fn = input("Import filename (.csv or .vcf): ").strip()
+            from contact_import import import_contacts
+            try:
+                result = import_contacts(contacts_db, fn)
+            except (OSError, ValueError) as e:
+                print(f"Import failed: {e}")
+                continue
+            print(f"Imported {len(result['added'])} contacts, rejected {len(result['rejected'])}")
+            for row, reason in result["rejected"][:20]:
+                print(f" record {row}: {reason}")
         else:
             print("Invalid choice — try again.")
 
 
-def run_contact_manager() -> None:
-    """Entry point: initialize an empty DB and start the menu loop."""
-    contacts: ContactsDB = {}
+def run_contact_manager(journal_file: Optional[str] = None) -> None:
+    """Entry point: initialize an empty DB and start the menu loop.
+
+    With journal_file, contacts are loaded from that file and every change
+    is appended to its journal as it happens.
+    """
+    if journal_file:
+        from contact_journal import open_journal
+        with open_journal(journal_file) as contacts:
+            main_menu(contacts)
+        return
+    from contact_index import IndexedContactsDB
+    contacts: ContactsDB = IndexedContactsDB()
     main_menu(contacts)
 
 
@@ -0,0 +1,88 @@
+"""Exact duplicate detection spread over a process pool.
+
+find_duplicate_contacts_parallel() gives the same result as
+find_duplicate_contacts(), but the key normalization and grouping run in
+worker processes:
+
+1. Map: contacts are sent to workers in chunks, and each worker computes
+   the phone/email/name keys and partitions (kind, key, position) entries
+   into shards by a stable hash of the key.
+2. Reduce: each shard goes to one worker, which groups it and returns
+   only the keys shared by two or more contacts.
+
+Data crosses process boundaries as a single delimited string per chunk
+or shard rather than as lists of dicts or tuples, which keeps pickling
+cheap. Contact positions are sent instead of ids, and the parent maps
+them back at the end.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from contact_manager import DUPLICATE_KEYS, ContactsDB
+
+FIELD_SEP = "\x1f"
+RECORD_SEP = "\x1e"
+ROW_FIELDS = ("phone", "email", "first_name", "last_name")
+KINDS = tuple(DUPLICATE_KEYS)  # ("phone", "email", "name")
+
+
+def _clean(value: Any) -> str:
+    return str(value or "").replace(FIELD_SEP, " ").replace(RECORD_SEP, " ")
+
+
+def encode_rows(rows: List[Dict[str, Any]]) -> str:
+    return RECORD_SEP.join(FIELD_SEP.join(_clean(c.get(f, "")) for f in ROW_FIELDS) for c in rows)
+
+
+def _map_chunk(payload: str, start: int, shards: int) -> List[str]:
+    """Compute keys for one chunk and return one encoded partition per shard."""
+    out: List[List[str]] = [[] for _ in range(shards)]
+    for offset, row in enumerate(payload.split(RECORD_SEP)):
+        c = dict(zip(ROW_FIELDS, row.split(FIELD_SEP)))
+        for k, kind in enumerate(KINDS):
+            key = DUPLICATE_KEYS[kind](c)
+            if key:
+                shard = zlib.crc32(key.encode("utf-8")) % shards
+                out[shard].append(f"{k}{FIELD_SEP}{key}{FIELD_SEP}{start + offset}")
+    return [RECORD_SEP.join(part) for part in out]
+
+
+def _reduce_shard(parts: List[str]) -> List[List[List[int]]]:
+    """Group one shard's entries; return groups of 2+ positions per kind."""
+    groups: List[Dict[str, List[int]]] = [{} for _ in KINDS]
+    for part in parts:
+        if not part:
+            continue
+        for entry in part.split(RECORD_SEP):
+            k, key, pos = entry.split(FIELD_SEP)
+            groups[int(k)].setdefault(key, []).append(int(pos))
+    return [[sorted(ids) for ids in g.values() if len(ids) >= 2] for g in groups]
+
+
+def find_duplicate_contacts_parallel(contacts_db: ContactsDB, workers: Optional[int] = None,
+                                     chunk_size: int = 50_000) -> Dict[str, Any]:
+    """Same result as find_duplicate_contacts(), computed across `workers` processes."""
+    workers = workers or os.cpu_count() or 1
+    ids = list(contacts_db)
+    shards = workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        maps = []
+        for start in range(0, len(ids), chunk_size):
+            rows = [contacts_db[cid] for cid in ids[start:start + chunk_size]]
+            maps.append(pool.submit(_map_chunk, encode_rows(rows), start, shards))
+        per_shard: List[List[str]] = [[] for _ in range(shards)]
+        for fut in maps:
+            for shard, part in enumerate(fut.result()):
+                per_shard[shard].append(part)
+        reduced = [fut.result() for fut in [pool.submit(_reduce_shard, parts) for parts in per_shard]]
+
+    result = {}
+    for k, kind in enumerate(KINDS):
+        # The serial scan lists groups in order of their first contact.
+        groups = sorted((g for shard in reduced for g in shard[k]), key=lambda g: g[0])
+        result[f"{kind}_duplicates"] = [[ids[i] for i in g] for g in groups]
+    return result
@@ -0,0 +1,282 @@
+"""Multi-criteria contact queries with an index-aware planner.
+
+A query is a list of conditions that must all hold (AND). It can be
+built from Condition objects or parsed from a small expression language:
+
+    query_contacts(db, "category = work AND state = NE AND name contains li AND has_email = no",
+                   sort="last_name", limit=20)
+
+Fields: name (first or last name), first_name, last_name, phone, email,
+category, street, city, state, zip_code, notes, created_date,
+last_modified and has_email. Operators: = != < <= > >=, "contains" (~)
+and "startswith" (^=). Values can be quoted with ' or ". Text comparisons
+ignore case, and phones compare in E.164 form.
+
+plan_query() picks the most selective condition the store has an index
+for (using the store's count_ids() estimates when it has them), fetches
+those ids and checks the other conditions on just those contacts. Stores
+with sorted views (ids_in_range) also serve =, >, >= and ^= on
+last_name, created_date and zip_code.
+Without a usable index, every condition is checked in one pass over the
+contacts.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from contact_manager import RANGE_FIELDS, RANGE_MAX, Contact, ContactsDB, fold, normalize_phone, phone_e164, query_key
+
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "~", "^=")
+WORD_OPERATORS = {"contains": "~", "startswith": "^="}
+ADDRESS_FIELDS = ("street", "city", "state", "zip_code")
+FIELDS = ("name", "first_name", "last_name", "phone", "email", "category", *ADDRESS_FIELDS,
+          "notes", "created_date", "last_modified", "has_email")
+TRUE_WORDS = {"true", "yes", "y", "1"}
+FALSE_WORDS = {"false", "no", "n", "0"}
+
+# (field, op) -> index kind; the store's lookup is ids_by_<kind>. Listed most selective first,
+# which is the order used when the store can't estimate counts.
+INDEXES = {
+    ("phone", "="): "phone",
+    ("email", "="): "email",
+    ("name", "="): "name",
+    ("name", "^="): "name_prefix",
+    ("name", "~"): "name_substring",
+    ("category", "="): "category",
+}
+
+# Operators a sorted view can answer; "<" and "<=" are left out because
+# contacts with an empty key (not in the view) would match them too.
+RANGE_OPERATORS = ("=", ">", ">=", "^=")
+
+_TOKEN = re.compile(r"""\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<op>!=|<=|>=|\^=|=|~|<|>)|(?P<word>[^\s=!<>~^'"]+))""")
+
+
+@dataclass(frozen=True)
+class Condition:
+    field: str
+    op: str
+    value: str
+
+    def __post_init__(self) -> None:
+        if self.field not in FIELDS:
+            raise ValueError(f"unknown field {self.field!r}; expected one of {', '.join(FIELDS)}")
+        if self.op not in OPERATORS:
+            raise ValueError(f"unknown operator {self.op!r}; expected one of {', '.join(OPERATORS)}")
+
+
+@dataclass
+class Plan:
+    """How a query runs: index is the ids_by_<kind> lookup used, "range" for a
+    sorted view (ids_in_range), or None for a full scan."""
+    index: Optional[str]
+    index_condition: Optional[Condition]
+    residual: List[Condition] = field(default_factory=list)
+    estimate: Optional[int] = None
+
+
+def _tokens(text: str) -> Iterator[Tuple[str, str]]:
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"can't parse query at {text[pos:]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        yield ("str" if kind in ("sq", "dq") else kind), m.group(kind)
+
+
+def parse_query(text: str) -> List[Condition]:
+    """Parse "field op value AND field op value ..." into conditions.
+
+    An unquoted value runs up to the next AND, so "phone = 402 555 1111" works.
+    """
+    tokens = list(_tokens(text))
+    conditions: List[Condition] = []
+    i = 0
+    while i < len(tokens):
+        if len(tokens) - i < 3:
+            raise ValueError(f"incomplete condition in query {text!r}")
+        (fkind, fname), (okind, op) = tokens[i:i + 2]
+        if okind == "word":
+            op = WORD_OPERATORS.get(op.lower(), op)
+        i += 2
+        if tokens[i][0] == "str":
+            value = tokens[i][1]
+            i += 1
+        else:
+            words = []
+            while i < len(tokens) and not (tokens[i][0] == "word" and tokens[i][1].upper() == "AND"):
+                if tokens[i][0] != "word":
+                    raise ValueError(f"unexpected {tokens[i][1]!r} in query {text!r}")
+                words.append(tokens[i][1])
+                i += 1
+            value = " ".join(words)
+        if fkind != "word" or not value and tokens[i - 1][0] != "str":
+            raise ValueError(f"expected 'field op value' in query {text!r}")
+        conditions.append(Condition(fname.lower(), op, value))
+        if i < len(tokens):
+            kind, word = tokens[i]
+            if kind != "word" or word.upper() != "AND":
+                raise ValueError(f"expected AND, got {word!r}")
+            i += 1
+            if i == len(tokens):
+                raise ValueError(f"query {text!r} ends with AND")
+    return conditions
+
+
+def _compare(op: str, value: str) -> Callable[[str], bool]:
+    return {
+        "=": lambda v: v == value,
+        "!=": lambda v: v != value,
+        "<": lambda v: v < value,
+        "<=": lambda v: v <= value,
+        ">": lambda v: v > value,
+        ">=": lambda v: v >= value,
+        "~": lambda v: value in v,
+        "^=": lambda v: v.startswith(value),
+    }[op]
+
+
+def compile_condition(cond: Condition) -> Callable[[Contact], bool]:
+    """Return a predicate over a contact dict for one condition."""
+    f, op = cond.field, cond.op
+    if f == "has_email":
+        word = fold(cond.value)
+        if word not in TRUE_WORDS | FALSE_WORDS or op not in ("=", "!="):
+            raise ValueError(f"has_email takes = or != with yes/no, not {op} {cond.value!r}")
+        want = (word in TRUE_WORDS) == (op == "=")
+        return lambda c: bool(fold(c.get("email"))) == want
+    if f == "phone":
+        if op == "~":
+            digits = normalize_phone(cond.value)
+            return lambda c: digits in normalize_phone(str(c.get("phone", "") or ""))
+        test = _compare(op, query_key("phone", cond.value))
+        return lambda c: test(phone_e164(str(c.get("phone", "") or "")))
+    test = _compare(op, fold(cond.value))
+    if f == "name":
+        if op == "!=":
+            value = fold(cond.value)
+            return lambda c: value not in (fold(c.get("first_name")), fold(c.get("last_name")))
+        return lambda c: test(fold(c.get("first_name"))) or test(fold(c.get("last_name")))
+    if f in ADDRESS_FIELDS:
+        return lambda c: test(fold((c.get("address", {}) or {}).get(f)))
+    return lambda c: test(fold(c.get(f)))
+
+
+def range_bounds(cond: Condition) -> Tuple[str, Optional[str]]:
+    """Inclusive (lo, hi) keys covering a RANGE_OPERATORS condition."""
+    value = fold(cond.value)
+    if cond.op == "=":
+        return value, value
+    if cond.op == "^=":
+        return value, value + RANGE_MAX
+    return value, None
+
+
+def plan_query(contacts_db: ContactsDB, conditions: Sequence[Condition]) -> Plan:
+    """Choose the index to start from, if the store has one for any condition."""
+    count = getattr(contacts_db, "count_ids", None)
+    ranged = hasattr(contacts_db, "ids_in_range")
+    best: Optional[Tuple[Tuple[float, int], str, Condition]] = None
+    for cond in conditions:
+        if not fold(cond.value):
+            continue
+        kind = INDEXES.get((cond.field, cond.op))
+        if kind is not None and hasattr(contacts_db, f"ids_by_{kind}"):
+            estimate = count(kind, cond.value) if count is not None else None
+            rank = (float("inf") if estimate is None else estimate, list(INDEXES.values()).index(kind))
+        elif ranged and cond.field in RANGE_FIELDS and cond.op in RANGE_OPERATORS:
+            kind = "range"
+            rank = (contacts_db.count_in_range(cond.field, *range_bounds(cond)), len(INDEXES))
+        else:
+            continue
+        if best is None or rank < best[0]:
+            best = (rank, kind, cond)
+    if best is None:
+        return Plan(None, None, list(conditions))
+    rank, kind, cond = best
+    estimate = None if rank[0] == float("inf") else int(rank[0])
+    # a range scan from ">" includes keys equal to the value, so that condition is rechecked
+    return Plan(kind, cond, [c for c in conditions if c is not cond or c.op == ">"], estimate)
+
+
+def _candidates(contacts_db: ContactsDB, plan: Plan) -> Iterable[Tuple[str, Contact]]:
+    if plan.index is None:
+        return contacts_db.items()
+    if plan.index == "range":
+        ids = contacts_db.ids_in_range(plan.index_condition.field, *range_bounds(plan.index_condition))
+        return ((cid, contacts_db[cid]) for cid in ids)
+    lookup = getattr(contacts_db, f"ids_by_{plan.index}")
+    if plan.index == "name_prefix":
+        ids = lookup(plan.index_condition.value, len(contacts_db))
+    else:
+        ids = lookup(plan.index_condition.value)
+    return ((cid, contacts_db[cid]) for cid in ids)
+
+
+def sort_key(fields: Union[str, Sequence[str]]) -> Tuple[Callable[[Tuple[str, Contact]], Any], bool]:
+    """Return (key, reverse) for sorting (id, contact) pairs by fields ("-field" sorts descending)."""
+    names = [fields] if isinstance(fields, str) else list(fields)
+    reverse = names[0].startswith("-")
+    if any(n.startswith("-") != reverse for n in names):
+        raise ValueError("sort fields must all be ascending or all descending")
+    names = [n.lstrip("-") for n in names]
+    for n in names:
+        if n not in FIELDS and n != "id":
+            raise ValueError(f"unknown sort field {n!r}")
+
+    def value(cid: str, c: Contact, n: str) -> Any:
+        if n == "id":
+            return cid
+        if n == "name":
+            return fold(c.get("last_name")), fold(c.get("first_name"))
+        if n in ADDRESS_FIELDS:
+            return fold((c.get("address", {}) or {}).get(n))
+        if n == "has_email":
+            return bool(fold(c.get("email")))
+        return fold(c.get(n))
+
+    return (lambda item: tuple(value(item[0], item[1], n) for n in names) + (item[0],)), reverse
+
+
+def iter_query(contacts_db: ContactsDB, where: Union[str, Sequence[Condition], None] = None
+               ) -> Iterator[Tuple[str, Contact]]:
+    """Lazily yield the (id, contact) pairs matching where, in plan order.
+
+    The query is parsed and planned right away, so errors surface here
+    rather than on the first next().
+    """
+    conditions = parse_query(where) if isinstance(where, str) else list(where or [])
+    plan = plan_query(contacts_db, conditions)
+    checks = [compile_condition(c) for c in plan.residual]
+    return ((cid, c) for cid, c in _candidates(contacts_db, plan) if all(check(c) for check in checks))
+
+
+def query_contacts(contacts_db: ContactsDB, where: Union[str, Sequence[Condition], None] = None,
+                   sort: Union[str, Sequence[str], None] = None, limit: Optional[int] = None,
+                   offset: int = 0) -> ContactsDB:
+    """Return {id: contact} for contacts matching every condition in where.
+
+    where is a query string or a list of Conditions (None matches all).
+    Without sort, matches come in the order of the index the plan starts
+    from (store order for a scan), and the work stops as soon as
+    offset + limit of them are found. With sort and a limit only the
+    top offset + limit are kept while scanning.
+    """
+    matches = iter_query(contacts_db, where)
+    if sort is not None:
+        key, reverse = sort_key(sort)
+        if limit is not None:
+            pick = heapq.nlargest if reverse else heapq.nsmallest
+            rows = pick(offset + limit, matches, key=key)
+        else:
+            rows = sorted(matches, key=key, reverse=reverse)
+        matches = iter(rows)
+    stop = None if limit is None else offset + limit
+    return dict(islice(matches, offset, stop))
@@ -0,0 +1,404 @@
+"""HTTP/JSON front end for a contact store, on asyncio and the stdlib only.
+
+One event loop serves every client, so thousands of idle keep-alive
+connections cost a socket and a coroutine each rather than a thread.
+Anything that walks the whole store (searches, statistics, duplicate
+detection, building an export) runs in an executor so the loop keeps
+answering other clients meanwhile.
+
+    GET    /contacts?name=li | category=work | phone=... | q=<query>   search
+           (&sort=last_name&limit=50&offset=0; q uses contact_query syntax;
+           at most DEFAULT_LIMIT results unless limit says otherwise)
+    POST   /contacts              add a contact, or a list of them
+    GET    /contacts/<id>         one contact
+    PATCH  /contacts/<id>         update fields
+    DELETE /contacts/<id>         delete
+    GET    /stats                 generate_contact_statistics
+    GET    /duplicates            find_duplicate_contacts (&fuzzy=1&threshold=0.7)
+    GET    /export?format=csv     streamed export (text, csv, vcard or jsonl; &category=work)
+
+Responses are JSON, errors are {"error": message}. Connections are kept
+alive (HTTP/1.1) until the client closes them or sits idle for
+idle_timeout seconds. Exports are sent with chunked transfer encoding, one
+chunk per export chunk. The matching ids are listed when the request
+arrives, and each chunk's contacts are then read from the store under the
+read lock. The export never copies the store, and a slow reader holds up
+writers only while a chunk is being built. Contacts deleted in the
+meantime are left out.
+
+Every call into the store runs in the executor, never on the loop. A
+write waits for the reads in progress to finish, and new reads wait for a
+pending write. Stores that may only be used from one thread at a time
+(thread_safe = False, like SQLiteContactsDB) get a single worker thread.
+
+    python contact_service.py contacts.json 8080
+
+Run that way, the store is a journal with group commit (COMMIT_RECORDS /
+COMMIT_MS), so a burst of writes shares one fsync instead of paying one each.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from contact_manager import (ContactsDB, add_contact, add_contacts_bulk, find_contact_by_phone, find_duplicate_contacts,
+                             generate_contact_statistics, json_default, missing_required_fields, now_iso,
+                             search_contacts_by_category, search_contacts_by_name, update_contact)
+
+EDITABLE_FIELDS = ("first_name", "last_name", "phone", "email", "address", "category", "notes")
+EXPORT_TYPES = {"text": "text/plain", "csv": "text/csv", "vcard": "text/vcard", "jsonl": "application/x-ndjson"}
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error"}
+MAX_HEADER_LINES = 100
+DEFAULT_LIMIT = 100  # search results per response when the request gives no limit
+COMMIT_RECORDS, COMMIT_MS = 100, 20.0  # journal group commit when run as a script
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method: str, target: str, version: str, headers: Dict[str, str], body: bytes) -> None:
+        self.method = method
+        self.version = version
+        self.headers = headers
+        self.body = body
+        parts = urlsplit(target)
+        self.path = unquote(parts.path)
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Any:
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON") from None
+
+
+class _ReadWriteLock:
+    """Many readers (executor jobs) or one writer; a waiting writer blocks new readers."""
+
+    def __init__(self) -> None:
+        self._readers = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._writer = asyncio.Lock()
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        async with self._writer:
+            self._readers += 1
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            self._readers -= 1
+            if not self._readers:
+                self._idle.set()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        async with self._writer:
+            await self._idle.wait()
+            yield
+
+
+def _int_param(query: Dict[str, str], name: str, default: Optional[int]) -> Optional[int]:
+    if name not in query:
+        return default
+    try:
+        return int(query[name])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer") from None
+
+
+def _new_contact(body: Any) -> Dict[str, Any]:
+    """A contact in the add_contact shape from a request body, with defaults filled in."""
+    if not isinstance(body, dict):
+        raise HTTPError(400, "expected a JSON object")
+    today = now_iso()
+    contact = {"first_name": "", "last_name": "", "phone": "", "email": "",
+               "address": {"street": "", "city": "", "state": "", "zip_code": ""},
+               "category": "personal", "notes": "", "created_date": today, "last_modified": today}
+    contact.update({k: v for k, v in body.items() if k in EDITABLE_FIELDS})
+    return contact
+
+
+class ContactService:
+    """Serves one contact store over HTTP. See the module docstring for the routes."""
+
+    def __init__(self, contacts_db: ContactsDB, executor: Optional[Executor] = None,
+                 idle_timeout: float = 60.0, max_body: int = 1 << 20, export_chunk: int = 1000) -> None:
+        self.contacts_db = contacts_db
+        workers = None if getattr(contacts_db, "thread_safe", True) else 1
+        self.executor = executor or ThreadPoolExecutor(workers, thread_name_prefix="contact-service")
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        self.export_chunk = export_chunk
+        self._lock: Optional[_ReadWriteLock] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, backlog: int = 1024) -> asyncio.AbstractServer:
+        """Start listening; port=0 picks a free port (see server.sockets[0].getsockname())."""
+        self._lock = _ReadWriteLock()
+        return await asyncio.start_server(self.handle_client, host, port, backlog=backlog)
+
+    async def _read(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in the executor while no write is in progress."""
+        async with self._lock.read():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _write(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in the executor with no reads or other writes in progress."""
+        async with self._lock.write():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # --- connection handling ---
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                keep_alive = request.keep_alive
+                try:
+                    await self.dispatch(request, writer, keep_alive)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except ValueError as e:
+                    await self._send_json(writer, 400, {"error": str(e)}, keep_alive)
+                except Exception as e:  # keep serving other requests
+                    await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _readline(reader: asyncio.StreamReader) -> bytes:
+        try:
+            return await reader.readline()
+        except ValueError:  # longer than the reader's limit
+            raise HTTPError(400, "request line or header too long") from None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Read one request; None when the client closed the connection between requests."""
+        line = await self._readline(reader)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await self._readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(400, "too many header lines")
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "send a Content-Length instead of a chunked body")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length") from None
+        if length > self.max_body:
+            raise HTTPError(413, f"request body is over {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, version, headers, body)
+
+    @staticmethod
+    def _head(status: int, headers: List[Tuple[str, str]], keep_alive: bool) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines += [f"{k}: {v}" for k, v in headers]
+        lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=json_default).encode("utf-8")
+        headers = [("Content-Type", "application/json; charset=utf-8"), ("Content-Length", str(len(body)))]
+        writer.write(self._head(status, headers, keep_alive) + body)
+        await writer.drain()
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, content_type: str, chunks: Iterator[str],
+                           keep_alive: bool) -> None:
+        """Send chunks with chunked transfer encoding; each chunk is built in the executor, under the read lock."""
+        headers = [("Content-Type", content_type + "; charset=utf-8"), ("Transfer-Encoding", "chunked")]
+        writer.write(self._head(200, headers, keep_alive))
+        while True:
+            text = await self._read(next, chunks, None)
+            if text is None:
+                break
+            data = text.encode("utf-8")
+            if data:
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # --- routes ---
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter, keep_alive: bool) -> None:
+        parts = [p for p in request.path.split("/") if p]
+        method = request.method
+        if parts == ["contacts"]:
+            if method == "GET":
+                return await self._send_json(writer, 200, await self._read(self.search, request.query), keep_alive)
+            if method == "POST":
+                status, payload = await self.add(request.json())
+                return await self._send_json(writer, status, payload, keep_alive)
+            raise HTTPError(405, f"{method} not allowed on /contacts")
+        if len(parts) == 2 and parts[0] == "contacts":
+            cid = parts[1]
+            if method == "GET":
+                contact = await self._read(self.contacts_db.get, cid)
+                if contact is None:
+                    raise HTTPError(404, f"no contact {cid}")
+                return await self._send_json(writer, 200, {"id": cid, "contact": contact}, keep_alive)
+            if method == "PATCH":
+                return await self._send_json(writer, 200, await self.update(cid, request.json()), keep_alive)
+            if method == "DELETE":
+                if await self._write(self.contacts_db.pop, cid, None) is None:
+                    raise HTTPError(404, f"no contact {cid}")
+                return await self._send_json(writer, 200, {"deleted": cid}, keep_alive)
+            raise HTTPError(405, f"{method} not allowed on /contacts/<id>")
+        if method != "GET":
+            raise HTTPError(405, f"{method} not allowed on {request.path}")
+        if parts == ["stats"]:
+            return await self._send_json(writer, 200, await self._read(generate_contact_statistics,
+                                                                       self.contacts_db), keep_alive)
+        if parts == ["duplicates"]:
+            fuzzy = request.query.get("fuzzy", "").lower() in ("1", "true", "yes")
+            try:
+                threshold = float(request.query.get("threshold", 0.7))
+            except ValueError:
+                raise HTTPError(400, "threshold must be a number") from None
+            result = await self._read(lambda: find_duplicate_contacts(self.contacts_db, fuzzy, threshold))
+            return await self._send_json(writer, 200, result, keep_alive)
+        if parts == ["export"]:
+            fmt = request.query.get("format", "text")
+            if fmt not in EXPORT_TYPES:
+                raise HTTPError(400, f"unknown export format {fmt!r}; expected one of {', '.join(EXPORT_TYPES)}")
+            chunks = self.export_chunks(fmt, request.query.get("category"))
+            return await self._send_stream(writer, EXPORT_TYPES[fmt], chunks, keep_alive)
+        raise HTTPError(404, f"no route for {request.path}")
+
+    def search(self, query: Dict[str, str]) -> Dict[str, Any]:
+        """GET /contacts: runs in the executor."""
+        limit = _int_param(query, "limit", DEFAULT_LIMIT)
+        offset = _int_param(query, "offset", 0)
+        if "phone" in query:
+            cid, contact = find_contact_by_phone(self.contacts_db, query["phone"])
+            matches = {cid: contact} if cid else {}
+        elif "name" in query:
+            matches = search_contacts_by_name(self.contacts_db, query["name"])
+        elif "category" in query:
+            matches = search_contacts_by_category(self.contacts_db, query["category"])
+        else:
+            from contact_query import query_contacts
+            matches = query_contacts(self.contacts_db, query.get("q"), query.get("sort"), limit, offset)
+            return {"count": len(matches), "offset": offset, "limit": limit, "contacts": matches}
+        from contact_query import query_contacts
+        matches = query_contacts(matches, None, query.get("sort"), limit, offset)
+        return {"count": len(matches), "offset": offset, "limit": limit, "contacts": matches}
+
+    def export_chunks(self, fmt: str, category: Optional[str]) -> Iterator[str]:
+        """The export, one chunk per next(); each next() runs under the read lock.
+
+        Only the ids are listed up front. Each chunk's contacts are read
+        from the store when that chunk is built.
+        """
+        from contact_export import iter_export
+        lookup = getattr(self.contacts_db, "ids_by_category", None)
+        cat = (category or "").strip().lower()
+        ids = list(lookup(cat)) if cat and lookup is not None else list(self.contacts_db)
+        if not ids:
+            yield "".join(iter_export({}, fmt))
+        for start in range(0, len(ids), self.export_chunk):
+            rows = {}
+            for cid in ids[start:start + self.export_chunk]:
+                contact = self.contacts_db.get(cid)
+                if contact is not None:
+                    rows[cid] = contact
+            parts = iter_export(rows, fmt, category or None, chunk_size=self.export_chunk)
+            if fmt == "csv" and start:
+                next(parts)  # the header went out with the first chunk
+            yield "".join(parts)
+
+    async def add(self, body: Any) -> Tuple[int, Dict[str, Any]]:
+        if isinstance(body, list):
+            contacts = [_new_contact(c) if isinstance(c, dict) else c for c in body]
+            return 201, await self._write(add_contacts_bulk, self.contacts_db, contacts)
+        contact = _new_contact(body)
+        missing = missing_required_fields(contact)
+        if missing:
+            raise HTTPError(422, "missing " + ", ".join(missing))
+        return 201, {"id": await self._write(add_contact, self.contacts_db, contact)}
+
+    async def update(self, cid: str, body: Any) -> Dict[str, Any]:
+        if not isinstance(body, dict):
+            raise HTTPError(400, "expected a JSON object")
+        unknown = sorted(set(body) - set(EDITABLE_FIELDS))
+        if unknown:
+            raise HTTPError(422, "can't update " + ", ".join(unknown))
+        return await self._write(self._update, cid, body)
+
+    def _update(self, cid: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """PATCH /contacts/<id>: runs in the executor."""
+        contact = self.contacts_db.get(cid)
+        if contact is None:
+            raise HTTPError(404, f"no contact {cid}")
+        if missing_required_fields({**contact, **body}):
+            raise HTTPError(422, "update would clear a required field")
+        update_contact(self.contacts_db, cid, body)
+        return {"id": cid, "contact": self.contacts_db[cid]}
+
+
+async def serve(contacts_db: ContactsDB, host: str = "127.0.0.1", port: int = 8080) -> None:
+    """Serve contacts_db until cancelled."""
+    server = await ContactService(contacts_db).start(host, port)
+    print(f"Serving contacts on http://{host}:{server.sockets[0].getsockname()[1]}/")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
+    if len(sys.argv) > 1:
+        from contact_journal import open_journal
+        with open_journal(sys.argv[1], commit_records=COMMIT_RECORDS, commit_ms=COMMIT_MS) as contacts:
+            asyncio.run(serve(contacts, port=port))
+    else:
+        from contact_index import IndexedContactsDB
+        asyncio.run(serve(IndexedContactsDB(), port=port))
@@ -0,0 +1,331 @@
+"""A contact book split by contact id across worker processes.
+
+ShardedContacts starts one process per shard. Each process owns an
+IndexedContactsDB holding the contacts whose id hashes to it
+(shard_of()), so lookups and scans run in parallel and no single process
+holds the whole book. The coordinator mirrors the contact_manager
+functions:
+
+    with open_sharded("contacts.json", shards=4) as book:
+        cid = book.add_contact(contact)
+        book.search_contacts_by_category("work")
+        book.find_contact_by_phone("402-555-1111")
+        book.generate_contact_statistics()
+        book.find_duplicate_contacts()
+        book.save_contacts_to_file("contacts.json")
+
+Queries are scatter-gather: the request goes to every shard at once and
+the partial results are merged. Search results are ordered by contact
+id, which is insertion order for ids the coordinator handed out.
+Statistics add up each shard's counts.
+
+Duplicates are found with one shuffle round over the shards' stored match
+keys. The shards are connected to each other by pipes as well as to the
+coordinator. Each shard splits its keys by key_shard() into one
+partition per shard and sends each partition straight to the shard that
+owns those keys. Each owner then groups what it receives and sends only
+the groups of two or more to the coordinator. Contacts on different
+shards that share a phone, email or name still end up in one group. Each
+key crosses a pipe at most once, and the coordinator sees only the groups.
+
+Each shard saves to and loads from its own file, shard_path(filename, i, n),
+with save_contacts_to_file / load_contacts_from_file, so delta saves work
+per shard too.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import zlib
+from functools import partial
+from itertools import islice
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from contact_manager import (DUPLICATE_KEYS, ID_PREFIX, Contact, ContactsDB, add_contacts_bulk, contact_id_number,
+                             find_contact_by_phone, load_contacts_from_file, missing_required_fields,
+                             save_contacts_to_file, search_contacts_by_category, statistics_counts, statistics_report,
+                             update_contact)
+
+KINDS = tuple(DUPLICATE_KEYS)  # ("phone", "email", "name")
+
+
+def shard_of(contact_id: str, shards: int) -> int:
+    """The shard that owns contact_id (a stable hash, unlike hash())."""
+    return zlib.crc32(contact_id.encode("utf-8")) % shards
+
+
+def key_shard(key: str, shards: int) -> int:
+    """The shard that groups duplicates for match key `key` in find_duplicate_contacts."""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+def shard_path(filename: str, shard: int, shards: int) -> str:
+    """contacts.json -> contacts.shard1-of-4.json"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.shard{shard}-of-{shards}{ext}"
+
+
+def _id_order(contact_id: str) -> Tuple[int, str]:
+    return contact_id_number(contact_id), contact_id
+
+
+# --- operations run inside a shard process, on its own store ---
+
+def _put_many(db: ContactsDB, rows: List[Tuple[str, Contact]]) -> None:
+    if len(rows) == 1:  # add_contact: a plain write, no transaction to open and close
+        cid, c = rows[0]
+        db[cid] = c
+        return
+    with db.transaction():
+        for cid, c in rows:
+            db[cid] = c
+
+
+KeyTable = Dict[str, Dict[str, List[str]]]  # {kind: {match key: [ids]}}
+
+
+def _partition_keys(db: ContactsDB, shards: int) -> List[KeyTable]:
+    """This shard's non-empty match keys, split by the shard that owns each key."""
+    parts: List[KeyTable] = [{kind: {} for kind in KINDS} for _ in range(shards)]
+    for cid in db:
+        keys = db.match_keys_of(cid)
+        for kind in KINDS:
+            key = getattr(keys, kind)
+            if key:
+                parts[key_shard(key, shards)][kind].setdefault(key, []).append(cid)
+    return parts
+
+
+def _group_keys(db: ContactsDB, parts: List[KeyTable]) -> Dict[str, List[List[str]]]:
+    """Merge the partitions sent to this shard; {kind: [ids, ...]} for keys held by 2+ contacts."""
+    merged: KeyTable = {kind: {} for kind in KINDS}
+    for part in parts:
+        for kind in KINDS:
+            for key, ids in part[kind].items():
+                merged[kind].setdefault(key, []).extend(ids)
+    return {kind: [ids for ids in merged[kind].values() if len(ids) >= 2] for kind in KINDS}
+
+
+def _duplicate_groups(db: ContactsDB, shard: int, peers: Dict[int, Any]) -> Dict[str, List[List[str]]]:
+    """Swap key partitions with every other shard, then group the keys this shard owns."""
+    parts = _partition_keys(db, len(peers) + 1)
+    # Send from a thread while receiving here, so full pipes can't deadlock two shards sending to each other.
+    sender = threading.Thread(target=lambda: [conn.send(parts[j]) for j, conn in peers.items()])
+    sender.start()
+    received = [parts[shard]]
+    waiting = list(peers.values())
+    while waiting:
+        for conn in wait(waiting):
+            received.append(conn.recv())
+            waiting.remove(conn)
+    sender.join()
+    return _group_keys(db, received)
+
+
+SHARD_OPS: Dict[str, Callable[..., Any]] = {
+    "put_many": _put_many,
+    "get": lambda db, cid: db.get(cid),
+    "update": update_contact,
+    "delete": lambda db, cid: db.pop(cid, None) is not None,
+    "len": len,
+    "next_id": lambda db: db.next_id,
+    "category": search_contacts_by_category,
+    "phone": find_contact_by_phone,
+    "stats": lambda db: (len(db), statistics_counts(db)),
+    "save": save_contacts_to_file,
+}
+
+
+def _serve_shard(conn: Any, filename: Optional[str], shard: int, peers: Dict[int, Any]) -> None:
+    """Shard process main loop: run (op, args) requests until "close".
+
+    peers maps every other shard's index to this shard's pipe to it.
+    """
+    from contact_index import IndexedContactsDB
+    db = load_contacts_from_file(filename) if filename else IndexedContactsDB()
+    ops = dict(SHARD_OPS, duplicate_groups=partial(_duplicate_groups, shard=shard, peers=peers))
+    while True:
+        op, args = conn.recv()
+        if op == "close":
+            conn.send((True, None))
+            return
+        try:
+            conn.send((True, ops[op](db, *args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class ShardedContacts:
+    """Coordinator for N shard processes; see the module docstring."""
+
+    def __init__(self, shards: int = 4, filename: Optional[str] = None) -> None:
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.shards = shards
+        self._lock = threading.Lock()
+        self._conns = []
+        self._procs = []
+        mesh: List[Dict[int, Any]] = [{} for _ in range(shards)]
+        for i in range(shards):
+            for j in range(i + 1, shards):
+                mesh[i][j], mesh[j][i] = multiprocessing.Pipe()
+        for i in range(shards):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_serve_shard, daemon=True,
+                                           args=(child, shard_path(filename, i, shards) if filename else None,
+                                                 i, mesh[i]))
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        for peers in mesh:
+            for end in peers.values():
+                end.close()
+        self.next_id = max(self._scatter("next_id"))
+
+    # --- plumbing ---
+
+    @staticmethod
+    def _result(reply: Tuple[bool, Any]) -> Any:
+        ok, value = reply
+        if not ok:
+            raise value
+        return value
+
+    def _call(self, shard: int, op: str, *args: Any) -> Any:
+        with self._lock:
+            self._conns[shard].send((op, args))
+            return self._result(self._conns[shard].recv())
+
+    def _scatter(self, op: str, *args: Any, per_shard: Optional[List[Tuple[Any, ...]]] = None) -> List[Any]:
+        """Send op to every shard before waiting on any, then gather the results in shard order."""
+        with self._lock:
+            for i, conn in enumerate(self._conns):
+                conn.send((op, per_shard[i] if per_shard is not None else args))
+            replies = [conn.recv() for conn in self._conns]
+        return [self._result(reply) for reply in replies]
+
+    def _shard(self, contact_id: str) -> int:
+        return shard_of(contact_id, self.shards)
+
+    def close(self) -> None:
+        for i in range(len(self._conns)):
+            self._call(i, "close")
+        for proc in self._procs:
+            proc.join()
+        self._conns, self._procs = [], []
+
+    def __enter__(self) -> "ShardedContacts":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(self._scatter("len"))
+
+    # --- writes and single-contact calls go to the owning shard ---
+
+    def allocate_id(self) -> str:
+        with self._lock:
+            cid = f"{ID_PREFIX}{self.next_id:03d}"
+            self.next_id += 1
+        return cid
+
+    def add_contact(self, contact_data: Contact) -> Optional[str]:
+        if missing_required_fields(contact_data):
+            return None
+        cid = self.allocate_id()
+        self._call(self._shard(cid), "put_many", [(cid, contact_data)])
+        return cid
+
+    def add_contacts_bulk(self, contacts: Iterable[Contact], batch_size: int = 1000) -> Dict[str, Any]:
+        """Like contact_manager.add_contacts_bulk; each batch is sent to the shards in parallel."""
+        added: List[str] = []
+        rejected: List[Tuple[int, str]] = []
+        rows = iter(contacts)
+        start = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            staged = _Staging(self)
+            out = add_contacts_bulk(staged, batch, len(batch))
+            added.extend(out["added"])
+            rejected.extend((start + i, reason) for i, reason in out["rejected"])
+            start += len(batch)
+            per_shard: List[List[Tuple[str, Contact]]] = [[] for _ in range(self.shards)]
+            for cid, c in staged.items():
+                per_shard[self._shard(cid)].append((cid, c))
+            self._scatter("put_many", per_shard=[(part,) for part in per_shard])
+        return {"added": added, "rejected": rejected}
+
+    def get_contact(self, contact_id: str) -> Optional[Contact]:
+        return self._call(self._shard(contact_id), "get", contact_id)
+
+    def update_contact(self, contact_id: str, field_updates: Dict[str, Any]) -> bool:
+        return self._call(self._shard(contact_id), "update", contact_id, field_updates)
+
+    def delete_contact(self, contact_id: str) -> bool:
+        return self._call(self._shard(contact_id), "delete", contact_id)
+
+    # --- scatter-gather queries ---
+
+    def search_contacts_by_category(self, category: str) -> ContactsDB:
+        merged: ContactsDB = {}
+        for part in self._scatter("category", category):
+            merged.update(part)
+        return {cid: merged[cid] for cid in sorted(merged, key=_id_order)}
+
+    def find_contact_by_phone(self, phone_number: str) -> Tuple[Optional[str], Optional[Contact]]:
+        """The lowest-id match over all shards, as a single store would find it first."""
+        hits = [(cid, c) for cid, c in self._scatter("phone", phone_number) if cid is not None]
+        return min(hits, key=lambda hit: _id_order(hit[0])) if hits else (None, None)
+
+    def generate_contact_statistics(self) -> Dict[str, Any]:
+        total, no_email = 0, 0
+        sums: Tuple[Dict[str, int], Dict[str, int], Dict[str, int]] = ({}, {}, {})
+        for n, (by_cat, by_state, area_counts, missing) in self._scatter("stats"):
+            total += n
+            no_email += missing
+            for acc, part in zip(sums, (by_cat, by_state, area_counts)):
+                for k, v in part.items():
+                    acc[k] = acc.get(k, 0) + v
+        return statistics_report(total, (*sums, no_email))
+
+    def find_duplicate_contacts(self) -> Dict[str, Any]:
+        """Exact duplicate groups across all shards, ids and groups in id order.
+
+        One shuffle round between the shards; only the groups that have
+        duplicates come back to the coordinator.
+        """
+        grouped = self._scatter("duplicate_groups")
+        result = {}
+        for kind in KINDS:
+            groups = [sorted(ids, key=_id_order) for part in grouped for ids in part[kind]]
+            result[f"{kind}_duplicates"] = sorted(groups, key=lambda ids: _id_order(ids[0]))
+        return result
+
+    def save_contacts_to_file(self, filename: str) -> List[str]:
+        """Each shard saves its own file in parallel. Returns the shard file names."""
+        paths = [shard_path(filename, i, self.shards) for i in range(self.shards)]
+        self._scatter("save", per_shard=[(path,) for path in paths])
+        return paths
+
+
+class _Staging(dict):
+    """Collects one batch of add_contacts_bulk inserts, with ids from the coordinator."""
+
+    def __init__(self, book: ShardedContacts) -> None:
+        super().__init__()
+        self.book = book
+
+    def allocate_id(self) -> str:
+        return self.book.allocate_id()
+
+
+def open_sharded(filename: Optional[str] = None, shards: int = 4) -> ShardedContacts:
+    """Start shards that load filename's shard files (if they exist)."""
+    return ShardedContacts(shards, filename)
@@ -0,0 +1,157 @@
+"""A sorted container for the ordered views kept by IndexedContactsDB.
+
+SortedList keeps its items in a list of sorted chunks of up to 2 * LOAD
+items, plus the largest item of each chunk. That makes it a one-level
+B-tree: finding a position is two binary searches, and an insert or
+delete only shifts items within one chunk, instead of shifting half of
+a single million-entry list as insort() would.
+
+A Fenwick tree over the chunk lengths gives the number of items before
+any chunk in O(log n), so count_range(lo, hi) is O(log n) and irange(lo,
+hi), which yields the items between lo and hi in order, is O(log n + k).
+The tree is updated in place when an item is added or removed. It is
+rebuilt only when a chunk is split or emptied, about once per LOAD
+changes.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+from typing import Any, Iterable, Iterator, List, Optional
+
+
+class SortedList:
+    """Sorted items in chunks; see the module docstring."""
+
+    LOAD = 512
+
+    def __init__(self, items: Iterable[Any] = ()) -> None:
+        ordered = sorted(items)
+        self._lists: List[List[Any]] = [ordered[i:i + self.LOAD] for i in range(0, len(ordered), self.LOAD)]
+        self._maxes: List[Any] = [chunk[-1] for chunk in self._lists]
+        self._len = len(ordered)
+        self._rebuild_index()
+
+    # --- positional index: a Fenwick tree over len(chunk) ---
+
+    def _rebuild_index(self) -> None:
+        tree = [0] * (len(self._lists) + 1)
+        for k, chunk in enumerate(self._lists, 1):
+            tree[k] += len(chunk)
+            parent = k + (k & -k)
+            if parent < len(tree):
+                tree[parent] += tree[k]
+        self._index = tree
+
+    def _resize(self, i: int, delta: int) -> None:
+        """Chunk i gained (or lost) delta items."""
+        tree = self._index
+        k = i + 1
+        while k < len(tree):
+            tree[k] += delta
+            k += k & -k
+
+    def _before(self, i: int) -> int:
+        """Number of items in the chunks before chunk i."""
+        tree = self._index
+        total = 0
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._lists)
+
+    def __contains__(self, item: Any) -> bool:
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            return False
+        chunk = self._lists[i]
+        j = bisect_left(chunk, item)
+        return chunk[j] == item
+
+    def add(self, item: Any) -> None:
+        if not self._maxes:
+            self._lists.append([item])
+            self._maxes.append(item)
+            self._len = 1
+            self._rebuild_index()
+            return
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            i -= 1
+            self._lists[i].append(item)
+            self._maxes[i] = item
+        else:
+            insort(self._lists[i], item)
+        self._len += 1
+        chunk = self._lists[i]
+        if len(chunk) > 2 * self.LOAD:
+            half = chunk[self.LOAD:]
+            del chunk[self.LOAD:]
+            self._maxes[i] = chunk[-1]
+            self._lists.insert(i + 1, half)
+            self._maxes.insert(i + 1, half[-1])
+            self._rebuild_index()
+        else:
+            self._resize(i, 1)
+
+    def remove(self, item: Any) -> None:
+        """Remove item; ValueError if it isn't there."""
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            raise ValueError(f"{item!r} not in list")
+        chunk = self._lists[i]
+        j = bisect_left(chunk, item)
+        if chunk[j] != item:
+            raise ValueError(f"{item!r} not in list")
+        del chunk[j]
+        self._len -= 1
+        if not chunk:
+            del self._lists[i]
+            del self._maxes[i]
+            self._rebuild_index()
+            return
+        if j == len(chunk):
+            self._maxes[i] = chunk[-1]
+        self._resize(i, -1)
+
+    def discard(self, item: Any) -> None:
+        try:
+            self.remove(item)
+        except ValueError:
+            pass
+
+    def _position(self, item: Any, right: bool) -> int:
+        """Index item would be inserted at (after equal items if right)."""
+        find = bisect_right if right else bisect_left
+        i = find(self._maxes, item)
+        if i == len(self._maxes):
+            return self._len
+        return self._before(i) + find(self._lists[i], item)
+
+    def irange(self, lo: Optional[Any] = None, hi: Optional[Any] = None) -> Iterator[Any]:
+        """Yield items with lo <= item <= hi in order (None leaves that end open)."""
+        if lo is None:
+            i, j = 0, 0
+        else:
+            i = bisect_left(self._maxes, lo)
+            j = bisect_left(self._lists[i], lo) if i < len(self._lists) else 0
+        for k in range(i, len(self._lists)):
+            chunk = self._lists[k]
+            for m in range(j, len(chunk)):
+                item = chunk[m]
+                if hi is not None and item > hi:
+                    return
+                yield item
+            j = 0
+
+    def count_range(self, lo: Optional[Any] = None, hi: Optional[Any] = None) -> int:
+        """How many items irange(lo, hi) would yield, without walking them."""
+        start = 0 if lo is None else self._position(lo, right=False)
+        end = self._len if hi is None else self._position(hi, right=True)
+        return max(end - start, 0)
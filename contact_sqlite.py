@@ -0,0 +1,252 @@
+"""SQLite-backed ContactsDB for contact books that don't fit in memory.
+
+SQLiteContactsDB is a MutableMapping of contact id -> contact dict, so the
+functions in contact_manager work on it unchanged. Each contact is stored
+as JSON next to the normalized columns the lookups, statistics and
+duplicate checks need, and those run as indexed SQL queries instead of
+Python loops. Only the rows a caller asks for are ever in memory.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from collections.abc import ItemsView, MutableMapping, ValuesView
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from contact_index import index_keys
+from contact_manager import (ID_PREFIX, Contact, contact_id_number, json_default, match_keys, query_key,
+                             statistics_keys)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    phone_key TEXT NOT NULL,
+    email_key TEXT NOT NULL,
+    first_lc TEXT NOT NULL,
+    last_lc TEXT NOT NULL,
+    category_key TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    state_key TEXT NOT NULL,
+    area_code TEXT NOT NULL,
+    has_email INTEGER NOT NULL,
+    stat_category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_phone ON contacts(phone_key);
+CREATE INDEX IF NOT EXISTS contacts_email ON contacts(email_key);
+CREATE INDEX IF NOT EXISTS contacts_first ON contacts(first_lc, id);
+CREATE INDEX IF NOT EXISTS contacts_last ON contacts(last_lc, id);
+CREATE INDEX IF NOT EXISTS contacts_category ON contacts(category_key);
+CREATE INDEX IF NOT EXISTS contacts_name ON contacts(name_key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+COLUMNS = ("id", "data", "phone_key", "email_key", "first_lc", "last_lc", "category_key",
+           "name_key", "state_key", "area_code", "has_email", "stat_category")
+DUPLICATE_COLUMNS = {"phone": "phone_key", "email": "email_key", "name": "name_key"}
+
+
+def contact_row(contact_id: str, c: Contact) -> Tuple[Any, ...]:
+    keys = match_keys(c)
+    phone, email, first, last, category = index_keys(c, keys)
+    # Statistics group categories by statistics_keys (lower()), lookups by index_keys
+    # (casefold), so "Straße" has a different key in each column.
+    stat_category, state, area_code, has_email = statistics_keys(c)
+    return (
+        contact_id,
+        json.dumps(c, ensure_ascii=False, default=json_default),
+        phone,
+        email,
+        first,
+        last,
+        category,
+        keys.name,
+        state,
+        area_code,
+        1 if has_email else 0,
+        stat_category,
+    )
+
+
+class _Items(ItemsView):
+    def __iter__(self):
+        return self._mapping._rows("SELECT id, data FROM contacts ORDER BY rowid")
+
+
+class _Values(ValuesView):
+    def __iter__(self):
+        return (c for _, c in self._mapping._rows("SELECT id, data FROM contacts ORDER BY rowid"))
+
+
+class SQLiteContactsDB(MutableMapping):
+    """A ContactsDB stored in a SQLite database file (":memory:" by default).
+
+    Every write commits on its own unless it runs inside transaction(),
+    which is the way to do bulk loads.
+
+    The connection may be handed to another thread (contact_service runs
+    the store on a worker thread), but only one thread may use it at a time.
+    """
+
+    thread_safe = False
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._in_transaction = False
+
+    def _commit(self) -> None:
+        if not self._in_transaction:
+            self.conn.commit()
+
+    @contextmanager
+    def transaction(self) -> Iterator["SQLiteContactsDB"]:
+        """Group many writes into one commit (rolled back on error)."""
+        self._in_transaction = True
+        try:
+            yield self
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._in_transaction = False
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def _rows(self, sql: str, params: Tuple[Any, ...] = ()) -> Iterator[Tuple[str, Contact]]:
+        for cid, data in self.conn.execute(sql, params):
+            yield cid, json.loads(data)
+
+    def _ids(self, sql: str, params: Tuple[Any, ...] = ()) -> List[str]:
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    # --- MutableMapping ---
+
+    def __getitem__(self, contact_id: str) -> Contact:
+        row = self.conn.execute("SELECT data FROM contacts WHERE id = ?", (contact_id,)).fetchone()
+        if row is None:
+            raise KeyError(contact_id)
+        return json.loads(row[0])
+
+    def __setitem__(self, contact_id: str, contact: Contact) -> None:
+        # An upsert keeps the rowid, so replaced contacts keep their place in
+        # iteration order just like a dict.
+        updates = ", ".join(f"{col} = excluded.{col}" for col in COLUMNS[1:])
+        self.conn.execute(
+            f"INSERT INTO contacts ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}",
+            contact_row(contact_id, contact))
+        n = contact_id_number(contact_id)
+        if n >= self.next_id:
+            self.next_id = n + 1
+        self._commit()
+
+    def __delitem__(self, contact_id: str) -> None:
+        cur = self.conn.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+        if cur.rowcount == 0:
+            raise KeyError(contact_id)
+        self._commit()
+
+    def __contains__(self, contact_id: object) -> bool:
+        return self.conn.execute("SELECT 1 FROM contacts WHERE id = ?", (contact_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (row[0] for row in self.conn.execute("SELECT id FROM contacts ORDER BY rowid"))
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def items(self) -> ItemsView:
+        return _Items(self)
+
+    def values(self) -> ValuesView:
+        return _Values(self)
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM contacts")
+        self._commit()
+
+    # --- id allocation (see contact_manager.next_contact_id) ---
+
+    @property
+    def next_id(self) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        return row[0] if row else 1
+
+    @next_id.setter
+    def next_id(self, value: int) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (value,))
+
+    def allocate_id(self) -> str:
+        n = self.next_id
+        while f"{ID_PREFIX}{n:03d}" in self:
+            n += 1
+        return f"{ID_PREFIX}{n:03d}"
+
+    # --- lookups used by contact_manager ---
+
+    def ids_by_phone(self, phone: str) -> List[str]:
+        return self._ids("SELECT id FROM contacts WHERE phone_key = ? AND phone_key != '' ORDER BY rowid",
+                         (query_key("phone", phone),))
+
+    def ids_by_email(self, email: str) -> List[str]:
+        return self._ids("SELECT id FROM contacts WHERE email_key = ? AND email_key != '' ORDER BY rowid",
+                         (query_key("email", email),))
+
+    def ids_by_category(self, category: str) -> List[str]:
+        return self._ids("SELECT id FROM contacts WHERE category_key = ? AND category_key != '' ORDER BY rowid",
+                         (query_key("text", category),))
+
+    def ids_by_name(self, name: str) -> List[str]:
+        key = query_key("text", name)
+        return self._ids("SELECT id FROM contacts WHERE (first_lc = ? OR last_lc = ?) AND ? != '' ORDER BY rowid",
+                         (key, key, key))
+
+    def ids_by_name_substring(self, term: str) -> List[str]:
+        term = query_key("text", term)
+        if not term:
+            return []
+        return self._ids("SELECT id FROM contacts WHERE instr(first_lc, ?) > 0 OR instr(last_lc, ?) > 0 "
+                         "ORDER BY rowid", (term, term))
+
+    def ids_by_name_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        prefix = query_key("text", prefix)
+        if not prefix:
+            return []
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self.conn.execute(
+            "SELECT id FROM (SELECT first_lc AS name, id FROM contacts WHERE first_lc >= ? AND first_lc < ? "
+            "UNION SELECT last_lc AS name, id FROM contacts WHERE last_lc >= ? AND last_lc < ?) "
+            "ORDER BY name, id LIMIT ?", (prefix, upper, prefix, upper, limit * 2))
+        return list(dict.fromkeys(row[0] for row in rows))[:limit]
+
+    def statistics_counts(self) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int], int]:
+        def grouped(expr: str, where: str = "1", order: str = "") -> Dict[str, int]:
+            sql = f"SELECT {expr} AS k, COUNT(*) FROM contacts WHERE {where} GROUP BY k {order}"
+            return dict(self.conn.execute(sql).fetchall())
+        # Categories and states are listed in the report, so keep the dict scan's first-appearance
+        # order there. Area codes only feed most_common_are_code, which breaks ties by code.
+        by_cat = grouped("stat_category", order="ORDER BY MIN(rowid)")
+        by_state = grouped("state_key", "state_key != ''", "ORDER BY MIN(rowid)")
+        area_counts = grouped("area_code", "area_code != ''")
+        no_email = self.conn.execute("SELECT COUNT(*) FROM contacts WHERE has_email = 0").fetchone()[0]
+        return by_cat, by_state, area_counts, no_email
+
+    def duplicate_groups(self, kind: str) -> List[List[str]]:
+        col = DUPLICATE_COLUMNS[kind]
+        rows = self.conn.execute(
+            f"SELECT {col}, id FROM contacts WHERE {col} IN "
+            f"(SELECT {col} FROM contacts WHERE {col} != '' GROUP BY {col} HAVING COUNT(*) >= 2) "
+            f"ORDER BY rowid")
+        groups: Dict[str, List[str]] = {}
+        for key, cid in rows:
+            groups.setdefault(key, []).append(cid)
+        return list(groups.values())
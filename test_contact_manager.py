@@ -3,8 +3,14 @@ from contact_manager import (
     add_contact, display_contact, list_all_contacts,
     search_contacts_by_name, search_contacts_by_category, find_contact_by_phone,
     update_contact, delete_contact, merge_contacts,
-    generate_contact_statistics, find_duplicate_contacts
+    generate_contact_statistics, find_duplicate_contacts,
+    add_contacts_bulk, save_contacts_to_file, load_contacts_from_file, autocomplete_names,
+    export_contacts_by_category, duplicate_clusters, merge_duplicate_groups,
+    match_keys, phone_e164, query_key, contacts_in_range, contacts_with_prefix, main_menu
 )
+from contact_index import IndexedContactsDB
+from contact_journal import journal_path, open_journal
+from contact_sqlite import SQLiteContactsDB
 
 
 def _mk(first, last, phone, *, email="", category="personal", city="", state="", notes=""):
@@ -80,8 +86,798 @@ def test_data_analysis():
     assert any(len(g) >= 2 for g in dupes["email_duplicates"])
 
 
+def test_indexed_db():
+    plain = _seed()
+    db = IndexedContactsDB(_seed())
+    assert search_contacts_by_category(db, "WORK") == search_contacts_by_category(plain, "work")
+    cid, _ = find_contact_by_phone(db, "312 555 3333")
+    assert cid == find_contact_by_phone(plain, "312 555 3333")[0]
+    update_contact(db, cid, {"phone": "111-222-3333", "category": "family"})
+    assert find_contact_by_phone(db, "3125553333")[0] != cid
+    assert find_contact_by_phone(db, "1112223333")[0] == cid
+    assert cid in search_contacts_by_category(db, "family")
+    assert db.ids_by_email("C@X.COM") and db.ids_by_name("lee")
+    import builtins
+    old = builtins.input
+    builtins.input = lambda *_: "1"
+    kept = merge_contacts(db, "contact_002", "contact_005")
+    builtins.input = old
+    assert kept == "contact_002" and "contact_005" not in db
+    assert db.ids_by_name("stone") == []
+    builtins.input = lambda *_: "yes"
+    delete_contact(db, "contact_001")
+    builtins.input = old
+    assert db.ids_by_phone("4025551111") == []
+    assert "contact_001" not in search_contacts_by_category(db, "work")
+    big = IndexedContactsDB({f"contact_{i:03d}": _mk(f"F{i}", f"L{i % 7}", str(i)) for i in range(1, 101)})
+    with big.transaction():  # a small share of the book: the sorted views are patched, not rebuilt
+        big["contact_002"] = _mk("Zed", "Zulu", "2")
+        del big["contact_003"]
+        add_contact(big, _mk("Amy", "", "101"))
+        big["contact_002"]["last_name"] = "Able"
+        big.reindex("contact_002")
+    fresh = IndexedContactsDB(dict(big))
+    assert list(big.name_order) == list(fresh.name_order)
+    assert all(list(big.views[f]) == list(fresh.views[f]) for f in big.views)
+
+
+def test_id_allocation_and_bulk():
+    db = IndexedContactsDB(_seed())
+    db.pop("contact_005")
+    report = add_contacts_bulk(db, [_mk("A", "B", "1"), {"first_name": "NoLast", "phone": "2"}, _mk("C", "D", "3")],
+                               batch_size=2)
+    assert report["added"] == ["contact_006", "contact_007"]
+    assert report["rejected"] == [(1, "missing last_name")]
+    db.pop("contact_007")
+    import os, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "contacts.json")
+        save_contacts_to_file(db, fn)
+        loaded = load_contacts_from_file(fn)
+    assert dict(loaded) == dict(db)
+    assert add_contact(loaded, _mk("E", "F", "4")) == "contact_008"
+    plain = _seed()
+    del plain["contact_002"]
+    assert add_contact(plain, _mk("G", "H", "5")) not in _seed()
+    from contact_manager import ContactRecord
+    report = add_contacts_bulk(plain, [ContactRecord.from_dict(_mk("I", "J", "6")), "not a dict"])
+    assert len(report["added"]) == 1 and report["rejected"] == [(1, "not a contact record")]
+
+
+def test_name_substring_index():
+    plain = _seed()
+    db = IndexedContactsDB(_seed())
+    for term in ["li", "LI", "ngu", "one", "ston", "zzz", "a"]:
+        assert search_contacts_by_name(db, term) == search_contacts_by_name(plain, term)
+    update_contact(db, "contact_005", {"last_name": "Rivers"})
+    assert "contact_005" not in search_contacts_by_name(db, "ston")
+    assert "contact_005" in search_contacts_by_name(db, "iver")
+    db.pop("contact_001")
+    assert search_contacts_by_name(db, "alic") == {}
+
+
+def test_autocomplete():
+    plain = _seed()
+    db = IndexedContactsDB(_seed())
+    assert autocomplete_names(db, "L") == autocomplete_names(plain, "l") == ["contact_002", "contact_004"]
+    assert autocomplete_names(db, "", 5) == []
+    add_contact(db, _mk("Lara", "Croft", "6"))
+    assert autocomplete_names(db, "la") == ["contact_006"]
+    update_contact(db, "contact_006", {"first_name": "Zoe"})
+    assert autocomplete_names(db, "la") == [] and autocomplete_names(db, "zo") == ["contact_006"]
+    assert len(autocomplete_names(db, "c", limit=1)) == 1
+
+
+def test_journal_storage():
+    import builtins, os, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "contacts.json")
+        with open_journal(fn) as db:
+            for c in _seed().values():
+                add_contact(db, c)
+            update_contact(db, "contact_001", {"email": "alice@x.com"})
+            old = builtins.input
+            builtins.input = lambda *_: "1"
+            merge_contacts(db, "contact_003", "contact_004")
+            builtins.input = lambda *_: "yes"
+            delete_contact(db, "contact_005")
+            builtins.input = old
+            expected = dict(db)
+        assert not os.path.exists(fn)
+        with open(journal_path(fn), encoding="utf-8") as f:
+            assert len(f.readlines()) == 9
+        loaded = load_contacts_from_file(fn)
+        assert dict(loaded) == expected
+        assert add_contact(loaded, _mk("X", "Y", "1")) == "contact_006"
+        with open_journal(fn) as db:
+            save_contacts_to_file(db, fn)
+        assert os.path.getsize(journal_path(fn)) == 0
+        assert dict(load_contacts_from_file(fn)) == expected
+
+        other = os.path.join(tmp, "other.json")
+        with open_journal(other) as db:
+            for c in _seed().values():
+                add_contact(db, c)
+        plain = dict(load_contacts_from_file(other))
+        del plain["contact_001"]
+        save_contacts_to_file(plain, other)  # a full snapshot over a file that still has a journal
+        assert os.path.getsize(journal_path(other)) == 0 and dict(load_contacts_from_file(other)) == plain
+
+        third = os.path.join(tmp, "third.json")
+        with open_journal(third) as db:
+            for c in _seed().values():
+                add_contact(db, c)
+        db = load_contacts_from_file(third)
+        del db["contact_001"]
+        update_contact(db, "contact_002", {"email": "bob@x.com"})
+        save_contacts_to_file(db, third)  # delta_state is None with a journal, so this writes a new base
+        reloaded = load_contacts_from_file(third)
+        assert "contact_001" not in reloaded and reloaded["contact_002"]["email"] == "bob@x.com"
+
+
+def test_sqlite_store():
+    plain = _seed()
+    db = SQLiteContactsDB()
+    with db.transaction():
+        for c in _seed().values():
+            add_contact(db, c)
+    assert dict(db.items()) == plain and len(db) == 5
+    assert generate_contact_statistics(db) == generate_contact_statistics(plain)
+    assert find_duplicate_contacts(db) == find_duplicate_contacts(plain)
+    assert export_contacts_by_category(db, "work") == export_contacts_by_category(plain, "work")
+    for term in ["li", "ST", "x"]:
+        assert search_contacts_by_name(db, term) == search_contacts_by_name(plain, term)
+    assert autocomplete_names(db, "l") == autocomplete_names(plain, "l")
+    assert find_contact_by_phone(db, "402.555.2222")[0] == "contact_002"
+    update_contact(db, "contact_002", {"category": "work"})
+    assert list(search_contacts_by_category(db, "work")) == ["contact_001", "contact_002", "contact_004", "contact_005"]
+    del db["contact_005"]
+    assert add_contact(db, _mk("New", "One", "1")) == "contact_006"
+    db["contact_007"] = plain["contact_007"] = _mk("Max", "Roß", "2", category="Straße")
+    plain["contact_002"]["category"] = "work"
+    del plain["contact_005"]
+    plain["contact_006"] = db["contact_006"]
+    assert generate_contact_statistics(db) == generate_contact_statistics(plain)
+    assert generate_contact_statistics(db)["contacts_by_category"]["straße"] == 1
+    db.close()
+
+
+def test_lazy_load():
+    import os, tempfile
+    plain = _seed()
+    plain["contact_003"]["first_name"] = "Cára"
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "contacts.json")
+        save_contacts_to_file(plain, fn)
+        with load_contacts_from_file(fn, lazy=True) as lazy:
+            assert lazy.index_rebuilt and os.path.exists(fn + ".idx")
+            assert dict(lazy.items()) == plain
+            assert generate_contact_statistics(lazy) == generate_contact_statistics(plain)
+        with open_journal(fn) as db:
+            update_contact(db, "contact_002", {"email": "bob@x.com"})
+            del db["contact_004"]
+            expected = dict(db)
+        with load_contacts_from_file(fn, lazy=True) as lazy:
+            assert not lazy.index_rebuilt
+            assert dict(lazy.items()) == expected and len(lazy) == 4
+            with open_journal(fn) as db:
+                add_contact(db, _mk("Fay", "Wu", "7"))
+                expected = dict(db)
+            lazy.refresh()
+            assert dict(lazy.items()) == expected
+            assert add_contact(lazy, _mk("Gus", "Ng", "8")) == "contact_007"
+            del lazy["contact_001"]
+            with open_journal(fn) as db:
+                db.compact()  # rewrites the snapshot under the view
+            lazy.refresh()
+            assert lazy["contact_007"]["first_name"] == "Gus" and "contact_001" not in lazy
+            expected = dict(lazy.items())
+            save_contacts_to_file(lazy, lazy.filename)
+        with load_contacts_from_file(fn, lazy=True) as lazy:
+            assert dict(lazy.items()) == expected and lazy.next_id == 8
+
+
+def test_running_statistics():
+    db = IndexedContactsDB(_seed())
+    assert generate_contact_statistics(db) == generate_contact_statistics(_seed())
+    update_contact(db, "contact_002", {"email": "bob@x.com", "address": {"state": "ia"}, "category": ""})
+    add_contact(db, _mk("Ann", "Ray", "515-000-0000", category="work", state="IA"))
+    del db["contact_001"]
+    stats = generate_contact_statistics(db)
+    assert stats == generate_contact_statistics(db, recompute=True)
+    assert stats["contacts_by_state"] == {"NE": 1, "IL": 2, "IA": 2}
+    assert stats["contacts_by_category"]["uncategorized"] == 1
+    assert stats["contacts_without_email"] == 2
+
+    tie = IndexedContactsDB()
+    add_contact(tie, _mk("A", "B", "402-555-0001"))
+    add_contact(tie, _mk("C", "D", "312-555-0002"))
+    update_contact(tie, "contact_001", {"notes": "x"})  # 402 drops to 0 and comes back, after 312
+    stats = generate_contact_statistics(tie)
+    assert stats == generate_contact_statistics(tie, recompute=True) and stats["most_common_are_code"] == "312"
+
+
+def test_columnar_analytics():
+    from contact_analytics import ColumnarContacts
+    db = _seed()
+    add_contact(db, _mk("alice", "nguyen", "555-0000", email="A@X.com", state="ne"))
+    add_contact(db, _mk("Zed", "Q", "12", category=""))
+    snap = ColumnarContacts(db)
+    assert generate_contact_statistics(snap) == generate_contact_statistics(db)
+    assert find_duplicate_contacts(snap) == find_duplicate_contacts(db)
+    assert find_duplicate_contacts(ColumnarContacts({})) == find_duplicate_contacts({})
+
+
+def test_compact_records():
+    import json
+    from contact_manager import ContactRecord
+    plain = _seed()
+    plain["contact_001"]["custom"] = {"vip": True}
+    del plain["contact_002"]["notes"]
+    db = IndexedContactsDB(json.loads(json.dumps(plain)), compact_records=True)
+    assert all(isinstance(c, ContactRecord) for c in db.values())
+    assert {cid: c.to_dict() for cid, c in db.items()} == plain
+    assert db["contact_001"]["address"]["state"] is db["contact_002"]["address"]["state"]
+    assert generate_contact_statistics(db) == generate_contact_statistics(plain)
+    assert search_contacts_by_name(db, "li") == search_contacts_by_name(plain, "li")
+    update_contact(db, "contact_001", {"email": "new@x.com"})
+    assert isinstance(db["contact_001"], ContactRecord) and db["contact_001"]["custom"] == {"vip": True}
+    import os, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "contacts.json")
+        save_contacts_to_file(db, fn)
+        assert dict(load_contacts_from_file(fn)) == {cid: c.to_dict() for cid, c in db.items()}
+
+
+def test_fuzzy_duplicates():
+    db = _seed()
+    a = _mk("Jonathan", "Smith", "402-555-9999", email="jon.smith@gmail.com", city="Omaha", state="NE")
+    b = _mk("Jonathon", "Smith", "(402) 555 9999", email="JonSmith+work@googlemail.com", city="Omaha", state="NE")
+    a["address"]["street"], b["address"]["street"] = "12 Main Street", "12 Main St."
+    ida, idb = add_contact(db, a), add_contact(db, b)
+    add_contact(db, _mk("Jon", "Smyth", "1", city="Omaha", state="NE"))
+    dupes = find_duplicate_contacts(db, fuzzy=True)
+    assert dupes["fuzzy_duplicates"] == [[ida, idb]]
+    assert dupes["phone_duplicates"] == find_duplicate_contacts(db)["phone_duplicates"]
+    assert find_duplicate_contacts(db, fuzzy=True, threshold=0.99)["fuzzy_duplicates"] == []
+
+
+def test_parallel_duplicates():
+    from contact_parallel import find_duplicate_contacts_parallel
+    db = _seed()
+    for i in range(300):
+        add_contact(db, _mk(f"P{i % 40}", "Q", f"402-555-{i % 90:04d}", email=f"u{i % 70}@x.com"))
+    expected = find_duplicate_contacts(db)
+    assert find_duplicate_contacts(db, workers=2) == expected
+    assert find_duplicate_contacts_parallel(db, workers=3, chunk_size=7) == expected
+
+
+def test_streaming_export():
+    import csv, io, json
+    from contact_export import export_contacts, iter_export
+    db = IndexedContactsDB(_seed())
+    db["contact_001"]["notes"] = "likes, commas; and\nnewlines"
+    text = export_contacts_by_category(db, "work")
+    assert text.startswith("ID: contact_001") and text.count("-" * 40) == 3
+    assert export_contacts_by_category(db, "nope") == "(No contacts in this category)"
+    out = io.StringIO()
+    assert export_contacts(db, out, "csv", category="work", chunk_size=2) == 3
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [r["id"] for r in rows] == ["contact_001", "contact_004", "contact_005"]
+    assert rows[0]["notes"] == "likes, commas; and\nnewlines" and rows[0]["state"] == "NE"
+    out = io.StringIO()
+    export_contacts(db, out, "jsonl", where=lambda cid, c: not c["email"])
+    assert [json.loads(line)["id"] for line in out.getvalue().splitlines()] == ["contact_002", "contact_005"]
+    card = "".join(iter_export(db, "vcard", where=lambda cid, c: cid == "contact_001"))
+    assert card.startswith("BEGIN:VCARD\r\nVERSION:3.0\r\n") and card.endswith("END:VCARD\r\n")
+    assert "N:Nguyen;Alice;;;" in card and "NOTE:likes\\, commas\\; and\\nnewlines" in card
+    assert len(list(iter_export(db, "text", chunk_size=2))) == 3
+    import builtins, contextlib, os, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "work.pdf")
+        answers = iter(["8", "work", "pdf", fn, "11", os.path.join(tmp, "missing.csv"), "11", fn, "0"])
+        old = builtins.input
+        builtins.input = lambda *_: next(answers)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as printed:
+                main_menu(db)
+        finally:
+            builtins.input = old
+        assert "Unknown format 'pdf'" in printed.getvalue() and not os.path.exists(fn)
+        assert printed.getvalue().count("Import failed: ") == 2
+
+
+def test_batch_merge():
+    db = _seed()
+    db["contact_004"]["last_modified"] = "2099-01-01"
+    db["contact_003"]["notes"], db["contact_004"]["notes"] = "met at expo", "prefers text"
+    # contact_006 shares Alice's phone and Bob's email, which chains both into Evan's cluster.
+    add_contact(db, _mk("Al", "N", "402 555 1111", email="b@x.com"))
+    db["contact_002"]["email"] = "b@x.com"
+    assert duplicate_clusters(db) == [["contact_001", "contact_006", "contact_002", "contact_005"],
+                                      ["contact_003", "contact_004"]]
+
+    idx = IndexedContactsDB(db)
+    merged = merge_duplicate_groups(idx)
+    assert merged == {"contact_001": ["contact_002", "contact_005", "contact_006"], "contact_003": ["contact_004"]}
+    assert sorted(idx) == ["contact_001", "contact_003"]
+    assert idx["contact_003"]["category"] == "work"  # contact_004 is newer
+    assert idx["contact_003"]["notes"] == "met at expo | prefers text"
+    assert idx.ids_by_name_prefix("lee") == [] and idx.ids_by_name_prefix("dan") == ["contact_003"]
+    assert find_duplicate_contacts(idx) == {"phone_duplicates": [], "email_duplicates": [], "name_duplicates": []}
+    assert generate_contact_statistics(idx) == generate_contact_statistics(idx, recompute=True)
+
+    plain = dict(db)
+    merge_duplicate_groups(plain, [["contact_003", "contact_004"]], policy="longest",
+                           field_rules={"first_name": "first", "address.city": lambda label, vals, recs: "Evanston"})
+    assert plain["contact_003"]["category"] == "personal" and plain["contact_003"]["first_name"] == "Cara"
+    assert plain["contact_003"]["address"]["city"] == "Evanston" and "contact_004" not in plain
+    assert len(plain) == 5
+
+
+def test_match_keys():
+    assert phone_e164("(402) 555-1111") == phone_e164("+1 402 555 1111") == phone_e164("1-402-555-1111") \
+        == "+14025551111"
+    assert phone_e164("+44 20 7946 0000") == phone_e164("0044 20 7946 0000") == "+442079460000"
+    assert phone_e164("") == "" and phone_e164("ext.") == ""
+    keys = match_keys(_mk(" Straße ", "Lee", "402.555.2222", email=" Bob@X.com "))
+    assert keys == ("4025552222", "+14025552222", "bob@x.com", "strasse|lee")
+
+    query_key.cache_clear()
+    db = IndexedContactsDB(_seed())
+    assert find_contact_by_phone(db, "+1 (402) 555-2222")[0] == "contact_002"
+    assert find_contact_by_phone(_seed(), "+1 (402) 555-2222")[0] == "contact_002"
+    find_contact_by_phone(db, "+1 (402) 555-2222")
+    assert query_key.cache_info().hits >= 1
+    assert db.match_keys_of("contact_003").phone == "+13125553333"
+    add_contact(db, _mk("Zed", "Q", "+1 402 555 1111"))
+    update_contact(db, "contact_005", {"email": "A@X.COM"})
+    assert find_duplicate_contacts(db) == find_duplicate_contacts(dict(db))
+    assert find_duplicate_contacts(db)["phone_duplicates"][0] == ["contact_001", "contact_006"]
+    assert find_duplicate_contacts(db)["email_duplicates"][0] == ["contact_001", "contact_005"]
+
+
+def test_bulk_import():
+    import io, os, tempfile
+    from contact_export import export_contacts
+    from contact_import import import_contacts
+    db = _seed()
+    db["contact_001"]["notes"] = 'said "hi", then\nleft'
+    with tempfile.TemporaryDirectory() as tmp:
+        for ext, fmt in ((".csv", "csv"), (".vcf", "vcard")):
+            fn = os.path.join(tmp, "export" + ext)
+            with open(fn, "w", encoding="utf-8", newline="") as out:
+                export_contacts(db, out, fmt)
+            for workers in (1, 2):
+                new = IndexedContactsDB()
+                result = import_contacts(new, fn, workers=workers, chunk_size=2)
+                assert result == {"added": list(db), "rejected": []}
+                assert dict(new) == db
+    foreign = io.StringIO("First Name,Surname,Mobile,E-mail Address,Postal Code,Company\n"
+                          "Ann,Ray,402-555-0101,ann@x.com,68102,Acme\n"
+                          ",NoFirst,402-555-0102,,,\n"
+                          'Bo,Li,"402-555-0103",,,"Multi\nline"\n')
+    db = {}
+    result = import_contacts(db, foreign, "csv", workers=1)
+    assert result["rejected"] == [(1, "missing first_name")] and len(result["added"]) == 2
+    assert db["contact_001"]["address"]["zip_code"] == "68102" and db["contact_001"]["email"] == "ann@x.com"
+    assert db["contact_002"]["category"] == "personal"
+
+    # Importing into a big book must cost about what it costs into an empty one, per chunk.
+    import time
+    from itertools import islice
+    rows = {f"contact_{i:03d}": _mk(f"F{i}", f"L{i}", f"402{i:07d}") for i in range(1, 40001)}
+    out = io.StringIO()
+    export_contacts(dict(islice(rows.items(), 2000)), out, "csv")
+
+    def per_chunk(book):
+        start = time.perf_counter()
+        import_contacts(book, io.StringIO(out.getvalue()), "csv", workers=1, chunk_size=250)
+        return (time.perf_counter() - start) / 8
+
+    populated, empty = per_chunk(IndexedContactsDB(rows)), per_chunk(IndexedContactsDB())
+    assert populated < 4 * empty + 0.02, (populated, empty)
+
+
+def test_group_commit_journal():
+    import os, tempfile, time
+    from contact_journal import recover_journal
+
+    def logged(fn):
+        with open(journal_path(fn), encoding="utf-8") as f:
+            return len(f.readlines())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "contacts.json")
+        with open_journal(fn, commit_records=3) as db:
+            add_contact(db, _mk("A", "B", "1"))
+            add_contact(db, _mk("C", "D", "2"))
+            assert logged(fn) == 0
+            add_contact(db, _mk("E", "F", "3"))
+            assert logged(fn) == 3 and db.syncs == 1
+            add_contacts_bulk(db, list(_seed().values()))
+            assert logged(fn) == 8 and db.syncs == 2
+            update_contact(db, "contact_001", {"notes": "buffered"})
+        assert logged(fn) == 9
+        with open_journal(fn, commit_records=1000, commit_ms=10) as db:
+            update_contact(db, "contact_002", {"notes": "timer"})
+            deadline = time.monotonic() + 2
+            while logged(fn) < 10 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert logged(fn) == 10
+            expected = dict(db)
+        # A crash mid-commit leaves a torn line; recovery cuts it so later records stay readable.
+        with open(journal_path(fn), "a", encoding="utf-8") as f:
+            f.write('{"op": "set", "id": "contact_0')
+        with open_journal(fn) as db:
+            assert dict(db) == expected
+            add_contact(db, _mk("G", "H", "4"))
+        assert recover_journal(fn) == 0
+        assert len(load_contacts_from_file(fn)) == len(expected) + 1
+
+
+def test_delta_snapshots():
+    import os, tempfile
+    from contact_delta import delta_files
+    db = IndexedContactsDB(_seed())
+    for i in range(15):
+        add_contact(db, _mk(f"N{i}", "Extra", f"555-000-{i:04d}"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "contacts.json")
+        save_contacts_to_file(db, fn)
+        base = os.stat(fn).st_mtime_ns
+        update_contact(db, "contact_001", {"email": "alice@x.com"})
+        del db["contact_002"]
+        add_contact(db, _mk("New", "Person", "555-999-0000"))
+        save_contacts_to_file(db, fn)
+        save_contacts_to_file(db, fn)  # nothing dirty: no new delta
+        assert os.stat(fn).st_mtime_ns == base and len(delta_files(fn)) == 1
+        loaded = load_contacts_from_file(fn)
+        assert dict(loaded) == dict(db) and loaded.next_id == db.next_id
+        with load_contacts_from_file(fn, lazy=True) as lazy:
+            assert dict(lazy.items()) == dict(db) and "contact_002" not in lazy
+
+        update_contact(loaded, "contact_003", {"notes": "second delta"})
+        save_contacts_to_file(loaded, fn)
+        assert len(delta_files(fn)) == 2 and os.stat(fn).st_mtime_ns == base
+        assert load_contacts_from_file(fn)["contact_003"]["notes"] == "second delta"
+        for cid in list(loaded)[:5]:
+            update_contact(loaded, cid, {"notes": "bulk"})
+        save_contacts_to_file(loaded, fn)  # over a quarter of the DB changed: consolidate
+        assert delta_files(fn) == [] and dict(load_contacts_from_file(fn)) == dict(loaded)
+        update_contact(loaded, "contact_003", {"notes": "third delta"})
+        save_contacts_to_file(loaded, fn)
+        with open_journal(fn) as journaled:
+            assert len(delta_files(fn)) == 1 and journaled["contact_003"]["notes"] == "third delta"
+            journaled.compact()
+            assert delta_files(fn) == []
+
+
+def test_query_engine():
+    from contact_query import Condition, parse_query, plan_query, query_contacts
+    plain = _seed()
+    db = IndexedContactsDB(plain)
+    sql = SQLiteContactsDB()
+    with sql.transaction():
+        sql.update(plain)
+    q = "category = work AND state = NE AND name contains 'n' AND has_email = no"
+    assert parse_query(q)[2] == Condition("name", "~", "n")
+    for store in (plain, db, sql):
+        assert list(query_contacts(store, q)) == ["contact_005"]
+        assert list(query_contacts(store, "city = omaha", sort="-name")) == ["contact_001", "contact_002"]
+        assert list(query_contacts(store, "phone = +1 312 555 3333 AND email startswith C")) \
+            == ["contact_003", "contact_004"]
+        assert list(query_contacts(store, None, sort=["state", "name"], limit=2, offset=1)) \
+            == ["contact_004", "contact_002"]
+        assert list(query_contacts(store, "category != work", limit=1)) == ["contact_002"]
+
+    plan = plan_query(db, parse_query(q))
+    assert plan.index == "category" and plan.estimate == 3  # "n" is too short for the trigram index
+    plan = plan_query(db, parse_query("category = work AND phone = 402-555-2222"))
+    assert plan.index == "phone" and plan.estimate == 2 and [c.field for c in plan.residual] == ["category"]
+    assert plan_query(plain, parse_query(q)).index is None
+    for bad in ("name", "name = x OR city = y", "colour = red", "has_email = maybe"):
+        try:
+            query_contacts(plain, bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} should not parse")
+
+
+def test_pagination():
+    import io
+    from contact_cursor import ContactCursor, page_through
+    from contact_query import iter_query
+
+    class Out(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            Out.writes += 1
+            return super().write(text)
+
+    db = IndexedContactsDB(_seed())
+    out = Out()
+    list_all_contacts(db, page_size=2, out=out)
+    assert Out.writes == 3 and out.getvalue().splitlines()[0].startswith(" contact_001 | AliceNguyen")
+    out = io.StringIO()
+    list_all_contacts(db, sort="-last_name", out=out)
+    assert [line.split()[0] for line in out.getvalue().splitlines()][:2] == ["contact_005", "contact_001"]
+
+    cursor = ContactCursor(db, page_size=2)
+    assert [cid for cid, _ in cursor.next_page()] == ["contact_001", "contact_002"]
+    resumed = ContactCursor(db, page_size=2, token=cursor.token)
+    assert [[cid for cid, _ in page] for page in resumed] == [["contact_003", "contact_004"], ["contact_005"]]
+    assert resumed.token is None and resumed.next_page() == []
+
+    cursor = ContactCursor(db, page_size=2, sort="last_name")  # Jones, Lee | Li, Nguyen | Stone
+    cursor.next_page()
+    token = cursor.token
+    add_contact(db, _mk("Al", "Adams", "1"))  # sorts before the resume point
+    del db["contact_004"]
+    assert [cid for cid, _ in ContactCursor(db, 2, "last_name", token).next_page()] == ["contact_001", "contact_005"]
+    try:
+        ContactCursor(db, 2, "first_name", token)
+        raise AssertionError("token should be tied to its sort")
+    except ValueError:
+        pass
+
+    matches = ContactCursor(iter_query(db, "state = NE"), page_size=1)
+    out = io.StringIO()
+    token = page_through(matches, out, ask=lambda *_: "q")
+    assert out.getvalue().count("\n") == 1 and token is not None
+    assert page_through(ContactCursor(iter_query(db, "state = NE"), 1, token=token), out, ask=lambda *_: "") is None
+    assert out.getvalue().count("\n") == 3
+
+    # Sorted pages come off the sorted view or a heap, never a sorted copy; ties must not be skipped.
+    from contact_query import sort_key
+    book = IndexedContactsDB({f"contact_{i:03d}": _mk(f"F{i % 5}", f"L{i % 4}", str(i)) for i in range(1, 31)})
+    with_empty = IndexedContactsDB(book)
+    with_empty["contact_031"] = _mk("Nolast", "", "31")
+    for rows in (book, dict(book), with_empty):
+        for sort in ("last_name", "-last_name", ["first_name", "last_name"]):
+            key, reverse = sort_key(sort)
+            expect = [cid for cid, _ in sorted(rows.items(), key=key, reverse=reverse)]
+            cursor = ContactCursor(rows, page_size=4, sort=sort)
+            got = [cid for cid, _ in cursor.next_page()]
+            got += [cid for page in ContactCursor(rows, 4, sort, cursor.token) for cid, _ in page]
+            assert got == expect, (sort, got)
+
+
+def test_sorted_views():
+    import random
+    from contact_query import plan_query, parse_query, query_contacts
+    from contact_sorted import SortedList
+
+    items = random.Random(7).sample(range(5000), 3000)
+    sl = SortedList(items[:1000])
+    sl.LOAD = 8  # small chunks so adds and removes split and empty them
+    for x in items[1000:]:
+        sl.add(x)
+    for x in items[::3]:
+        sl.remove(x)
+    expect = sorted(set(items) - set(items[::3]))
+    assert list(sl) == expect and len(sl) == len(expect)
+    assert list(sl.irange(100, 200)) == [x for x in expect if 100 <= x <= 200]
+    assert sl.count_range(100, 200) == len(list(sl.irange(100, 200))) and sl.count_range(None, -1) == 0
+    for lo in range(0, 5000, 250):
+        assert sl.count_range(lo, lo + 333) == sum(1 for x in expect if lo <= x <= lo + 333)
+        assert sl.count_range(lo) == sum(1 for x in expect if x >= lo)
+
+    plain = _seed()
+    for cid, (day, zip_code) in zip(sorted(plain), [("2024-01-05", "68102"), ("2024-03-01", "68131"),
+                                                    ("2023-12-31", "60601"), ("2024-02-10", "60614"),
+                                                    ("2024-01-20", "")]):
+        plain[cid]["created_date"] = day
+        plain[cid]["address"]["zip_code"] = zip_code
+    db = IndexedContactsDB(plain)
+    for store in (plain, db):
+        assert list(contacts_in_range(store, "created_date", "2024-01-01", "2024-02-10")) \
+            == ["contact_001", "contact_005", "contact_004"]
+        assert list(contacts_with_prefix(store, "zip_code", "681")) == ["contact_001", "contact_002"]
+        assert list(contacts_in_range(store, "last_name", "L", limit=2)) == ["contact_002", "contact_004"]
+    assert db.count_in_range("zip_code", "6", "7") == 4
+    plan = plan_query(db, parse_query("zip_code startswith 606 AND state = IL"))
+    assert plan.index == "range" and plan.estimate == 2
+    for store in (plain, db):
+        assert list(query_contacts(store, "created_date > 2024-01-20", sort="created_date")) \
+            == ["contact_004", "contact_002"]
+
+    update_contact(db, "contact_002", {"last_name": "Abbott"})
+    del db["contact_004"]
+    assert list(contacts_in_range(db, "last_name", None, "k")) == ["contact_002", "contact_003"]
+    with db.transaction():
+        add_contact(db, _mk("Fay", "Kim", "402-555-9999"))
+    assert db.ids_in_range("last_name", "k", "l") == ["contact_006"]
+
+
+def test_http_service():
+    import asyncio
+    import http.client
+    import json
+    from contact_service import ContactService
+
+    def client(port):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+
+        def call(method, path, body=None):
+            conn.request(method, path, None if body is None else json.dumps(body),
+                         {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = resp.read()
+            return resp.status, (json.loads(data) if resp.getheader("Content-Type", "").startswith("application/json")
+                                 else data.decode("utf-8"))
+
+        out = {"add": call("POST", "/contacts", _mk("Gus", "Hale", "402-555-7777", category="work")),
+               "bad": call("POST", "/contacts", {"first_name": "NoPhone"}),
+               "get": call("GET", "/contacts/contact_006"),
+               "patch": call("PATCH", "/contacts/contact_006", {"city": "x"}),
+               "update": call("PATCH", "/contacts/contact_006", {"email": "gus@x.com"}),
+               "work": call("GET", "/contacts?category=work&sort=last_name&limit=2"),
+               "q": call("GET", "/contacts?q=" + "state%20%3D%20IL"),
+               "phone": call("GET", "/contacts?phone=(312)%20555-3333"),
+               "stats": call("GET", "/stats"),
+               "dups": call("GET", "/duplicates"),
+               "export": call("GET", "/export?format=csv&category=work"),
+               "delete": call("DELETE", "/contacts/contact_006"),
+               "gone": call("GET", "/contacts/contact_006"),
+               "route": call("GET", "/nope"),
+               "all": call("GET", "/export?format=jsonl")}
+        conn.close()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.putrequest("GET", "/stats")
+        conn.putheader("X-Padding", "a" * 70_000)  # over the 64 KiB line limit
+        conn.endheaders()
+        resp = conn.getresponse()
+        out["long"] = resp.status, json.loads(resp.read())
+        conn.close()
+        return out
+
+    async def run():
+        service = ContactService(IndexedContactsDB(_seed()), export_chunk=2)
+        server = await service.start()
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await asyncio.get_running_loop().run_in_executor(None, client, port)
+
+    r = asyncio.run(run())
+    assert r["add"] == (201, {"id": "contact_006"}) and r["bad"][0] == 422
+    assert r["get"][1]["contact"]["first_name"] == "Gus" and r["patch"][0] == 422
+    assert r["update"][1]["contact"]["email"] == "gus@x.com"
+    assert list(r["work"][1]["contacts"]) == ["contact_006", "contact_004"]
+    assert r["q"][1]["limit"] == 100 and r["q"][1]["offset"] == 0
+    assert list(r["q"][1]["contacts"]) == ["contact_003", "contact_004"]
+    assert r["phone"][1]["count"] == 1 and r["stats"][1]["total_contacts"] == 6
+    assert r["dups"][1]["email_duplicates"] == [["contact_003", "contact_004"]]
+    status, text = r["export"]
+    assert status == 200 and text.splitlines()[0].startswith("id,") and len(text.splitlines()) == 5
+    assert r["delete"] == (200, {"deleted": "contact_006"}) and r["gone"][0] == 404 and r["route"][0] == 404
+    assert [json.loads(line)["id"] for line in r["all"][1].splitlines()] == sorted(_seed())
+    assert r["long"][0] == 400 and "too long" in r["long"][1]["error"]
+
+    async def run_sqlite():
+        sql = SQLiteContactsDB()
+        with sql.transaction():
+            sql.update(_seed())
+        server = await ContactService(sql).start()
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await asyncio.get_running_loop().run_in_executor(None, client, port)
+
+    r = asyncio.run(run_sqlite())
+    assert r["add"] == (201, {"id": "contact_006"}) and r["stats"][1]["total_contacts"] == 6
+    assert r["dups"][1]["email_duplicates"] == [["contact_003", "contact_004"]] and r["gone"][0] == 404
+    assert len(r["export"][1].splitlines()) == 5 and len(r["all"][1].splitlines()) == 5
+
+
+def test_concurrent_store():
+    import threading
+    from contact_concurrent import ConcurrentContactsDB
+
+    db = ConcurrentContactsDB(_seed(), shards=4)
+    assert len(db) == 5 and db["contact_003"]["address"]["city"] == "Chicago"
+    try:
+        db["contact_001"]["phone"] = "x"
+        raise AssertionError("stored records should be read-only")
+    except TypeError:
+        pass
+
+    def bump(field):
+        for _ in range(200):
+            with db.locked("contact_001"):
+                update_contact(db, "contact_001", {field: db["contact_001"].get(field, 0) + 1})
+
+    def add(area):
+        for i in range(50):
+            add_contact(db, _mk(area, str(i), f"{area}-555-{i:04d}"))
+
+    seen = []
+
+    def read():
+        for _ in range(2000):
+            c = db.get("contact_001")
+            seen.append(c.get("a", 0) <= 200 and c["first_name"] == "Alice")
+
+    threads = [threading.Thread(target=f, args=a) for f, a in
+               [(bump, ("a",)), (bump, ("b",)), (add, ("201",)), (add, ("202",)), (read, ())]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert db["contact_001"]["a"] == db["contact_001"]["b"] == 200 and all(seen)
+    assert len(db) == 105 and len(set(db)) == 105 and db.next_id == 106
+
+    assert merge_duplicate_groups(db, policy="first") == {"contact_002": ["contact_005"],
+                                                          "contact_003": ["contact_004"]}
+    assert "contact_005" not in db and db.pop("contact_005", None) is None and len(db.snapshot()) == 103
+
+
+def test_sharded_store():
+    import os
+    import tempfile
+    from contact_shards import _group_keys, _partition_keys, key_shard, open_sharded, shard_of, shard_path
+
+    plain = _seed()
+    parts = _partition_keys(IndexedContactsDB(plain), 3)
+    assert all(key_shard(key, 3) == j for j, part in enumerate(parts) for keys in part.values() for key in keys)
+    groups = [_group_keys(None, [part]) for part in parts]
+    assert sorted(ids for g in groups for ids in g["phone"]) == find_duplicate_contacts(plain)["phone_duplicates"]
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "book.json")
+        with open_sharded(shards=3) as book:
+            out = book.add_contacts_bulk(list(plain.values()) + [{"first_name": "x"}], batch_size=2)
+            assert out == {"added": sorted(plain), "rejected": [(5, "missing last_name, phone")]}
+            assert len({shard_of(cid, 3) for cid in plain}) > 1 and len(book) == 5
+            assert list(book.search_contacts_by_category("work")) == ["contact_001", "contact_004", "contact_005"]
+            assert book.find_contact_by_phone("312 555 3333")[0] == "contact_003"
+            assert book.find_contact_by_phone("999") == (None, None)
+            assert book.generate_contact_statistics() == generate_contact_statistics(plain)
+            assert book.find_duplicate_contacts() == find_duplicate_contacts(plain)
+            assert book.update_contact("contact_002", {"category": "work"}) and book.delete_contact("contact_005")
+            assert not book.delete_contact("contact_005") and book.get_contact("contact_005") is None
+            paths = book.save_contacts_to_file(filename)
+            assert paths == [shard_path(filename, i, 3) for i in range(3)] and all(map(os.path.exists, paths))
+        with open_sharded(filename, shards=3) as book:
+            assert list(book.search_contacts_by_category("work")) == ["contact_001", "contact_002", "contact_004"]
+            assert book.add_contact(_mk("New", "Person", "555-123-4567")) == "contact_006"
+
+
+def test_benchmark_suite():
+    import tempfile
+    from bench_contact_manager import compare, generate_contacts, run_suite
+
+    book = list(generate_contacts(300, seed=3))
+    assert book == list(generate_contacts(300, seed=3)) and book != list(generate_contacts(300, seed=4))
+    plain = {}
+    add_contacts_bulk(plain, book)
+    assert find_duplicate_contacts(plain)["phone_duplicates"]  # every 50th contact reuses a phone
+
+    with tempfile.TemporaryDirectory() as d:
+        report = run_suite([300], seed=3, directory=d)
+    rows = {r["op"]: r for r in report["results"]}
+    assert {"add_bulk", "search_name", "update", "merge", "dedupe", "export", "save", "load"} <= set(rows)
+    assert rows["export"]["ops"] == 300 and rows["add_bulk"]["peak_bytes"] > 0
+    assert all(r["seconds"] >= 0 and "blocks_per_op" in r for r in rows.values())
+
+    slower = {"results": [dict(rows["save"], ops_per_sec=rows["save"]["ops_per_sec"] / 2)]}
+    assert compare(report, slower) == [{"size": 300, "op": "save", "before": rows["save"]["ops_per_sec"],
+                                        "after": rows["save"]["ops_per_sec"] / 2, "ratio": 0.5}]
+    assert compare(report, report) == []
+
+
 def run_all_tests():
-    tests = [test_create_contact, test_search_functionality, test_contact_operations, test_data_analysis]
+    tests = [test_create_contact, test_search_functionality, test_contact_operations, test_data_analysis,
+             test_indexed_db, test_id_allocation_and_bulk,
+             test_name_substring_index, test_autocomplete,
+             test_journal_storage, test_sqlite_store,
+             test_lazy_load, test_running_statistics,
+             test_columnar_analytics, test_compact_records,
+             test_fuzzy_duplicates, test_parallel_duplicates,
+             test_streaming_export, test_batch_merge, test_match_keys,
+             test_bulk_import, test_group_commit_journal,
+             test_delta_snapshots, test_query_engine, test_pagination,
+             test_sorted_views, test_http_service,
+             test_concurrent_store, test_sharded_store, test_benchmark_suite]
     passed, failed = 0, 0
     for t in tests:
         try: